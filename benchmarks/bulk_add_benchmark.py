@@ -0,0 +1,58 @@
+"""
+Сравнение добавления 500 лекарств одной транзакцией (add_medications_many)
+и по одному коммиту на лекарство (add_medication).
+
+    python benchmarks/bulk_add_benchmark.py
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parsers.medication_parser import ParsedMedication, iter_medication_entries
+from repositories.database_repository import DatabaseRepository
+
+ENTRIES = 500
+
+
+async def _repository(directory: str, name: str) -> DatabaseRepository:
+    repository = DatabaseRepository(os.path.join(directory, name))
+    await repository.create_tables()
+    return repository
+
+
+async def run(entries: int = ENTRIES) -> dict:
+    message = "\n".join(f"лекарство Препарат-{i} {i % 12 + 1:02d}.30 x{i % 5 + 1}" for i in range(entries))
+    with tempfile.TemporaryDirectory() as directory:
+        started = time.perf_counter()
+        medications = [entry for entry in iter_medication_entries(message) if isinstance(entry, ParsedMedication)]
+        parse_seconds = time.perf_counter() - started
+
+        single = await _repository(directory, "single.db")
+        started = time.perf_counter()
+        for med in medications:
+            await single.add_medication(1, med.name, med.expiry_date, med.quantity)
+        single_seconds = time.perf_counter() - started
+        await single.engine.dispose()
+
+        bulk = await _repository(directory, "bulk.db")
+        started = time.perf_counter()
+        await bulk.add_medications_many(1, medications)
+        bulk_seconds = time.perf_counter() - started
+        await bulk.engine.dispose()
+
+    return {
+        "entries": len(medications),
+        "parse_ms": round(parse_seconds * 1000, 2),
+        "one_commit_per_item_ms": round(single_seconds * 1000, 2),
+        "bulk_ms": round(bulk_seconds * 1000, 2),
+        "speedup": round(single_seconds / bulk_seconds, 1),
+    }
+
+
+if __name__ == "__main__":
+    for name, value in asyncio.run(run()).items():
+        print(f"{name}: {value}")
@@ -0,0 +1,94 @@
+"""
+Импорт файла аптечки на 1 000 000 строк CSV и выгрузка обратно.
+
+Файл генерируется потоком во временный каталог. Во время импорта память процесса
+снимается после каждой порции: при построчном чтении и записи порциями анонимная
+память (куча) должна выйти на плато, а не расти с числом строк. Файловые страницы
+считаются отдельно — это отображённая в память база (DB_MMAP_SIZE), их ядро
+вытесняет само.
+
+    python benchmarks/cabinet_import_benchmark.py [строк]
+"""
+import asyncio
+import logging
+import os
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parsers.cabinet_file import CabinetWriter
+from repositories.database_repository import DatabaseRepository, dispose_engines
+from services.cabinet_transfer import export_cabinet_file, import_cabinet_file
+
+ROWS = 1_000_000
+RSS_SAMPLES = 5
+
+
+def _rss_mb() -> tuple:
+    """(анонимная, файловая) резидентная память процесса в МБ"""
+    values = {}
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith(("RssAnon:", "RssFile:")):
+                key, value = line.split(":")
+                values[key] = int(value.split()[0]) / 1024
+    return values["RssAnon"], values["RssFile"]
+
+
+def _write_file(path: str, rows: int) -> None:
+    with open(path, "w", encoding="utf-8", newline="") as stream:
+        writer = CabinetWriter(stream, "csv")
+        for i in range(rows):
+            writer.write({"kind": "medication", "name": f"Препарат-{i}", "expiry_date": f"{i % 12 + 1:02d}.{30 + i % 5}",
+                          "quantity": i % 10 + 1})
+        writer.close()
+
+
+async def run(rows: int = ROWS) -> dict:
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, "cabinet.csv")
+        _write_file(source, rows)
+        repository = DatabaseRepository(os.path.join(directory, "import.db"))
+        await repository.create_tables()
+
+        samples = []
+        every = max(1, rows // RSS_SAMPLES)
+
+        def sample(result) -> None:
+            if result.medications // every > len(samples) - 1:
+                samples.append((result.medications, _rss_mb()))
+
+        rss_before = _rss_mb()
+        started = time.perf_counter()
+        result = await import_cabinet_file(repository, 1, source, "csv", on_chunk=sample)
+        import_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        exported = await export_cabinet_file(repository, 1, os.path.join(directory, "export.csv"), "csv")
+        export_seconds = time.perf_counter() - started
+        file_mb = os.path.getsize(source) / 2**20
+        await dispose_engines()
+
+    return {
+        "rows": rows,
+        "file_mb": round(file_mb, 1),
+        "imported": result.medications,
+        "errors": result.error_count,
+        "import_s": round(import_seconds, 1),
+        "import_rows_per_s": round(rows / import_seconds),
+        "anon_rss_before_mb": round(rss_before[0], 1),
+        "anon_rss_during_import_mb": ", ".join(f"{done // 1000}k={anon:.0f}" for done, (anon, _) in samples),
+        "file_rss_during_import_mb": ", ".join(f"{done // 1000}k={mapped:.0f}" for done, (_, mapped) in samples),
+        "export_s": round(export_seconds, 1),
+        "export_rows_per_s": round(exported / export_seconds),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+if __name__ == "__main__":
+    logging.getLogger().setLevel(logging.WARNING)
+    for name, value in asyncio.run(run(int(sys.argv[1]) if len(sys.argv) > 1 else ROWS)).items():
+        print(f"{name}: {value}")
@@ -0,0 +1,58 @@
+"""
+Конкурентная нагрузка на общий движок SQLite: много пользователей одновременно
+добавляют лекарства и читают свои аптечки. Считаются операции в секунду
+и ошибки "database is locked".
+
+    python benchmarks/db_concurrency_benchmark.py [пользователей] [операций на пользователя]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.exc import OperationalError
+from repositories.database_repository import DatabaseRepository, dispose_engines
+
+
+async def _user_session(path: str, user_id: int, operations: int, locked_errors: list) -> None:
+    # Отдельный репозиторий на пользователя: общий движок, но без общего кэша списков,
+    # чтобы каждое чтение действительно шло в базу
+    repository = DatabaseRepository(path)
+    for i in range(operations):
+        try:
+            if i % 2:
+                await repository.list_medications(user_id)
+                repository.cache.invalidate([user_id])
+            else:
+                await repository.add_medication(user_id, f"Препарат-{i}", "2030-01-31", 1)
+        except OperationalError as e:
+            if "locked" not in str(e):
+                raise
+            locked_errors.append(e)
+
+
+async def run(users: int = 200, operations: int = 10) -> dict:
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "app.db")
+        await DatabaseRepository(path).create_tables()
+        locked_errors = []
+        started = time.perf_counter()
+        await asyncio.gather(*(_user_session(path, user_id, operations, locked_errors) for user_id in range(users)))
+        seconds = time.perf_counter() - started
+        await dispose_engines()
+    return {
+        "users": users,
+        "operations": users * operations,
+        "seconds": round(seconds, 3),
+        "operations_per_second": round(users * operations / seconds, 1),
+        "database_locked_errors": len(locked_errors),
+    }
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:3]]
+    for name, value in asyncio.run(run(*args)).items():
+        print(f"{name}: {value}")
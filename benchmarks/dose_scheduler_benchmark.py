@@ -0,0 +1,109 @@
+"""
+Таймер приёмов (DoseScheduler) на 100k курсов.
+
+Измеряется:
+- восстановление кучи из базы после перезапуска;
+- обработка пиковой минуты, когда наступает приём у многих курсов сразу
+  (перенос в базе условным UPDATE, пересчёт следующего приёма, отправка);
+- накладные расходы таймера в памяти на один приём (без базы);
+- для сравнения — один опрос всех курсов, который прежде пришлось бы делать каждую минуту.
+
+    python benchmarks/dose_scheduler_benchmark.py
+"""
+import asyncio
+import heapq
+import logging
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parsers.schedule_parser import DOSE_TIME_FORMAT, CourseSchedule
+from repositories.database_repository import DatabaseRepository, dispose_engines
+from services.dose_scheduler import DoseScheduler
+
+COURSES = 100_000
+USERS = 40_000
+SPECS = ("t=08:00,20:00", "t=09:00", "t=08:00,14:00,20:00", "t=22:00;dow=135", "h=8;from=2026-10-18", "t=09:30;dow=12345")
+NOW = datetime(2026, 10, 19, 7, 59)
+
+
+def _fill(path: str, rng: random.Random) -> None:
+    # Заполнение напрямую через sqlite3: здесь измеряется таймер, а не вставка
+    rows = []
+    for i in range(COURSES):
+        spec = rng.choice(SPECS)
+        next_dose = CourseSchedule.loads(spec).next_dose(NOW)
+        # Часть курсов — со случайной минутой приёма, чтобы куча не состояла из одинаковых ключей
+        if rng.random() < 0.3:
+            next_dose += timedelta(minutes=rng.randrange(1, 600))
+        rows.append((rng.randrange(USERS), f"Препарат {i}", "1", "", "внутрь", NOW.isoformat(), spec,
+                     next_dose.strftime(DOSE_TIME_FORMAT)))
+    with sqlite3.connect(path) as conn:
+        conn.executemany(
+            "INSERT INTO courses (user_id, medicine_name, dosage, schedule, method, added_date, schedule_spec, next_dose_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            rows
+        )
+
+
+async def main() -> None:
+    logging.getLogger().setLevel(logging.WARNING)
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "doses.db")
+        repository = DatabaseRepository(path)
+        await repository.create_tables()
+        _fill(path, rng)
+
+        sent = []
+
+        async def send(user_id, courses):
+            sent.append(len(courses))
+
+        scheduler = DoseScheduler(repository, send)
+        started = time.perf_counter()
+        await scheduler.rebuild()
+        rebuild = time.perf_counter() - started
+        print(f"heap rebuild from db: {rebuild * 1000:.0f} ms for {len(scheduler)} courses")
+
+        # Опрос всех курсов раз в минуту, как пришлось бы без кучи
+        started = time.perf_counter()
+        with sqlite3.connect(path) as conn:
+            for course_id, spec in conn.execute("SELECT id, schedule_spec FROM courses"):
+                CourseSchedule.loads(spec).next_dose(NOW)
+        scan = time.perf_counter() - started
+        print(f"full scan of all courses (per minute when polling): {scan * 1000:.0f} ms, {scan * 1440:.0f} s/day")
+
+        peak = NOW + timedelta(minutes=1)
+        started = time.perf_counter()
+        delivered = await scheduler.run_due(peak)
+        elapsed = time.perf_counter() - started
+        print(f"peak minute {peak:%H:%M}: {delivered} doses to {len(sent)} users in {elapsed * 1000:.0f} ms "
+              f"({elapsed / max(delivered, 1) * 1e6:.0f} us/dose)")
+
+        # Накладные расходы кучи и пересчёта следующего приёма без базы
+        specs = [CourseSchedule.loads(spec) for spec in SPECS]
+        heap = [(datetime(2026, 10, 19, 8, 0).strftime(DOSE_TIME_FORMAT), i) for i in range(COURSES)]
+        heapq.heapify(heap)
+        started = time.perf_counter()
+        for i in range(COURSES):
+            when, course_id = heapq.heappop(heap)
+            next_dose = specs[course_id % len(specs)].next_dose(datetime.fromisoformat(when))
+            heapq.heappush(heap, (next_dose.strftime(DOSE_TIME_FORMAT), course_id))
+        overhead = (time.perf_counter() - started) / COURSES
+        print(f"in-memory timer overhead: {overhead * 1e6:.1f} us/dose (pop + next dose + push)")
+
+        minutes = len({when for when, _ in await repository.list_scheduled_doses()})
+        print(f"timer wakeups: one per distinct dose minute, {minutes} minutes in the heap (polling: 1440 scans/day)")
+
+        await dispose_engines()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,67 @@
+"""
+Стоимость запроса сроков годности (list_expiring_medications) при росте таблицы.
+
+Таблица заполняется до 10k, 100k и 1M строк (по 100 лекарств на пользователя),
+на каждом размере измеряется время получения первой и следующей страницы
+для одного пользователя. Благодаря индексу (user_id, expiry_date) время не растёт.
+
+    python benchmarks/expiry_query_benchmark.py
+"""
+import asyncio
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from repositories.database_repository import DatabaseRepository, dispose_engines
+
+SIZES = (10_000, 100_000, 1_000_000)
+MEDS_PER_USER = 100
+QUERIES = 200
+
+
+def _fill(path: str, start: int, stop: int, today: date) -> None:
+    # Заполнение напрямую через sqlite3: здесь измеряется запрос, а не вставка
+    with sqlite3.connect(path) as conn:
+        conn.executemany(
+            "INSERT INTO medications (user_id, name, canonical_name, expiry_date, quantity, added_date, next_event_date) "
+            "VALUES (?, ?, ?, ?, 1, ?, ?)",
+            (
+                (i // MEDS_PER_USER, f"Препарат-{i}", f"препарат{i}",
+                 (today + timedelta(days=i % MEDS_PER_USER - 20)).isoformat(), today.isoformat(), today.isoformat())
+                for i in range(start, stop)
+            )
+        )
+
+
+async def run(sizes=SIZES) -> list:
+    today = date.today()
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "app.db")
+        repository = DatabaseRepository(path)
+        await repository.create_tables()
+        filled = 0
+        for size in sizes:
+            _fill(path, filled, size, today)
+            filled = size
+            user_id = size // MEDS_PER_USER // 2
+
+            started = time.perf_counter()
+            for _ in range(QUERIES):
+                page = await repository.list_expiring_medications(user_id, limit=10)
+                last = page[-1][0]
+                await repository.list_expiring_medications(user_id, limit=10, after=(last.expiry_date, last.id))
+            per_query = (time.perf_counter() - started) / (QUERIES * 2)
+            results.append({"rows": size, "query_ms": round(per_query * 1000, 3)})
+        await dispose_engines()
+    return results
+
+
+if __name__ == "__main__":
+    for result in asyncio.run(run()):
+        print(f"rows: {result['rows']:>9}  query_ms: {result['query_ms']}")
@@ -0,0 +1,222 @@
+"""
+Общие части офлайн-бенчмарков: заглушка Groq API, фейковый Telegram-бот
+и синтетические Update/CallbackQuery для вызова обработчиков MedicineBot без сети.
+"""
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from typing import Dict, List, Optional, Sequence
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# config.py требует токены при импорте; бенчмаркам хватает фиктивных значений
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "benchmark-token")
+os.environ.setdefault("GROQ_API_KEY", "benchmark-key")
+
+from aiohttp import web
+
+# Ответ заглушки на запрос рекомендации: около 150 токенов, как у реальной модели
+RECOMMENDATION = (
+    "Из вашей аптечки при головной боли подойдёт парацетамол. Показания: головная боль, повышенная "
+    "температура, умеренная боль. Противопоказания: тяжёлые заболевания печени и почек, алкоголь. "
+    "Дозировка: взрослым 500 мг, при необходимости повторить через 4–6 часов, не более 4 г в сутки. "
+    "Меры предосторожности: не совмещайте с другими препаратами, содержащими парацетамол, и обратитесь "
+    "к врачу, если боль не проходит более трёх дней или сопровождается высокой температурой."
+)
+
+
+def approx_tokens(text: str) -> int:
+    """Грубая оценка числа токенов для русского текста: около трёх символов на токен"""
+    return (len(text) + 2) // 3
+
+
+class GroqStub:
+    """
+    Локальная заглушка Groq API с настраиваемой задержкой и долей ошибок 5xx.
+
+    Рекомендация «генерируется» по словам с паузой token_interval: на запрос
+    со "stream": true слова отдаются server-sent events по мере генерации,
+    иначе ответ приходит целиком после последнего слова.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.05,
+        error_rate: float = 0.0,
+        seed: int = 0,
+        token_interval: float = 0.0,
+        prompt_token_cost: float = 0.0
+    ):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.token_interval = token_interval
+        # Время обработки промпта на сервере: секунды на токен (токен ≈ 3 символа)
+        self.prompt_token_cost = prompt_token_cost
+        self.prompts: List[str] = []
+        self.calls = 0
+        self.url: Optional[str] = None
+        self._random = random.Random(seed)
+        self._runner: Optional[web.AppRunner] = None
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        self.calls += 1
+        payload = await request.json()
+        self.prompts.append(payload["prompt"])
+        delay = self.latency + approx_tokens(payload["prompt"]) * self.prompt_token_cost
+        if delay:
+            await asyncio.sleep(delay)
+        if self._random.random() < self.error_rate:
+            return web.json_response({"error": "stub failure"}, status=503)
+        if "определи намерение" in payload["prompt"]:
+            return web.json_response({"text": "рекомендация"})
+        if payload.get("stream"):
+            return await self._stream(request, RECOMMENDATION)
+        if self.token_interval:
+            await asyncio.sleep(self.token_interval * (len(RECOMMENDATION.split(" ")) - 1))
+        return web.json_response({"text": RECOMMENDATION})
+
+    async def _stream(self, request: web.Request, text: str) -> web.StreamResponse:
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        for i, word in enumerate(text.split(" ")):
+            if i and self.token_interval:
+                await asyncio.sleep(self.token_interval)
+            chunk = word if i == 0 else f" {word}"
+            await response.write(f"data: {json.dumps({'text': chunk}, ensure_ascii=False)}\n\n".encode())
+        await response.write(b"data: [DONE]\n\n")
+        return response
+
+    async def start(self) -> "GroqStub":
+        app = web.Application()
+        app.router.add_post("/v1/llm", self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{port}/v1/llm"
+        return self
+
+    async def close(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+
+class FakeTelegramBot:
+    """Вместо Telegram Bot API: запоминает отправленные сообщения"""
+
+    def __init__(self):
+        self.sent: List[tuple] = []
+
+    async def send_message(self, chat_id: int, text: str, **kwargs) -> None:
+        self.sent.append((chat_id, text))
+
+
+class _User:
+    def __init__(self, user_id: int):
+        self.id = user_id
+
+
+class FakeSentMessage:
+    """Отправленный ботом ответ: запоминает правки с моментом времени"""
+
+    def __init__(self, text: str):
+        self.text = text
+        self.edits: List[tuple] = []
+
+    async def edit_text(self, text: str, **kwargs) -> None:
+        self.edits.append((time.perf_counter(), text))
+        self.text = text
+
+
+class FakeMessage:
+    def __init__(self, user_id: int, text: str):
+        self.from_user = _User(user_id)
+        self.text = text
+        self.replies: List[str] = []
+        self.sent: List[FakeSentMessage] = []
+
+    async def reply_text(self, text: str, **kwargs) -> FakeSentMessage:
+        self.replies.append(text)
+        self.sent.append(FakeSentMessage(text))
+        return self.sent[-1]
+
+
+class FakeCallbackQuery:
+    def __init__(self, user_id: int, data: str):
+        self.from_user = _User(user_id)
+        self.data = data
+        self.edits: List[str] = []
+
+    async def answer(self, *args, **kwargs) -> None:
+        pass
+
+    async def edit_message_text(self, text: str, **kwargs) -> None:
+        self.edits.append(text)
+
+
+class FakeUpdate:
+    """Минимальный Update: поля, которые читают обработчики MedicineBot"""
+
+    def __init__(self, user_id: int, message: Optional[FakeMessage] = None, callback_query: Optional[FakeCallbackQuery] = None):
+        self.effective_user = _User(user_id)
+        self.message = message
+        self.callback_query = callback_query
+
+
+def message_update(user_id: int, text: str) -> FakeUpdate:
+    return FakeUpdate(user_id, message=FakeMessage(user_id, text))
+
+
+def callback_update(user_id: int, data: str) -> FakeUpdate:
+    return FakeUpdate(user_id, callback_query=FakeCallbackQuery(user_id, data))
+
+
+def percentile(sorted_values: Sequence[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def latency_summary(latencies: List[float]) -> Dict[str, float]:
+    values = sorted(latencies)
+    return {
+        "p50_ms": round(percentile(values, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(values, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(values, 0.99) * 1000, 3),
+    }
+
+
+def write_results(results: dict, path: str) -> None:
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2, sort_keys=True)
+
+
+def compare_results(previous: dict, current: dict, prefix: str = "") -> List[str]:
+    """Построчное сравнение числовых метрик двух прогонов"""
+    lines = []
+    for key in sorted(current):
+        name = f"{prefix}{key}"
+        old, new = previous.get(key), current[key]
+        if isinstance(new, dict) and isinstance(old, dict):
+            lines.extend(compare_results(old, new, f"{name}."))
+        elif isinstance(new, (int, float)) and isinstance(old, (int, float)) and not isinstance(new, bool):
+            change = f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+            lines.append(f"{name}: {old} -> {new} ({change})")
+    return lines
+
+
+class Timer:
+    def __enter__(self) -> "Timer":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.seconds = time.perf_counter() - self.started
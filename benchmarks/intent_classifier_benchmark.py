@@ -0,0 +1,53 @@
+"""
+Бенчмарк локального классификатора намерений.
+
+Каждая пятая фраза из data/intents.tsv откладывается в контрольную выборку,
+модель обучается на остальных. Выводятся точность на контрольной выборке,
+задержка классификации одного сообщения и доля сообщений, которым не нужен LLM.
+
+    python benchmarks/intent_classifier_benchmark.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from constants import INTENT_CONFIDENCE_THRESHOLD
+from services.intent_classifier import IntentClassifier, load_examples
+
+
+def run(threshold: float = INTENT_CONFIDENCE_THRESHOLD) -> dict:
+    examples = load_examples()
+    train = [example for i, example in enumerate(examples) if i % 5]
+    holdout = [example for i, example in enumerate(examples) if not i % 5]
+
+    started = time.perf_counter()
+    classifier = IntentClassifier(train)
+    train_seconds = time.perf_counter() - started
+
+    latencies, correct, local, local_correct = [], 0, 0, 0
+    for intent, phrase in holdout:
+        started = time.perf_counter()
+        prediction = classifier.classify(phrase)
+        latencies.append(time.perf_counter() - started)
+        correct += prediction.intent == intent
+        if prediction.confidence >= threshold:
+            local += 1
+            local_correct += prediction.intent == intent
+
+    latencies.sort()
+    return {
+        "holdout_size": len(holdout),
+        "train_seconds": round(train_seconds, 3),
+        "accuracy": round(correct / len(holdout), 3),
+        "latency_mean_us": round(sum(latencies) / len(latencies) * 1e6, 1),
+        "latency_p95_us": round(latencies[int(len(latencies) * 0.95)] * 1e6, 1),
+        "without_llm_fraction": round(local / len(holdout), 3),
+        "without_llm_accuracy": round(local_correct / local, 3) if local else None,
+    }
+
+
+if __name__ == "__main__":
+    for name, value in run().items():
+        print(f"{name}: {value}")
@@ -0,0 +1,195 @@
+"""
+Офлайн нагрузочный тест горячих путей бота.
+
+Обработчики MedicineBot.handle_message и button вызываются с синтетическими
+Update/CallbackQuery, Groq API заменён локальной заглушкой, Telegram — фейковым
+ботом. Затем измеряется проход напоминаний check_reminders по таблицам разного размера.
+
+    python benchmarks/load_test.py --output results/load_test.json
+    python benchmarks/load_test.py --reminder-sizes 10000 --compare results/load_test.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import date, timedelta
+
+from harness import (
+    FakeTelegramBot,
+    GroqStub,
+    Timer,
+    callback_update,
+    compare_results,
+    latency_summary,
+    message_update,
+    write_results,
+)
+from main import MedicineBot, check_reminders
+from repositories.database_repository import DatabaseRepository, dispose_engines
+from services.expiry_scheduler import ExpiryScheduler
+from services.llm_scheduler import LLMScheduler
+from services.llm_service import GroqLLMService
+from services.notification_dispatcher import NotificationDispatcher
+
+SYMPTOMS = ("у меня болит голова", "болит горло и кашель", "температура 38", "заложен нос", "болит живот")
+UNCLEAR = ("ну и дела", "привет", "помоги мне", "что скажешь")
+
+
+def _workload(count: int, users: int, seed: int = 0) -> list:
+    """Смесь входящих сообщений и нажатий кнопок, близкая к реальной"""
+    rng = random.Random(seed)
+    updates = []
+    for i in range(count):
+        user_id = rng.randrange(users)
+        roll = rng.random()
+        if roll < 0.25:
+            updates.append(("message", message_update(user_id, f"лекарство Препарат{i} {i % 12 + 1:02d}.27 x{i % 5 + 1}")))
+        elif roll < 0.50:
+            updates.append(("message", message_update(user_id, rng.choice(SYMPTOMS))))
+        elif roll < 0.60:
+            updates.append(("message", message_update(user_id, "моя аптечка")))
+        elif roll < 0.70:
+            updates.append(("message", message_update(user_id, "сроки годности")))
+        elif roll < 0.80:
+            updates.append(("message", message_update(user_id, rng.choice(UNCLEAR))))
+        else:
+            updates.append(("button", callback_update(user_id, rng.choice(("list_meds", "list_courses")))))
+    return updates
+
+
+def _bot(database_path: str, stub: GroqStub, telegram_bot: FakeTelegramBot) -> MedicineBot:
+    bot = MedicineBot()
+    bot.db_repository = DatabaseRepository(database_path)
+    bot.expiry_scheduler = ExpiryScheduler(bot.db_repository)
+    # Заглушка не ограничивает частоту запросов, поэтому и планировщик не ограничивает
+    scheduler = LLMScheduler(requests_per_minute=1e6, tokens_per_minute=1e9, user_queue_depth=1000, max_queue_size=100000)
+    bot.llm_service = GroqLLMService(
+        "benchmark-key", "benchmark-model", api_url=stub.url, retry_backoff=0.01, scheduler=scheduler
+    )
+    # Лимиты Telegram здесь не моделируются: измеряется собственная работа бота
+    bot.notification_dispatcher = NotificationDispatcher(telegram_bot, global_rate=1e6, per_chat_interval=0, workers=32)
+    return bot
+
+
+async def handler_benchmark(directory: str, args) -> dict:
+    stub = await GroqStub(args.llm_latency, args.llm_error_rate).start()
+    bot = _bot(os.path.join(directory, "handlers.db"), stub, FakeTelegramBot())
+    await bot.db_repository.create_tables()
+    await bot.llm_service.start()
+
+    updates = _workload(args.messages, args.users)
+    latencies = []
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def handle(kind, update):
+        async with semaphore:
+            started = time.perf_counter()
+            if kind == "message":
+                await bot.handle_message(update, None)
+            else:
+                await bot.button(update, None)
+            latencies.append(time.perf_counter() - started)
+
+    with Timer() as timer:
+        await asyncio.gather(*(handle(kind, update) for kind, update in updates))
+
+    await bot.llm_service.close()
+    await stub.close()
+    return {
+        "messages": len(updates),
+        "messages_per_second": round(len(updates) / timer.seconds, 1),
+        "latency": latency_summary(latencies),
+        "llm_calls_per_message": round(stub.calls / len(updates), 3),
+        "llm_cache": bot.llm_service.cache.stats(),
+        "user_cache_hit_ratio": round(bot.db_repository.cache.hit_ratio, 3),
+    }
+
+
+def _fill_medications(path: str, size: int, today: date) -> None:
+    # Сроки годности равномерно на два года вперёд, 2% уже просрочены
+    rng = random.Random(size)
+    rows = []
+    for i in range(size):
+        days = -rng.randint(1, 30) if rng.random() < 0.02 else rng.randint(1, 730)
+        expiry = (today + timedelta(days=days)).isoformat()
+        rows.append((i % max(size // 20, 1), f"Препарат-{i}", expiry, today.isoformat()))
+    from parsers.medication_name import canonical_name
+    from repositories.database_repository import next_event_date
+    with sqlite3.connect(path) as conn:
+        conn.executemany(
+            "INSERT INTO medications (user_id, name, canonical_name, expiry_date, quantity, added_date, next_event_date) "
+            "VALUES (?, ?, ?, ?, 1, ?, ?)",
+            ((user_id, name, canonical_name(name), expiry, added, next_event_date(expiry, today))
+             for user_id, name, expiry, added in rows)
+        )
+
+
+async def reminder_benchmark(directory: str, size: int) -> dict:
+    path = os.path.join(directory, f"reminders_{size}.db")
+    stub = await GroqStub().start()
+    telegram_bot = FakeTelegramBot()
+    bot = _bot(path, stub, telegram_bot)
+    await bot.db_repository.create_tables()
+    _fill_medications(path, size, date.today())
+
+    with Timer() as timer:
+        await check_reminders(bot)
+    with Timer() as repeat_timer:
+        await check_reminders(bot)
+
+    await bot.notification_dispatcher.close()
+    await stub.close()
+    return {
+        "medications": size,
+        "pass_seconds": round(timer.seconds, 3),
+        "repeat_pass_seconds": round(repeat_timer.seconds, 3),
+        "messages_sent": len(telegram_bot.sent),
+    }
+
+
+async def run(args) -> dict:
+    with tempfile.TemporaryDirectory() as directory:
+        results = {"handlers": await handler_benchmark(directory, args), "reminders": {}}
+        for size in args.reminder_sizes:
+            results["reminders"][str(size)] = await reminder_benchmark(directory, size)
+        await dispose_engines()
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="задержка заглушки Groq, секунды")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0, help="доля ответов 503 от заглушки Groq")
+    parser.add_argument(
+        "--reminder-sizes", type=lambda value: [int(size) for size in value.split(",")],
+        default=[10_000, 100_000, 1_000_000]
+    )
+    parser.add_argument("--output", help="файл JSON для результатов")
+    parser.add_argument("--compare", help="файл JSON предыдущего прогона для сравнения")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> dict:
+    args = parse_args(argv)
+    # Построчные логи обработчиков искажают замеры
+    logging.getLogger().setLevel(logging.WARNING)
+    results = asyncio.run(run(args))
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            print("\n".join(compare_results(json.load(f), results)))
+    if args.output:
+        write_results(results, args.output)
+    return results
+
+
+if __name__ == "__main__":
+    main()
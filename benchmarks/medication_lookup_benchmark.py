@@ -0,0 +1,93 @@
+"""
+Поиск лекарства аптечки по неточному названию ("принял парацитамол").
+
+Сравнивается триграммный индекс (MedicationNameIndex) с линейным просмотром
+всей аптечки с тем же сходством Жаккара и с difflib. Названия — случайные
+из слогов, запросы — названия аптечки с одной опечаткой. Отдельно измеряется
+построение индекса: он строится заново после каждой записи в аптечку.
+
+    python benchmarks/medication_lookup_benchmark.py
+"""
+import difflib
+import logging
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from constants import MEDICATION_MATCH_THRESHOLD
+from parsers.medication_name import canonical_name, name_trigrams
+from repositories.database_repository import Medication
+from repositories.medication_name_index import MedicationNameIndex
+
+SIZES = (100, 1000, 10_000)
+QUERIES = 500
+SYLLABLES = ("ас", "пи", "рин", "ну", "ро", "фен", "па", "ра", "це", "та", "мол", "ибу", "про", "сме", "кта",
+             "ло", "ра", "та", "дин", "цит", "ра", "мон", "ан", "аль", "гин", "ви", "та", "мин", "ко", "дер")
+
+
+def _cabinet(size: int, rng: random.Random) -> list:
+    names = set()
+    while len(names) < size:
+        names.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(3, 4))).capitalize())
+    return [Medication(id=i, name=name, canonical_name=canonical_name(name), expiry_date="2030-01-31", quantity=1)
+            for i, name in enumerate(sorted(names))]
+
+
+def _typo(name: str, rng: random.Random) -> str:
+    position = rng.randrange(len(name))
+    return name[:position] + rng.choice("аеиоуклмнрст") + name[position + 1:]
+
+
+def _linear_trigrams(cabinet: list, trigrams: list, query: str):
+    query_trigrams = name_trigrams(canonical_name(query))
+    best, best_similarity = None, MEDICATION_MATCH_THRESHOLD
+    for med, med_trigrams in zip(cabinet, trigrams):
+        shared = len(query_trigrams & med_trigrams)
+        similarity = shared / (len(query_trigrams) + len(med_trigrams) - shared)
+        if similarity >= best_similarity:
+            best, best_similarity = med, similarity
+    return best
+
+
+def _linear_difflib(cabinet: list, query: str):
+    query = canonical_name(query)
+    return max(cabinet, key=lambda med: difflib.SequenceMatcher(None, query, med.canonical_name).ratio())
+
+
+def _measure(function, queries: list) -> tuple:
+    timings, found = [], []
+    for query in queries:
+        started = time.perf_counter()
+        found.append(function(query))
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings), found
+
+
+def main() -> None:
+    logging.getLogger().setLevel(logging.WARNING)
+    rng = random.Random(0)
+    for size in SIZES:
+        cabinet = _cabinet(size, rng)
+        started = time.perf_counter()
+        index = MedicationNameIndex(cabinet)
+        build = time.perf_counter() - started
+        targets = [rng.choice(cabinet) for _ in range(QUERIES)]
+        queries = [_typo(med.name, rng) for med in targets]
+
+        indexed, found = _measure(lambda query: (index.search(query, limit=1) or [(None, 0)])[0][0], queries)
+        accuracy = sum(med is target for med, target in zip(found, targets)) / QUERIES
+        trigrams = [name_trigrams(med.canonical_name) for med in cabinet]
+        linear, _ = _measure(lambda query: _linear_trigrams(cabinet, trigrams, query), queries)
+        print(f"cabinet {size}: index p50 {indexed * 1e6:.0f} us (top-1 accuracy {accuracy:.0%}), "
+              f"linear trigram scan {linear * 1e6:.0f} us, index build {build * 1000:.1f} ms")
+        if size <= 1000:
+            scan, _ = _measure(lambda query: _linear_difflib(cabinet, query), queries[:100])
+            print(f"cabinet {size}: linear difflib scan p50 {scan * 1e6:.0f} us")
+
+
+if __name__ == "__main__":
+    main()
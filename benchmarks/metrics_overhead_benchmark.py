@@ -0,0 +1,95 @@
+"""
+Накладные расходы метрик на пути обработки апдейта.
+
+Одна и та же смесь сообщений прогоняется через handle_message/button поочерёдно
+с включённым и выключенным REGISTRY.enabled; заглушка Groq отвечает без задержки,
+поэтому доля накладных расходов здесь максимальна. Отдельно замеряется цена
+одного вызова обёртки timed.
+"""
+import asyncio
+import logging
+import os
+import statistics
+import tempfile
+import time
+
+from harness import FakeTelegramBot, GroqStub
+from load_test import _bot, _workload
+from repositories.database_repository import dispose_engines
+from services.metrics import REGISTRY, MetricsRegistry, timed
+
+MESSAGES = 1000
+USERS = 100
+ROUNDS = 7
+
+
+async def handler_round(bot, updates) -> float:
+    started = time.perf_counter()
+    for kind, update in updates:
+        if kind == "message":
+            await bot.handle_message(update, None)
+        else:
+            await bot.button(update, None)
+    return time.perf_counter() - started
+
+
+async def wrapper_cost(calls: int = 200_000) -> float:
+    registry = MetricsRegistry()
+    histogram = registry.histogram("noop_seconds", "", ("op",))
+
+    async def noop():
+        return None
+
+    wrapped = timed(histogram, op="noop")(noop)
+    started = time.perf_counter()
+    for _ in range(calls):
+        await noop()
+    plain = time.perf_counter() - started
+    started = time.perf_counter()
+    for _ in range(calls):
+        await wrapped()
+    return (time.perf_counter() - started - plain) / calls
+
+
+async def main() -> None:
+    logging.getLogger().setLevel(logging.WARNING)
+    with tempfile.TemporaryDirectory() as directory:
+        stub = await GroqStub(latency=0).start()
+        bot = _bot(os.path.join(directory, "overhead.db"), stub, FakeTelegramBot())
+        await bot.db_repository.create_tables()
+        await bot.llm_service.start()
+
+        # Прогрев: наполнение аптечек и кэшей, чтобы раунды были одинаковыми
+        await handler_round(bot, _workload(MESSAGES, USERS, seed=1))
+        updates = _workload(MESSAGES, USERS, seed=2)
+        timings = {True: [], False: []}
+        for _ in range(ROUNDS):
+            for enabled in (False, True):
+                REGISTRY.enabled = enabled
+                timings[enabled].append(await handler_round(bot, updates))
+        REGISTRY.enabled = True
+
+        await bot.llm_service.close()
+        await stub.close()
+        await dispose_engines()
+
+    disabled = statistics.median(timings[False])
+    enabled = statistics.median(timings[True])
+    per_update = disabled / len(updates)
+    # Замеры «вкл/выкл» в пределах шума, поэтому оценка сверху: число замеров на апдейт × цена обёртки
+    series_per_update = sum(
+        child.count for metric in REGISTRY._metrics.values() for child in metric._children.values()
+        if hasattr(child, "observe")
+    ) / (len(updates) * (ROUNDS + 1))
+    cost = await wrapper_cost()
+    print(f"updates per round: {len(updates)}")
+    print(f"handler round, metrics off: {disabled * 1000:.1f} ms ({per_update * 1e6:.0f} us/update)")
+    print(f"handler round, metrics on: {enabled * 1000:.1f} ms")
+    print(f"overhead: {(enabled - disabled) / disabled * 100:+.2f}%")
+    print(f"timed wrapper cost: {cost * 1e9:.0f} ns/call")
+    print(f"observations per update: {series_per_update:.1f}")
+    print(f"estimated overhead: {series_per_update * cost / per_update * 100:.2f}%")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,99 @@
+"""
+Размер промпта рекомендации и время ответа для аптечек из 5, 50 и 500 лекарств:
+вся аптечка в промпте (как раньше) против короткого списка из IndicationIndex.
+
+Аптечка заполняется названиями из data/indications.tsv и неизвестными индексу
+препаратами, часть названий повторяется. Заглушка Groq тратит на промпт
+PROMPT_TOKEN_COST секунд на токен (токен ≈ 3 символа) поверх постоянной задержки.
+"""
+import asyncio
+import logging
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from harness import FakeTelegramBot, GroqStub, approx_tokens
+from load_test import _bot
+from repositories.database_repository import Medication, dispose_engines
+from services.indication_index import INDICATIONS_PATH
+
+CABINET_SIZES = (5, 50, 500)
+LLM_LATENCY = 0.2
+PROMPT_TOKEN_COST = 0.0005
+REQUESTS = 10
+SYMPTOMS = ("болит голова", "температура и ломота", "заложен нос", "сухой кашель", "изжога после еды")
+
+
+def _known_names():
+    names = []
+    with open(INDICATIONS_PATH, encoding="utf-8") as f:
+        for line in f:
+            if line.strip() and not line.startswith("#"):
+                names.extend(line.split("\t")[0].split("|"))
+    return names
+
+
+def _cabinet(size: int, rng: random.Random):
+    known = _known_names()
+    medications = []
+    for i in range(size):
+        if rng.random() < 0.7:
+            name = f"{rng.choice(known).capitalize()} {rng.choice(('', '200 мг', '500 мг', 'форте'))}".strip()
+        else:
+            name = f"Препарат {rng.randrange(size)}"
+        medications.append(Medication(name=name, expiry_date="2030-01-31", quantity=1))
+    return medications
+
+
+async def _measure(bot, stub, user_id: int, label: str):
+    latencies, tokens = [], []
+    for i in range(REQUESTS):
+        started = time.perf_counter()
+        await bot._process_message(user_id, f"{SYMPTOMS[i % len(SYMPTOMS)]}, {label} {i}")
+        latencies.append(time.perf_counter() - started)
+        tokens.append(approx_tokens(stub.prompts[-1]))
+    return statistics.median(tokens), statistics.median(latencies)
+
+
+async def main() -> None:
+    logging.getLogger().setLevel(logging.WARNING)
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as directory:
+        stub = await GroqStub(latency=LLM_LATENCY, prompt_token_cost=PROMPT_TOKEN_COST).start()
+        bot = _bot(os.path.join(directory, "prompt.db"), stub, FakeTelegramBot())
+        await bot.db_repository.create_tables()
+        await bot.llm_service.start()
+
+        # Прогрев соединения с заглушкой и кэшей до замеров
+        await bot.db_repository.add_medication(0, "Парацетамол", "2030-01-31", 1)
+        await bot._process_message(0, "болит голова, прогрев")
+
+        index = bot.indication_index
+        for size in CABINET_SIZES:
+            await bot.db_repository.add_medications_many(size, _cabinet(size, rng))
+
+            bot.indication_index = type("WholeCabinet", (), {"shortlist": lambda self, text, meds: [m.name for m in meds]})()
+            full_tokens, full_latency = await _measure(bot, stub, size, "случай")
+            bot.indication_index = index
+            short_tokens, short_latency = await _measure(bot, stub, size, "вариант")
+            started = time.perf_counter()
+            medications = await bot.db_repository.list_medications(size)
+            for i in range(1000):
+                index.shortlist(SYMPTOMS[i % len(SYMPTOMS)], medications)
+            shortlist_us = (time.perf_counter() - started) / 1000 * 1e6
+
+            print(
+                f"cabinet {size}: prompt tokens {full_tokens:.0f} -> {short_tokens:.0f}, "
+                f"latency {full_latency * 1000:.0f} ms -> {short_latency * 1000:.0f} ms, "
+                f"shortlist {shortlist_us:.0f} us"
+            )
+
+        await bot.llm_service.close()
+        await stub.close()
+        await dispose_engines()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,107 @@
+"""
+Проход напоминаний одной и четырьмя репликами (процессами) над общей базой SQLite.
+
+Реплики делят проход на шарды пользователей через аренду в reminder_leases
+(ShardedReminderRunner). Отправка в Telegram заменена заглушкой с задержкой
+SEND_DELAY; длительность прохода — от общего старта до конца последнего шарда.
+
+    python benchmarks/reminder_shards_benchmark.py
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import tempfile
+import time
+from datetime import date, timedelta
+
+import harness  # noqa: F401 — фиктивные токены для config.py и путь к модулям бота
+from main import MedicineBot, check_reminders
+from repositories.database_repository import DatabaseRepository, Medication, dispose_engines
+from services.expiry_scheduler import ExpiryScheduler
+from services.notification_dispatcher import NotificationDispatcher
+from services.reminder_shards import ShardedReminderRunner
+
+USERS = 600
+SHARDS = 16
+SEND_DELAY = 0.02
+WORKERS = (1, 2, 4)
+
+
+class DelayedBot:
+    def __init__(self):
+        self.sent = 0
+
+    async def send_message(self, chat_id, text):
+        await asyncio.sleep(SEND_DELAY)
+        self.sent += 1
+
+
+async def _seed(path: str) -> None:
+    repository = DatabaseRepository(path)
+    await repository.create_tables()
+    today = date.today()
+    for user_id in range(1, USERS + 1):
+        await repository.add_medications_many(user_id, [
+            Medication(name="Аспирин", expiry_date=(today + timedelta(days=60)).isoformat(), quantity=1),
+            Medication(name="Анальгин", expiry_date=(today - timedelta(days=1)).isoformat(), quantity=1),
+        ])
+    await dispose_engines()
+
+
+async def _worker_pass(path: str, owner: str, barrier) -> tuple:
+    logging.getLogger().setLevel(logging.WARNING)
+    bot = MedicineBot()
+    bot.db_repository = DatabaseRepository(path)
+    bot.expiry_scheduler = ExpiryScheduler(bot.db_repository)
+    bot.notification_dispatcher = NotificationDispatcher(DelayedBot(), global_rate=1e6, per_chat_interval=0, workers=4)
+    finished = 0.0
+
+    async def process_shard(shard, shards):
+        nonlocal finished
+        await check_reminders(bot, shard, shards)
+        finished = time.time()
+
+    runner = ShardedReminderRunner(bot.db_repository, process_shard, SHARDS, owner, lease_ttl=5)
+    await bot.db_repository.pending_reminder_shards(SHARDS, 1)  # соединение открывается до старта замера
+    barrier.wait()
+    started = time.time()
+    await runner.run_pass(pass_number=1)
+    await bot.notification_dispatcher.close()
+    await dispose_engines()
+    return started, finished, bot.notification_dispatcher.bot.sent
+
+
+def _worker(path: str, owner: str, barrier, results) -> None:
+    results.put(asyncio.run(_worker_pass(path, owner, barrier)))
+
+
+def _run(path: str, workers: int) -> tuple:
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(workers)
+    results = context.Queue()
+    processes = [context.Process(target=_worker, args=(path, f"worker-{i}", barrier, results)) for i in range(workers)]
+    for process in processes:
+        process.start()
+    outcome = [results.get(timeout=300) for _ in processes]
+    for process in processes:
+        process.join()
+    # Реплика без шардов не обновляет finished, её учитывать не нужно
+    duration = max(item[1] for item in outcome) - min(item[0] for item in outcome)
+    return duration, sum(item[2] for item in outcome)
+
+
+def main() -> None:
+    logging.getLogger().setLevel(logging.WARNING)
+    baseline = None
+    with tempfile.TemporaryDirectory() as directory:
+        for workers in WORKERS:
+            path = os.path.join(directory, f"reminders_{workers}.db")
+            asyncio.run(_seed(path))
+            duration, sent = _run(path, workers)
+            baseline = baseline or duration
+            print(f"reminder pass, {workers} workers: {duration:.2f} s, {sent} digests, speedup {baseline / duration:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
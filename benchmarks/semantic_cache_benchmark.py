@@ -0,0 +1,104 @@
+"""
+Семантический кэш рекомендаций (SemanticCache).
+
+Измеряется:
+- задержка поиска (векторизация жалобы + косинус по строкам подборки) при 10k и 100k записей
+  и при 100k записях одной подборки, когда умножается вся матрица;
+- доля попаданий на корпусе перефразировок data/symptom_paraphrases.tsv при разных
+  порогах сходства и доля ошибочных попаданий в ответ на другую жалобу;
+- для сравнения — доля попаданий кэша по точному тексту промпта.
+
+    python benchmarks/semantic_cache_benchmark.py
+"""
+import logging
+import os
+import random
+import statistics
+import sys
+import time
+from collections import OrderedDict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from constants import SEMANTIC_CACHE_THRESHOLD
+from services.completion_cache import make_cache_key
+from services.semantic_cache import SemanticCache, SymptomVectorizer
+
+PARAPHRASES_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "symptom_paraphrases.tsv")
+SIZES = (10_000, 100_000)
+LOOKUPS = 1000
+# Разных подборок лекарств в заполненном кэше; худший случай — одна подборка на все записи
+FINGERPRINTS = 500
+
+
+def _groups() -> "OrderedDict[str, list]":
+    groups = OrderedDict()
+    with open(PARAPHRASES_PATH, encoding="utf-8") as f:
+        for line in f:
+            if line.strip() and not line.startswith("#"):
+                group, phrase = line.rstrip("\n").split("\t")
+                groups.setdefault(group, []).append(phrase)
+    return groups
+
+
+def _hit_rate(vectorizer: SymptomVectorizer, groups, threshold: float) -> tuple:
+    cache = SemanticCache(max_size=len(groups), threshold=threshold, vectorizer=vectorizer)
+    for group, phrases in groups.items():
+        cache.set(phrases[0], 0, 0, group)
+    queries = [(group, phrase) for group, phrases in groups.items() for phrase in phrases[1:]]
+    answers = [(group, cache.get(phrase, 0, 0)) for group, phrase in queries]
+    hits = sum(1 for group, answer in answers if answer == group)
+    wrong = sum(1 for group, answer in answers if answer not in (None, group))
+    return hits / len(queries), wrong / len(queries)
+
+
+def main() -> None:
+    logging.getLogger().setLevel(logging.WARNING)
+    rng = random.Random(0)
+    vectorizer = SymptomVectorizer()
+    groups = _groups()
+    phrases = [phrase for items in groups.values() for phrase in items]
+    words = sorted({word for phrase in phrases for word in phrase.replace(",", "").split()})
+
+    for size, fingerprints in [(size, FINGERPRINTS) for size in SIZES] + [(SIZES[-1], 1)]:
+        cache = SemanticCache(max_size=size, vectorizer=vectorizer)
+        started = time.perf_counter()
+        # Строки заполняются напрямую: set() ищет похожую запись для замены, и заполнение
+        # 100k записей через него заняло бы минуты, а в боте запись следует за ответом LLM
+        expires_at = time.time() + cache.ttl
+        for row in range(size):
+            # Случайные жалобы из слов корпуса, разложенные по подборкам лекарств
+            vector = vectorizer.vectorize(" ".join(rng.sample(words, 3)))
+            key = cache._key("", 0, rng.randrange(fingerprints))
+            cache._write(cache._free_row(0), vector, key, f"ответ {row}", expires_at)
+        fill = time.perf_counter() - started
+        queries = [(rng.choice(phrases), rng.randrange(fingerprints)) for _ in range(LOOKUPS)]
+        timings = []
+        for text, fingerprint in queries:
+            started = time.perf_counter()
+            cache.get(text, 0, fingerprint)
+            timings.append(time.perf_counter() - started)
+        timings.sort()
+        print(f"lookup at {size} entries, {fingerprints} cabinets: p50 {statistics.median(timings) * 1e6:.0f} us, "
+              f"p99 {timings[int(len(timings) * 0.99)] * 1e6:.0f} us "
+              f"(fill {fill:.1f} s, matrix {cache._vectors.nbytes / 2 ** 20:.0f} MiB)")
+
+    started = time.perf_counter()
+    for phrase in phrases * 10:
+        vectorizer.vectorize(phrase)
+    print(f"vectorize: {(time.perf_counter() - started) / (len(phrases) * 10) * 1e6:.0f} us/complaint")
+
+    queries = sum(len(items) - 1 for items in groups.values())
+    print(f"paraphrase corpus: {len(groups)} complaints, {queries} paraphrases")
+    for threshold in sorted({0.6, 0.65, 0.7, SEMANTIC_CACHE_THRESHOLD, 0.8}):
+        hits, wrong = _hit_rate(vectorizer, groups, threshold)
+        print(f"hit rate at threshold {threshold:.2f}: {hits:.0%} (wrong answers {wrong:.1%})")
+
+    # Кэш по точному промпту попадает только при совпадении текста после нормализации пробелов
+    seeds = {make_cache_key("model", 150, items[0]) for items in groups.values()}
+    exact = sum(1 for items in groups.values() for phrase in items[1:] if make_cache_key("model", 150, phrase) in seeds)
+    print(f"hit rate of exact prompt cache: {exact / queries:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Время до первого видимого текста рекомендации: ответ целиком против потокового.
+
+Заглушка Groq отвечает после LLM_LATENCY и выдаёт ответ по словам с паузой
+TOKEN_INTERVAL. В обычном режиме пользователь видит текст только после конца
+генерации; в потоковом — заглушку сразу и первые слова после первого фрагмента.
+"""
+import asyncio
+import logging
+import os
+import statistics
+import tempfile
+import time
+
+from harness import FakeMessage, FakeTelegramBot, GroqStub
+from load_test import _bot
+from repositories.database_repository import dispose_engines
+
+LLM_LATENCY = 0.3
+TOKEN_INTERVAL = 0.02
+REQUESTS = 10
+
+
+def _ms(values) -> str:
+    return f"{statistics.median(values) * 1000:.0f} ms"
+
+
+async def main() -> None:
+    logging.getLogger().setLevel(logging.WARNING)
+    with tempfile.TemporaryDirectory() as directory:
+        stub = await GroqStub(latency=LLM_LATENCY, token_interval=TOKEN_INTERVAL).start()
+        bot = _bot(os.path.join(directory, "streaming.db"), stub, FakeTelegramBot())
+        await bot.db_repository.create_tables()
+        await bot.llm_service.start()
+        await bot.db_repository.add_medication(1, "Парацетамол", "2030-01-31", 1)
+
+        blocking = []
+        for i in range(REQUESTS):
+            started = time.perf_counter()
+            await bot._process_message(1, f"болит голова, случай {i}")
+            blocking.append(time.perf_counter() - started)
+
+        first_text, total, edits = [], [], []
+        for i in range(REQUESTS):
+            message = FakeMessage(1, "")
+            started = time.perf_counter()
+            await bot._process_message(1, f"болит голова, поток {i}", message)
+            sent = message.sent[0]
+            first_text.append(sent.edits[0][0] - started)
+            total.append(sent.edits[-1][0] - started)
+            edits.append(len(sent.edits))
+
+        await bot.llm_service.close()
+        await stub.close()
+        await dispose_engines()
+
+    print(f"blocking reply: first visible text {_ms(blocking)}, total {_ms(blocking)}")
+    print(f"streaming reply: placeholder immediately, first LLM text {_ms(first_text)}, total {_ms(total)}")
+    print(f"edits per streamed reply: {statistics.median(edits):.0f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
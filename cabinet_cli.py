@@ -0,0 +1,60 @@
+"""
+Импорт и экспорт аптечки из командной строки, без запуска бота.
+
+    python cabinet_cli.py import --user 123456 cabinet.csv
+    python cabinet_cli.py export --user 123456 --format json cabinet.json
+    python cabinet_cli.py export --user 123456 -   # CSV в stdout
+"""
+import argparse
+import asyncio
+import os
+import sys
+from dotenv import load_dotenv
+from formatters.message_formatter import MessageFormatter
+from parsers.cabinet_file import cabinet_format
+from repositories.database_repository import DatabaseRepository, dispose_engines
+from services.cabinet_transfer import export_cabinet, export_cabinet_file, import_cabinet_file
+
+
+def _parser() -> argparse.ArgumentParser:
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Импорт и экспорт аптечки файлом CSV или JSON")
+    # config.py не импортируется: он требует токены бота, которые здесь не нужны
+    parser.add_argument("--database", default=os.getenv("DATABASE_URI", "app.db"), help="файл SQLite (по умолчанию DATABASE_URI)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    for name, help_text in (("import", "загрузить файл в аптечку"), ("export", "выгрузить аптечку и курсы")):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument("--user", type=int, required=True, help="Telegram ID пользователя")
+        command.add_argument("--format", choices=("csv", "json"), help="по умолчанию — по расширению файла")
+        command.add_argument("path", help="путь к файлу; '-' — stdout при экспорте")
+    return parser
+
+
+async def _run(args: argparse.Namespace) -> int:
+    file_format = args.format or cabinet_format(args.path) or ("csv" if args.path == "-" else None)
+    if not file_format:
+        print("Не удалось определить формат по расширению, укажите --format", file=sys.stderr)
+        return 2
+    repository = DatabaseRepository(args.database)
+    await repository.create_tables()
+    try:
+        if args.command == "import":
+            result = await import_cabinet_file(repository, args.user, args.path, file_format)
+            print(MessageFormatter.format_import_result(result))
+            return 1 if result.aborted else 0
+        if args.path == "-":
+            count = await export_cabinet(repository, args.user, sys.stdout, file_format)
+        else:
+            count = await export_cabinet_file(repository, args.user, args.path, file_format)
+        print(f"Выгружено записей: {count}", file=sys.stderr)
+        return 0
+    finally:
+        await dispose_engines()
+
+
+def main() -> None:
+    sys.exit(asyncio.run(_run(_parser().parse_args())))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,7 @@
 
 from dotenv import load_dotenv
 import os
+import re
 
 load_dotenv()
 
@@ -9,7 +10,14 @@ load_dotenv()
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 DATABASE_URI = os.getenv("DATABASE_URI", "app.db")  # Используем SQLite база данных 
+DATABASE_ECHO = os.getenv("DATABASE_ECHO", "").lower() in ("1", "true", "yes")  # Логирование SQL-запросов
 LLM_MODEL = os.getenv("LLM_MODEL", "mixtral-8x7b-32768")  # Модель LLM для использования через Groq API
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH")  # Файл SQLite для кэша ответов LLM (по умолчанию кэш только в памяти)
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")  # Публичный HTTPS-адрес webhook; если не задан — режим polling
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8443"))
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")  # Проверяется в заголовке X-Telegram-Bot-Api-Secret-Token; обязателен при WEBHOOK_URL
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))  # Порт /metrics на 127.0.0.1; 0 — отключить
 
 # Список разрешенных пользователей (их Telegram ID)
 ALLOWED_USERS = list(map(int, os.getenv("ALLOWED_USERS", "").split(","))) if os.getenv("ALLOWED_USERS") else []
@@ -18,4 +26,9 @@ ALLOWED_USERS = list(map(int, os.getenv("ALLOWED_USERS", "").split(","))) if os.
 if not TELEGRAM_BOT_TOKEN:
     raise ValueError("TELEGRAM_BOT_TOKEN не установлен в .env файле")
 if not GROQ_API_KEY:
-    raise ValueError("GROQ_API_KEY не установлен в .env файле")
\ No newline at end of file
+    raise ValueError("GROQ_API_KEY не установлен в .env файле")
+# Без секрета любой, кто достучится до порта webhook, подделает апдейт от имени разрешённого пользователя
+if WEBHOOK_URL and not WEBHOOK_SECRET:
+    raise ValueError("WEBHOOK_SECRET не установлен в .env файле: он обязателен в режиме webhook")
+if WEBHOOK_SECRET and not re.fullmatch(r"[A-Za-z0-9_-]{1,256}", WEBHOOK_SECRET):
+    raise ValueError("WEBHOOK_SECRET: от 1 до 256 символов A-Z, a-z, 0-9, _ и -")
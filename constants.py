@@ -2,11 +2,98 @@
 REMINDER_CHECK_INTERVAL = 86400  # 24 часа
 EXPIRY_WARNING_DAYS = 60
 REMINDER_INTERVAL_DAYS = 14
+EXPIRY_PAGE_SIZE = 30  # лекарств на странице списка сроков годности
+LIST_PAGE_SIZE = 20  # лекарств или курсов на странице аптечки; страница укладывается в лимит Telegram 4096 символов
 
 # Ограничения
 MAX_CACHE_SIZE = 100
+LLM_CACHE_TTL = 24 * 3600  # секунды
+USER_CACHE_MAX_USERS = 1000  # пользователей в кэше списков лекарств и курсов
+USER_CACHE_TTL = 30  # секунды; изменения, сделанные другой репликой, видны не позже чем через столько
 DEFAULT_MAX_TOKENS = 150
 MEDICATION_NAME_MAX_LENGTH = 100
+MEDICATION_NAME_TRANSLITERATE = True  # латинские названия ("Aspirin") сводятся к кириллическим при сравнении
+MEDICATION_MATCH_THRESHOLD = 0.3  # минимальное сходство триграмм для поиска лекарства по неточному названию
+
+# База данных (SQLite)
+DB_BUSY_TIMEOUT_MS = 5000  # ожидание блокировки записи вместо ошибки "database is locked"
+DB_MMAP_SIZE = 256 * 1024 * 1024
+DB_POOL_SIZE = 5
+DB_MAX_OVERFLOW = 10
+DB_POOL_TIMEOUT = 30  # секунды ожидания свободного соединения
+
+# Напоминания о приёме по курсам
+DOSE_LATE_TOLERANCE = 30 * 60  # секунды; пропущенный сильнее приём (бот был остановлен) не напоминается
+DOSE_REBUILD_INTERVAL = 3600  # секунды между перечитыванием курсов из базы
+DOSE_UPDATE_CHUNK = 5000  # курсов в одном UPDATE переноса приёмов (3 параметра на курс, лимит SQLite 32766)
+SQL_IN_CHUNK = 10000  # id в одном условии IN (...): тоже не больше лимита SQLite 32766 параметров
+
+# Исходящие уведомления (лимиты Telegram: ~30 сообщений/с всего и ~1 сообщение/с в чат)
+TELEGRAM_GLOBAL_RATE = 30
+TELEGRAM_PER_CHAT_INTERVAL = 1.0
+NOTIFICATION_WORKERS = 8
+NOTIFICATION_MAX_RETRIES = 3
+NOTIFICATION_QUEUE_SIZE = 10000
+SENT_REMINDERS_RETENTION_DAYS = 90
+
+# Проход напоминаний делится между репликами по шардам user_id; шард берётся в аренду через БД
+REMINDER_PASS_INTERVAL = 3600  # секунды между проходами
+REMINDER_SHARDS = 16
+REMINDER_LEASE_TTL = 60  # секунды; владелец продлевает аренду каждую треть срока
+
+# Локальный классификатор намерений: ниже этого порога намерение уточняется у LLM
+INTENT_CONFIDENCE_THRESHOLD = 0.6
+
+# HTTP-клиент LLM
+LLM_API_URL = "https://api.groq.com/v1/llm"
+LLM_CONNECT_TIMEOUT = 5  # секунды
+LLM_READ_TIMEOUT = 30
+LLM_MAX_RETRIES = 3
+LLM_RETRY_BACKOFF = 0.5  # базовая задержка экспоненциального повтора, секунды
+LLM_CONNECTION_LIMIT = 10  # соединений на хост
+LLM_KEEPALIVE_TIMEOUT = 60
+LLM_CIRCUIT_FAILURE_THRESHOLD = 5
+LLM_CIRCUIT_RESET_TIMEOUT = 30
+
+# Планировщик запросов к LLM: начальные лимиты уточняются по заголовкам x-ratelimit-* ответов API
+LLM_REQUESTS_PER_MINUTE = 30
+LLM_TOKENS_PER_MINUTE = 30000
+LLM_MAX_CONCURRENCY = 5
+LLM_USER_QUEUE_DEPTH = 3  # запросов одного пользователя в очереди, сверх — отказ
+LLM_QUEUE_MAX_SIZE = 200
+
+# Сколько лекарств аптечки передавать в промпт рекомендации
+RECOMMENDATION_SHORTLIST_SIZE = 10
+
+# Импорт и экспорт аптечки файлом
+IMPORT_CHUNK_SIZE = 5000  # записей в одной транзакции импорта
+IMPORT_MAX_FILE_SIZE = 20 * 1024 * 1024  # байт; больше Bot API не даёт скачать
+IMPORT_MAX_REPORTED_ERRORS = 20  # ошибок в отчёте об импорте, остальные только считаются
+EXPORT_BATCH_SIZE = 1000  # строк на один запрос при выгрузке
+
+# Семантический кэш рекомендаций: похожие жалобы при той же подборке лекарств получают сохранённый ответ
+SEMANTIC_CACHE_SIZE = 10000  # записей; матрица векторов занимает SIZE × DIM × 4 байт
+SEMANTIC_CACHE_DIM = 512  # длина хешированного вектора n-грамм
+SEMANTIC_CACHE_THRESHOLD = 0.7  # минимальный косинус сходства жалоб
+SEMANTIC_CACHE_TTL = 24 * 3600  # секунды
+
+# Потоковые ответы: правки сообщения не чаще интервала и не меньше чем на N символов
+STREAM_EDIT_INTERVAL = 1.0  # секунды
+STREAM_EDIT_MIN_CHARS = 40
+TELEGRAM_MESSAGE_LIMIT = 4096
+
+# Обработка апдейтов: параллельно до UPDATE_CONCURRENCY обработчиков, в одном чате — по порядку
+UPDATE_CONCURRENCY = 32
+UPDATE_MAX_PENDING = 1000  # сверх этого webhook отвечает 503, и Telegram повторяет доставку
+WEBHOOK_PATH = "/telegram"
+WEBHOOK_MAX_CONNECTIONS = 40  # одновременных соединений Telegram к webhook (1–100)
+
+# Метрики и профилирование
+METRICS_HOST = "127.0.0.1"  # /metrics доступен только локально
+METRICS_LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+PROFILER_KEEP_SLOWEST = 10
+PROFILER_SAMPLE_RATE = 0.1  # доля профилируемых апдейтов
+PROFILER_DUMP_DIR = "profiles"
 
 # Шаблоны сообщений
 from enum import Enum
@@ -15,4 +102,12 @@ class Messages(Enum):
     EMPTY_CABINET = "Ваша аптечка пуста."
     ERROR_PROCESSING = "Произошла ошибка при обработке вашего сообщения. Попробуйте позже."
     INVALID_COURSE_FORMAT = "Не удалось распознать данные курса. Пожалуйста, используйте формат: 'курс Название Дозировка Расписание [метод Метод]'."
+    COURSE_SCHEDULE_NOT_RECOGNIZED = "Расписание не распознано, напоминания о приёме приходить не будут. Пример: 'курс Амоксициллин 500мг 08:00 20:00 7 дней'."
+    LLM_UNAVAILABLE = "Сервис рекомендаций временно недоступен. Попробуйте позже."
+    LLM_BUSY = "Сейчас слишком много запросов. Подождите минуту и попробуйте снова."
+    RECOMMENDATION_PLACEHOLDER = "⏳ Подбираю рекомендацию..."
+    RECOMMENDATION_INTERRUPTED = "⚠️ Ответ прерван. Попробуйте повторить запрос позже."
+    IMPORT_UNSUPPORTED_FORMAT = "Пришлите аптечку файлом .csv или .json. Колонки: kind, name, expiry_date, quantity, dosage, schedule, method."
+    IMPORT_FILE_TOO_LARGE = "Файл больше 20 МБ: Telegram не даёт ботам скачивать такие файлы. Разделите его на части."
+    EXPORT_USAGE = "Выгрузка аптечки: /export csv или /export json."
     ACCESS_DENIED = "У вас нет доступа к этому боту. Пожалуйста, обратитесь к администратору." 
\ No newline at end of file
@@ -1,6 +1,6 @@
-from typing import List
+from typing import List, Tuple
 from repositories.database_repository import Medication, Course
-from constants import Messages
+from constants import Messages, TELEGRAM_MESSAGE_LIMIT
 
 class MessageFormatter:
     @staticmethod
@@ -18,7 +18,102 @@ class MessageFormatter:
         if not courses:
             return "У вас пока нет курсов приема лекарств."
         
-        text = "Ваши курсы приема лекарств:\n"
-        for course in courses:
-            text += f"{course.medicine_name} - дозировка {course.dosage}, расписание: {course.schedule}, метод: {course.method}\n"
-        return text 
\ No newline at end of file
+        courses_formatted = "".join(
+            f"{course.medicine_name} - дозировка {course.dosage}, расписание: {course.schedule}, метод: {course.method}\n"
+            for course in courses
+        )
+        return f"Ваши курсы приема лекарств:\n{courses_formatted}"
+
+    @staticmethod
+    def format_dose_reminder(courses: List[Course]) -> str:
+        """Напоминание о приёме по всем курсам пользователя, время которых наступило"""
+        courses_formatted = "\n".join(
+            f"• {course.medicine_name} - {course.dosage}, метод: {course.method}" for course in courses
+        )
+        return f"💊 Время принять лекарства:\n{courses_formatted}"
+
+    @staticmethod
+    def _fit_lines(lines: List[str], budget: int) -> Tuple[str, int]:
+        """Строки, умещающиеся в budget символов, и строка «…и ещё N» вместо остальных; второе — длина текста"""
+        kept, used = [], 0
+        for line in lines:
+            # Запас под строку «…и ещё N»
+            if used + len(line) + 1 > budget - 20:
+                break
+            kept.append(line)
+            used += len(line) + 1
+        if len(kept) < len(lines):
+            kept.append(f"…и ещё {len(lines) - len(kept)}")
+        text = "\n".join(kept)
+        return text, len(text)
+
+    @staticmethod
+    def format_reminder_digest(expired: List[Medication], expiring: List[Tuple[Medication, int]]) -> str:
+        """Одно сообщение со всеми событиями пользователя за проход напоминаний, не длиннее лимита Telegram"""
+        expired_header = (
+            "⚠️ Внимание! Следующие лекарства были автоматически удалены из вашей аптечки, "
+            "так как их срок годности истёк:\n"
+        )
+        expired_footer = "\nПожалуйста, утилизируйте эти лекарства надлежащим образом."
+        expiring_header = "Напоминание о сроках годности:\n"
+        budget = TELEGRAM_MESSAGE_LIMIT - 2
+        if expired:
+            budget -= len(expired_header) + len(expired_footer)
+        if expiring:
+            budget -= len(expiring_header)
+
+        parts = []
+        if expired:
+            lines = [f"• {med.name} (срок годности истёк {med.expiry_date})" for med in expired]
+            # Истёкшим лекарствам — не больше половины места, если есть и истекающие
+            text, used = MessageFormatter._fit_lines(lines, budget // 2 if expiring else budget)
+            budget -= used
+            parts.append(f"{expired_header}{text}{expired_footer}")
+        if expiring:
+            lines = [f"• {med.name} - истекает через {days} дней" for med, days in expiring]
+            text, _ = MessageFormatter._fit_lines(lines, budget)
+            parts.append(f"{expiring_header}{text}")
+        return "\n\n".join(parts)
+
+    @staticmethod
+    def format_added_medications(medications: List, errors: List) -> str:
+        """Итог добавления нескольких лекарств одним сообщением, не длиннее лимита Telegram"""
+        header = f"Добавлено лекарств: {len(medications)}"
+        errors_header = "Не удалось распознать:"
+        budget = TELEGRAM_MESSAGE_LIMIT - len(header) - 2
+        errors_text = ""
+        if errors:
+            budget -= len(errors_header) + 2
+            lines = [f"Строка {error.line_number} ({error.line}): {error.reason}" for error in errors]
+            # Ошибкам — не больше половины места
+            errors_text, used = MessageFormatter._fit_lines(lines, budget // 2)
+            budget -= used
+        lines = [f"• {med.name} - срок годности: {med.expiry_date}, количество: {med.quantity}" for med in medications]
+        text, _ = MessageFormatter._fit_lines(lines, budget)
+        parts = [header, text]
+        if errors:
+            parts += [errors_header, errors_text]
+        return "\n".join(parts)
+
+    @staticmethod
+    def format_expiring_list(expiring: List[Tuple[Medication, int]], has_more: bool = False) -> str:
+        if not expiring:
+            return "Нет лекарств с приближающимся сроком годности."
+
+        expiring_formatted = "\n".join(f"{med.name} - истекает через {days} дней" for med, days in expiring)
+        text = f"Сроки годности:\n{expiring_formatted}"
+        if has_more:
+            text += f"\nПоказаны первые {len(expiring)} лекарств."
+        return text
+
+    @staticmethod
+    def format_import_result(result) -> str:
+        lines = [f"Импортировано лекарств: {result.medications}, курсов: {result.courses}."]
+        if result.error_count:
+            lines.append(f"Пропущено записей с ошибками: {result.error_count}")
+            lines += [f"Строка {error.line_number} ({error.line}): {error.reason}" for error in result.errors]
+            if result.error_count > len(result.errors):
+                lines.append(f"…и ещё {result.error_count - len(result.errors)}")
+        if result.aborted:
+            lines.append(f"Импорт остановлен: {result.aborted}. Записи до этого места сохранены.")
+        return "\n".join(lines)
@@ -1,18 +1,57 @@
 import logging
-from typing import Optional, Callable
+from typing import Optional, Callable, Tuple
 import asyncio
-import aiosqlite
-from datetime import datetime
+from collections import defaultdict
+from datetime import date, datetime
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import Application, CommandHandler, MessageHandler, CallbackContext, CallbackQueryHandler
 from telegram.ext import filters
-from config import TELEGRAM_BOT_TOKEN, GROQ_API_KEY, DATABASE_URI, LLM_MODEL, ALLOWED_USERS
-from constants import Messages
-from repositories.database_repository import DatabaseRepository
-from services.llm_service import GroqLLMService
+from config import (
+    TELEGRAM_BOT_TOKEN, GROQ_API_KEY, DATABASE_URI, DATABASE_ECHO, LLM_MODEL, LLM_CACHE_PATH, METRICS_PORT, ALLOWED_USERS,
+    WEBHOOK_URL, WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_SECRET
+)
+from constants import (
+    Messages, INTENT_CONFIDENCE_THRESHOLD, EXPIRY_PAGE_SIZE, REMINDER_PASS_INTERVAL, WEBHOOK_MAX_CONNECTIONS, WEBHOOK_PATH,
+    IMPORT_MAX_FILE_SIZE
+)
+from repositories.database_repository import DatabaseRepository, dispose_engines
+from services.llm_service import GroqLLMService, LLMOverloadedError, LLMServiceError, LLMUnavailableError
+from services.expiry_scheduler import ExpiryScheduler
+from services.dose_scheduler import DoseScheduler
+from services.intent_classifier import IntentClassifier, INTENTS
+from services.indication_index import IndicationIndex
+from services.notification_dispatcher import NotificationDispatcher
+from services.cabinet_transfer import export_cabinet_file, import_cabinet_file
+from services.progressive_reply import ProgressiveReply
+from services.reminder_shards import ShardedReminderRunner
+from services.semantic_cache import SemanticCache, shortlist_fingerprint
+from services.update_processor import PerUserUpdateProcessor
+from services.webhook_server import WebhookServer
+from services.metrics import (
+    HANDLER_ERRORS,
+    HANDLER_SECONDS,
+    PROFILER,
+    REMINDER_PASS_ERRORS,
+    REMINDER_PASS_SECONDS,
+    MetricsServer,
+    timed,
+)
 from formatters.message_formatter import MessageFormatter
+from parsers.medication_parser import (
+    MEDICATION_COMMAND_PATTERN,
+    ParsedMedication,
+    ParsedTake,
+    iter_medication_entries,
+    parse_medication_message,
+    parse_take_message,
+)
+from parsers.cabinet_file import cabinet_format
+from parsers.schedule_parser import DOSE_TIME_FORMAT, ParsedCourse, parse_course_message, parse_schedule
+import os
 import re
-from calendar import monthrange
+import signal
+import tempfile
+import time
 from telegram.error import TelegramError
 
 # Настройка логирования
@@ -29,34 +68,84 @@ def check_access(func: Callable):
         await update.message.reply_text(Messages.ACCESS_DENIED.value)
     return wrapper
 
+# callback_data кнопок листания: вид списка (m — аптечка, c — курсы), направление и id-курсор,
+# например "m>120" — следующая страница аптечки после лекарства с id 120
+_PAGE_CALLBACK_PATTERN = re.compile(r"([mc])([<>])(\d+)")
+# Вопрос о сроках годности в свободной форме: "покажи сроки годности", "какой срок у лекарств"
+_EXPIRY_REQUEST_PATTERN = re.compile(r"\bсрок(и|ов)?\b", re.IGNORECASE)
+# Частота приёма словами ("три раза в день", "каждое утро"), которую parse_schedule не разбирает
+_SCHEDULE_WORDS_PATTERN = re.compile(r"\bраза?\b|\bкажд", re.IGNORECASE)
+
+def _pagination_keyboard(kind: str, rows: list, has_prev: bool, has_next: bool) -> Optional[InlineKeyboardMarkup]:
+    buttons = []
+    if rows and has_prev:
+        buttons.append(InlineKeyboardButton("◀️ Назад", callback_data=f"{kind}<{rows[0].id}"))
+    if rows and has_next:
+        buttons.append(InlineKeyboardButton("Вперёд ▶️", callback_data=f"{kind}>{rows[-1].id}"))
+    return InlineKeyboardMarkup([buttons]) if buttons else None
+
 class MedicineBot:
     def __init__(self):
-        self.db_repository = DatabaseRepository(DATABASE_URI)
-        self.llm_service = GroqLLMService(GROQ_API_KEY, LLM_MODEL)
+        self.db_repository = DatabaseRepository(DATABASE_URI, echo=DATABASE_ECHO)
+        self.llm_service = GroqLLMService(GROQ_API_KEY, LLM_MODEL, cache_path=LLM_CACHE_PATH)
         self.formatter = MessageFormatter()
+        self.intent_classifier = IntentClassifier()
+        self.indication_index = IndicationIndex()
+        self.recommendation_cache = SemanticCache()
+        self.expiry_scheduler = ExpiryScheduler(self.db_repository)
+        self.dose_scheduler = DoseScheduler(self.db_repository, self._send_dose_reminder)
+        self.notification_dispatcher: Optional[NotificationDispatcher] = None
+        self.metrics_server = MetricsServer(METRICS_PORT) if METRICS_PORT else None
         
+        # Команды кнопок клавиатуры и их короткие формы; сообщение должно совпасть целиком,
+        # иначе "курс Амоксициллин 500мг 08:00" показал бы список курсов вместо добавления
         self._COMMANDS = {
+            "моя аптечка": "list_meds",
             "аптечка": "list_meds",
+            "мой курс лекарств": "list_courses",
+            "мои курсы": "list_courses",
+            "курсы": "list_courses",
             "курс": "list_courses",
+            "сроки годности": "expiry_medications",
+            "сроки": "expiry_medications",
             "срок": "expiry_medications"
         }
+        # Списки, которые показываются постранично: команда -> вид страницы в callback_data
+        self._LIST_VIEWS = {
+            "list_meds": "m",
+            "list_courses": "c"
+        }
         
     def _parse_medication_message(self, text: str) -> Optional[dict]:
         """Парсинг сообщения о добавлении лекарства"""
-        pattern = r"лекарство\s+([\w\s\-]+)\s+(\d{2}\.\d{2})\s*x(\d+)"
-        match = re.search(pattern, text, re.IGNORECASE)
-        if match:
-            name = match.group(1).strip()
-            expiry = match.group(2).strip()
-            quantity = int(match.group(3))
-            month, year = expiry.split(".")
-            year_full = int("20" + year)
-            month = int(month)
-            last_day = monthrange(year_full, month)[1]
-            expiry_date = datetime(year_full, month, last_day).date().isoformat()
-            return {"name": name, "expiry_date": expiry_date, "quantity": quantity}
+        medication = parse_medication_message(text)
+        if medication:
+            return {"name": medication.name, "expiry_date": medication.expiry_date, "quantity": medication.quantity}
         return None
         
+    async def post_init(self, application: Application) -> None:
+        """Подготовка схемы БД и запуск задачи напоминаний после инициализации приложения"""
+        await self.db_repository.create_tables()
+        await self.llm_service.start()
+        self.notification_dispatcher = NotificationDispatcher(application.bot)
+        await self.notification_dispatcher.start()
+        if self.metrics_server:
+            await self.metrics_server.start()
+        await self.dose_scheduler.start()
+        application.create_task(reminder_task(self))
+
+    async def post_shutdown(self, application: Application) -> None:
+        await self.dose_scheduler.close()
+        await self.llm_service.close()
+        if self.notification_dispatcher:
+            await self.notification_dispatcher.close()
+        if self.metrics_server:
+            await self.metrics_server.close()
+        await dispose_engines()
+
+    async def _send_dose_reminder(self, user_id: int, courses) -> bool:
+        return await self.notification_dispatcher.send(user_id, self.formatter.format_dose_reminder(courses))
+
     @check_access
     async def start(self, update: Update, context) -> None:
         keyboard = [
@@ -69,21 +158,27 @@ class MedicineBot:
         )
 
     @check_access
+    @PROFILER.wrap
+    @timed(HANDLER_SECONDS, HANDLER_ERRORS, handler="handle_message")
     async def handle_message(self, update: Update, context) -> None:
         try:
             user_id = update.message.from_user.id
             text = update.message.text.lower()
             
             # Быстрая проверка команд без LLM
-            for key, command in self._COMMANDS.items():
-                if key in text:
-                    response = await self._handle_command(command, user_id)
-                    await update.message.reply_text(response)
-                    return
+            command = self._COMMANDS.get(" ".join(text.split()).strip(".!?"))
+            if command:
+                if command in self._LIST_VIEWS:
+                    response, markup = await self._list_page(self._LIST_VIEWS[command], user_id)
+                else:
+                    response, markup = await self._handle_command(command, user_id), None
+                await update.message.reply_text(response, reply_markup=markup)
+                return
             
             # Остальная логика...
-            response = await self._process_message(user_id, text)
-            await update.message.reply_text(response)
+            response = await self._process_message(user_id, text, update.message)
+            if response:
+                await update.message.reply_text(response)
             
         except TelegramError as te:
             logger.error(f"Telegram ошибка: {te}")
@@ -92,43 +187,110 @@ class MedicineBot:
             logger.error(f"Ошибка обработки сообщения: {e}")
             await update.message.reply_text(Messages.ERROR_PROCESSING.value)
 
-    async def _process_message(self, user_id: int, text: str) -> str:
-        """Обработка сообщения пользователя"""
+    @check_access
+    @PROFILER.wrap
+    @timed(HANDLER_SECONDS, HANDLER_ERRORS, handler="handle_document")
+    async def handle_document(self, update: Update, context) -> None:
+        """Импорт аптечки из присланного файла CSV или JSON"""
+        document = update.message.document
+        file_format = cabinet_format(document.file_name or "")
+        if not file_format:
+            await update.message.reply_text(Messages.IMPORT_UNSUPPORTED_FORMAT.value)
+            return
+        if document.file_size and document.file_size > IMPORT_MAX_FILE_SIZE:
+            await update.message.reply_text(Messages.IMPORT_FILE_TOO_LARGE.value)
+            return
+        try:
+            user_id = update.message.from_user.id
+            telegram_file = await document.get_file()
+            # Файл скачивается на диск и читается потоком, целиком в память не попадает
+            with tempfile.TemporaryDirectory() as directory:
+                path = await telegram_file.download_to_drive(os.path.join(directory, f"import.{file_format}"))
+                result = await import_cabinet_file(self.db_repository, user_id, str(path), file_format)
+            if result.courses:
+                await self.dose_scheduler.rebuild()
+            await update.message.reply_text(self.formatter.format_import_result(result))
+        except TelegramError as te:
+            logger.error(f"Telegram ошибка при импорте: {te}")
+            await update.message.reply_text("Произошла ошибка взаимодействия с Telegram.")
+        except Exception as e:
+            logger.error(f"Ошибка импорта аптечки: {e}")
+            await update.message.reply_text(Messages.ERROR_PROCESSING.value)
+
+    @check_access
+    @PROFILER.wrap
+    @timed(HANDLER_SECONDS, HANDLER_ERRORS, handler="export")
+    async def export(self, update: Update, context) -> None:
+        """Команда /export [csv|json]: выгрузка аптечки и курсов файлом"""
+        args = getattr(context, "args", None) or ["csv"]
+        file_format = args[0].lower()
+        if file_format not in ("csv", "json"):
+            await update.message.reply_text(Messages.EXPORT_USAGE.value)
+            return
+        try:
+            user_id = update.message.from_user.id
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, f"cabinet.{file_format}")
+                count = await export_cabinet_file(self.db_repository, user_id, path, file_format)
+                if not count:
+                    await update.message.reply_text(Messages.EMPTY_CABINET.value)
+                    return
+                with open(path, "rb") as stream:
+                    await update.message.reply_document(stream, filename=f"cabinet.{file_format}")
+        except TelegramError as te:
+            logger.error(f"Telegram ошибка при экспорте: {te}")
+            await update.message.reply_text("Произошла ошибка взаимодействия с Telegram.")
+        except Exception as e:
+            logger.error(f"Ошибка экспорта аптечки: {e}")
+            await update.message.reply_text(Messages.ERROR_PROCESSING.value)
+
+    @timed(HANDLER_SECONDS, HANDLER_ERRORS, handler="process_message")
+    async def _process_message(self, user_id: int, text: str, reply_to=None) -> Optional[str]:
+        """
+        Обработка сообщения пользователя.
+
+        Если передано сообщение reply_to, рекомендация выводится в ответ на него
+        по мере генерации, и метод возвращает None.
+        """
         if not isinstance(user_id, int) or not isinstance(text, str):
             logger.error(f"Некорректные входные данные: user_id={user_id}, text={text}")
             return "Ошибка: некорректные входные данные"
 
-        # 1. Проверка на прямые команды без LLM
-        if re.match(r"лекарство\s+[\w\s\-]+\s+\d{2}\.\d{2}\s*x\d+", text, re.IGNORECASE):
-            med_data = self._parse_medication_message(text)
-            if med_data:
-                self.db_repository.add_medication(
-                    user_id, 
-                    med_data["name"], 
-                    med_data["expiry_date"], 
-                    med_data["quantity"]
-                )
-                return f"Лекарство '{med_data['name']}' добавлено с сроком годности до {med_data['expiry_date']} (количество: {med_data['quantity']})."
+        # 1. Проверка на прямые команды без LLM: одно или несколько лекарств в сообщении
+        if MEDICATION_COMMAND_PATTERN.match(text):
+            response = await self._add_medications(user_id, text)
+            if response:
+                return response
+
+        # Отметка приёма: "принял аспирин" уменьшает количество в аптечке
+        take = parse_take_message(text)
+        if take:
+            response = await self._take_medication(user_id, take)
+            if response:
+                return response
 
         try:
-            # 2. Получение намерения через LLM
-            llm_response = await self.llm_service.get_completion(
-                f"Проанализируй сообщение и определи намерение: '{text}'\n"
-                "Ответь одним словом: добавить/рекомендация/аптечка/курс"
-            )
+            # Сроки годности: у классификатора нет такого намерения
+            if _EXPIRY_REQUEST_PATTERN.search(text):
+                return await self._expiry_text(user_id)
 
-            if not llm_response:
+            # 2. Получение намерения: локальный классификатор, LLM — только при низкой уверенности
+            intent = await self._detect_intent(text, user_id)
+
+            if not intent:
                 return "Извините, произошла ошибка при обработке запроса. Попробуйте позже."
 
             # 3. Обработка симптомов
-            if "рекомендация" in llm_response.lower():
-                medications = self.db_repository.list_medications(user_id)
+            if intent == "рекомендация":
+                medications = await self.db_repository.list_medications(user_id)
                 if not medications:
                     return "Ваша аптечка пуста. Невозможно дать рекомендации."
 
+                # В промпт идут только подходящие по показаниям лекарства, без повторов
+                shortlist = self.indication_index.shortlist(text, medications)
                 symptom_prompt = (
                     f"Пользователь описывает следующие симптомы: '{text}'\n"
-                    f"Доступные лекарства:\n{', '.join(med.name for med in medications)}\n\n"
+                    f"Доступные лекарства:\n{', '.join(shortlist) or 'нет подходящих по показаниям'}\n\n"
                     "Дай рекомендацию по приему лекарств из списка. "
                     "Учитывай:\n"
                     "1. Основные показания к применению\n"
@@ -137,81 +299,237 @@ class MedicineBot:
                     "4. Меры предосторожности\n"
                     "Если нет подходящих лекарств, укажи это."
                 )
-                recommendation = await self.llm_service.get_completion(symptom_prompt)
+                # Похожая жалоба этого пользователя при той же подборке лекарств уже получала ответ
+                fingerprint = shortlist_fingerprint(shortlist)
+                cached = self.recommendation_cache.get(text, user_id, fingerprint)
+                if cached is not None:
+                    if reply_to is not None:
+                        await reply_to.reply_text(cached)
+                        return None
+                    return cached
+                if reply_to is not None:
+                    recommendation = await self._stream_recommendation(reply_to, user_id, symptom_prompt)
+                else:
+                    recommendation = await self.llm_service.get_completion_cached(symptom_prompt, user_id)
+                if recommendation:
+                    self.recommendation_cache.set(text, user_id, fingerprint, recommendation)
+                if reply_to is not None:
+                    return None
                 return recommendation if recommendation else "Не удалось сформировать рекомендацию."
 
             # 4. Просмотр аптечки
-            elif "аптечка" in text.lower() or "лист" in text.lower():
-                medications = self.db_repository.list_medications(user_id)
-                return self.formatter.format_medications_list(medications)
+            elif intent == "аптечка" or "аптечка" in text.lower() or "лист" in text.lower():
+                text, _ = await self._list_page("m", user_id)
+                return text
 
             # 5. Добавление курса приема
-            elif "курс" in text.lower():
-                pattern = r"курс\s+([\w\s\-]+)\s+([\w\d]+)\s+([\w\s\-:]+)(?:\s+метод\s+([\w\s\-]+))?"
-                match = re.search(pattern, text, re.IGNORECASE)
-                if match:
-                    medicine_name = match.group(1).strip()
-                    dosage = match.group(2).strip()
-                    schedule = match.group(3).strip()
-                    method = match.group(4).strip() if match.group(4) else "Не указан"
-                    self.db_repository.add_course(user_id, medicine_name, dosage, schedule, method)
-                    return f"Курс приема для '{medicine_name}' добавлен: дозировка {dosage}, расписание: {schedule}, метод: {method}."
+            elif intent == "курс":
+                course = parse_course_message(text)
+                if course:
+                    return await self._add_course(user_id, course)
+                # "покажи мои курсы": ни расписания, ни дозировки — это просьба показать список
+                if (not text.lower().startswith("курс ") and parse_schedule(text) is None
+                        and not _SCHEDULE_WORDS_PATTERN.search(text) and not any(char.isdigit() for char in text)):
+                    text, _ = await self._list_page("c", user_id)
+                    return text
                 return Messages.INVALID_COURSE_FORMAT.value
 
             return f"Не удалось определить действие. Попробуйте переформулировать запрос."
 
+        except LLMOverloadedError:
+            return Messages.LLM_BUSY.value
+        except LLMUnavailableError:
+            return Messages.LLM_UNAVAILABLE.value
         except Exception as e:
             logger.error(f"Ошибка при обработке сообщения: {e}")
             return Messages.ERROR_PROCESSING.value
 
+    async def _stream_recommendation(self, message, user_id: int, prompt: str) -> Optional[str]:
+        """
+        Отправляет заглушку и дописывает в неё рекомендацию по мере поступления фрагментов.
+
+        :return: Полная рекомендация или None, если ответ прерван ошибкой
+        """
+        reply = ProgressiveReply(message)
+        await reply.start(Messages.RECOMMENDATION_PLACEHOLDER.value)
+        parts = []
+        try:
+            async for chunk in self.llm_service.stream_completion_cached(prompt, user_id):
+                parts.append(chunk)
+                await reply.update("".join(parts))
+            recommendation = "".join(parts).strip()
+            await reply.finish(recommendation or "Не удалось сформировать рекомендацию.")
+            return recommendation or None
+        except LLMOverloadedError:
+            await reply.finish(Messages.LLM_BUSY.value)
+            return None
+        except LLMUnavailableError:
+            await reply.finish(Messages.LLM_UNAVAILABLE.value)
+            return None
+        except LLMServiceError as e:
+            logger.error(f"Ошибка потокового ответа LLM: {e}")
+            partial = "".join(parts).strip()
+            await reply.finish(f"{partial}\n\n{Messages.RECOMMENDATION_INTERRUPTED.value}" if partial else Messages.ERROR_PROCESSING.value)
+            return None
+        except Exception as e:
+            # Например, BadRequest при правке сообщения: заглушка не должна остаться висеть
+            logger.error(f"Ошибка вывода рекомендации: {e}")
+            try:
+                await reply.finish(Messages.ERROR_PROCESSING.value)
+            except Exception as finish_error:
+                logger.error(f"Не удалось заменить заглушку рекомендации: {finish_error}")
+            return None
+
+    async def _add_course(self, user_id: int, course: ParsedCourse) -> str:
+        """Сохраняет курс с разобранным расписанием и ставит ближайший приём в таймер"""
+        schedule = parse_schedule(course.schedule)
+        next_dose = schedule.next_dose(datetime.now()) if schedule else None
+        next_dose_at = next_dose.strftime(DOSE_TIME_FORMAT) if next_dose else None
+        course_id = await self.db_repository.add_course(
+            user_id, course.medicine_name, course.dosage, course.schedule, course.method,
+            schedule.dumps() if schedule else "", next_dose_at
+        )
+        self.dose_scheduler.schedule(course_id, next_dose_at)
+        response = (
+            f"Курс приема для '{course.medicine_name}' добавлен: дозировка {course.dosage}, "
+            f"расписание: {course.schedule}, метод: {course.method}."
+        )
+        if not schedule:
+            return f"{response}\n{Messages.COURSE_SCHEDULE_NOT_RECOGNIZED.value}"
+        if next_dose:
+            return f"{response}\nНапоминания: {schedule.describe()}. Ближайший приём: {next_dose:%d.%m %H:%M}."
+        return response
+
+    async def _add_medications(self, user_id: int, text: str) -> Optional[str]:
+        """Добавляет все распознанные лекарства из сообщения одной транзакцией"""
+        medications, errors = [], []
+        for entry in iter_medication_entries(text):
+            (medications if isinstance(entry, ParsedMedication) else errors).append(entry)
+        if not medications:
+            return None
+
+        await self.db_repository.add_medications_many(user_id, medications)
+        if len(medications) == 1 and not errors:
+            med = medications[0]
+            return f"Лекарство '{med.name}' добавлено с сроком годности до {med.expiry_date} (количество: {med.quantity})."
+
+        return self.formatter.format_added_medications(medications, errors)
+
+    async def _take_medication(self, user_id: int, take: ParsedTake) -> Optional[str]:
+        """
+        Списывает принятое лекарство, найденное в аптечке по неточному названию.
+
+        :return: None, если в аптечке нет похожего лекарства ("принял душ") — сообщение
+                 тогда обрабатывается как обычный запрос
+        """
+        taken = await self.db_repository.take_medication(user_id, take.name, take.quantity)
+        if taken is None:
+            return None
+        medication, remaining = taken
+        if remaining == 0:
+            return f"Приём '{medication.name}' отмечен. Лекарство закончилось, пора пополнить аптечку."
+        return f"Приём '{medication.name}' отмечен, осталось: {remaining}."
+
+    async def _detect_intent(self, text: str, user_id: Optional[int] = None) -> Optional[str]:
+        """Определение намерения: добавить/рекомендация/аптечка/курс"""
+        prediction = self.intent_classifier.classify(text)
+        if prediction.confidence >= INTENT_CONFIDENCE_THRESHOLD:
+            return prediction.intent
+
+        llm_response = await self.llm_service.get_completion_cached(
+            f"Проанализируй сообщение и определи намерение: '{text}'\n"
+            "Ответь одним словом: добавить/рекомендация/аптечка/курс",
+            user_id
+        )
+        if not llm_response:
+            return None
+        llm_response = llm_response.lower()
+        return next((intent for intent in INTENTS if intent in llm_response), llm_response)
+
+    async def _list_page(
+        self,
+        kind: str,
+        user_id: int,
+        cursor: Optional[int] = None,
+        backward: bool = False
+    ) -> Tuple[str, Optional[InlineKeyboardMarkup]]:
+        """
+        Страница аптечки (kind="m") или курсов (kind="c") с кнопками листания.
+
+        Из базы читается только одна страница; первая страница кэшируется
+        до изменения данных пользователя.
+        """
+        first_page = cursor is None and not backward
+        cache = self.db_repository.cache
+        if first_page:
+            cached = cache.get(user_id, f"{kind}_first_page")
+            if cached is not None:
+                return cached
+        version = cache.version()
+
+        if kind == "m":
+            rows, has_more = await self.db_repository.list_medications_page(user_id, cursor, backward)
+            text = self.formatter.format_medications_list(rows)
+        else:
+            rows, has_more = await self.db_repository.list_courses_page(user_id, cursor, backward)
+            text = self.formatter.format_courses_list(rows)
+        if not rows and not first_page:
+            # Строки вокруг курсора удалены с момента показа страницы — возвращаемся к началу
+            return await self._list_page(kind, user_id)
+        has_prev, has_next = (has_more, True) if backward else (cursor is not None, has_more)
+        page = text, _pagination_keyboard(kind, rows, has_prev, has_next)
+        if first_page:
+            cache.set(user_id, f"{kind}_first_page", page, since=version)
+        return page
+
+    async def _expiry_text(self, user_id: int) -> str:
+        """Первая страница сроков годности; кэшируется до конца дня или до изменения аптечки"""
+        cache_key = f"expiry_text:{date.today().isoformat()}"
+        cache = self.db_repository.cache
+        text = cache.get(user_id, cache_key)
+        if text is None:
+            version = cache.version()
+            expiring = await self.db_repository.list_expiring_medications(user_id, limit=EXPIRY_PAGE_SIZE + 1)
+            text = self.formatter.format_expiring_list(expiring[:EXPIRY_PAGE_SIZE], len(expiring) > EXPIRY_PAGE_SIZE)
+            cache.set(user_id, cache_key, text, since=version)
+        return text
+
     @check_access
+    @PROFILER.wrap
+    @timed(HANDLER_SECONDS, HANDLER_ERRORS, handler="button")
     async def button(self, update: Update, context: CallbackContext) -> None:
         query = update.callback_query
         user_id = query.from_user.id
         data = query.data
         
         try:
+            page_match = _PAGE_CALLBACK_PATTERN.fullmatch(data)
             if data == "list_meds":
-                meds = self.db_repository.list_medications(user_id)
-                text = self.formatter.format_medications_list(meds)
+                text, markup = await self._list_page("m", user_id)
             elif data == "list_courses":
-                courses = self.db_repository.list_courses(user_id)
-                text = self.formatter.format_courses_list(courses)
+                text, markup = await self._list_page("c", user_id)
+            elif page_match:
+                kind, direction, cursor = page_match.groups()
+                text, markup = await self._list_page(kind, user_id, int(cursor), direction == "<")
         except Exception as e:
             logger.error(f"Ошибка доступа для пользователя {user_id}: {e}")
-            text = Messages.ERROR_PROCESSING.value
+            text, markup = Messages.ERROR_PROCESSING.value, None
         
-        await query.edit_message_text(text=text)
+        await query.edit_message_text(text=text, reply_markup=markup)
 
     async def _handle_command(self, command: str, user_id: int) -> str:
         """Обработка команд от кнопок"""
         try:
             if command == "list_meds":
-                medications = await self.db_repository.list_medications(user_id)
-                return self.formatter.format_medications_list(medications)
+                text, _ = await self._list_page("m", user_id)
+                return text
             
             elif command == "list_courses":
-                courses = await self.db_repository.list_courses(user_id)
-                return self.formatter.format_courses_list(courses)
+                text, _ = await self._list_page("c", user_id)
+                return text
             
             elif command == "expiry_medications":
-                medications = await self.db_repository.list_medications(user_id)
-                if not medications:
-                    return Messages.EMPTY_CABINET
-                
-                today = datetime.today().date()
-                expiring_meds = []
-                
-                for med in medications:
-                    expiry_date = datetime.fromisoformat(med.expiry_date).date()
-                    days_to_expiry = (expiry_date - today).days
-                    if days_to_expiry > 0:
-                        expiring_meds.append(f"{med.name} - истекает через {days_to_expiry} дней")
-                
-                if not expiring_meds:
-                    return "Нет лекарств с приближающимся сроком годности."
-                
-                return "Сроки годности:\n" + "\n".join(expiring_meds)
+                return await self._expiry_text(user_id)
             
             return "Неизвестная команда"
             
@@ -219,71 +537,133 @@ class MedicineBot:
             logger.error(f"Ошибка при обработке команды {command}: {e}")
             return Messages.ERROR_PROCESSING.value
 
-async def main() -> None:
-    bot = MedicineBot()
-    application = Application.builder().token(TELEGRAM_BOT_TOKEN).build()
+def build_application(bot: MedicineBot, processor: PerUserUpdateProcessor, builder=None, webhook: bool = False) -> Application:
+    """Приложение с обработчиками бота; апдейты разных чатов обрабатываются параллельно"""
+    builder = builder or Application.builder().token(TELEGRAM_BOT_TOKEN)
+    builder = builder.concurrent_updates(processor)
+    if webhook:
+        # Апдейты приходят через WebhookServer, Updater для polling не нужен
+        builder = builder.updater(None)
+    application = builder.build()
     
     application.add_handler(CommandHandler("start", bot.start))
+    application.add_handler(CommandHandler("export", bot.export))
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, bot.handle_message))
+    application.add_handler(MessageHandler(filters.Document.ALL, bot.handle_document))
     application.add_handler(CallbackQueryHandler(bot.button))
-    
-    # Запускаем задачу напоминаний
-    asyncio.create_task(reminder_task(application))
-    
-    await application.run_polling()
+    return application
+
+async def run_webhook(application: Application, bot: MedicineBot, processor: PerUserUpdateProcessor) -> None:
+    """Режим webhook: регистрирует WEBHOOK_URL в Telegram и принимает апдейты встроенным aiohttp-сервером"""
+    server = WebhookServer(application, processor, WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_SECRET)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
 
-async def check_reminders(application):
+    await application.initialize()
+    await bot.post_init(application)
+    try:
+        await server.start()
+        await application.bot.set_webhook(
+            WEBHOOK_URL,
+            allowed_updates=Update.ALL_TYPES,
+            max_connections=WEBHOOK_MAX_CONNECTIONS,
+            secret_token=WEBHOOK_SECRET
+        )
+        await application.start()
+        logger.info(f"Бот работает в режиме webhook: {WEBHOOK_URL}")
+        await stop.wait()
+    finally:
+        await server.close()
+        if application.running:
+            await application.stop()
+        await bot.post_shutdown(application)
+        await application.shutdown()
+
+def main() -> None:
+    bot = MedicineBot()
+    processor = PerUserUpdateProcessor()
+    if WEBHOOK_URL:
+        application = build_application(bot, processor, webhook=True)
+        asyncio.run(run_webhook(application, bot, processor))
+        return
+    application = build_application(
+        bot, processor, Application.builder().token(TELEGRAM_BOT_TOKEN).post_init(bot.post_init).post_shutdown(bot.post_shutdown)
+    )
+    application.run_polling()
+
+@timed(REMINDER_PASS_SECONDS, REMINDER_PASS_ERRORS)
+async def check_reminders(bot: MedicineBot, shard: Optional[int] = None, shards: int = 1):
     """
     Функция для проверки и отправки напоминаний о приближающемся окончании срока годности лекарств,
     а также удаления просроченных лекарств.
+
+    :param shard: Обработать только пользователей этого шарда из shards
     """
-    with DatabaseRepository(DATABASE_URI).get_connection() as conn:
-        cur = conn.cursor()
-        cur.execute("SELECT id, user_id, name, expiry_date FROM medications")
-        meds = cur.fetchall()
+    reminder_pass = await bot.expiry_scheduler.collect(shard=shard, shards=shards)
     
-    today = datetime.today().date()
+    # Группируем события по пользователям: один дайджест на пользователя за проход
+    digests = defaultdict(lambda: ([], []))
+    for med in reminder_pass.expired:
+        digests[med.user_id][0].append(med)
+    for med, days_to_expiry in reminder_pass.expiring:
+        digests[med.user_id][1].append((med, days_to_expiry))
     
-    for med in meds:
-        med_id, user_id, name, expiry_str = med
-        expiry_date = datetime.fromisoformat(expiry_str).date()
-        days_to_expiry = (expiry_date - today).days
-        
-        # Если лекарство просрочено, удаляем его и отправляем уведомление
-        if days_to_expiry < 0:
-            try:
-                logger.info(f"Удаление просроченного лекарства {name} для пользователя {user_id}")
-                with DatabaseRepository(DATABASE_URI).get_connection() as conn:
-                    cur = conn.cursor()
-                    cur.execute("DELETE FROM medications WHERE id = ?", (med_id,))
-                    conn.commit()
-                await application.bot.send_message(
-                    chat_id=user_id,
-                    text=(
-                        f"⚠️ Внимание! Лекарство {name} было автоматически удалено из вашей аптечки, "
-                        f"так как его срок годности истёк {expiry_date}.\n"
-                        "Пожалуйста, утилизируйте это лекарство надлежащим образом."
-                    )
-                )
-            except Exception as e:
-                logger.error(f"Ошибка при удалении просроченного лекарства {name} для пользователя {user_id}: {e}")
-        # Напоминание: за 60 дней и затем каждые 14 дней
-        elif days_to_expiry == 60 or (days_to_expiry < 60 and (60 - days_to_expiry) % 14 == 0):
-            try:
-                await application.bot.send_message(
-                    chat_id=user_id,
-                    text=f"Напоминание: лекарство {name} истекает через {days_to_expiry} дней."
-                )
-            except Exception as e:
-                logger.error(f"Ошибка отправки напоминания пользователю {user_id}: {e}")
+    # Журнал отправленных читается одним запросом на весь проход (шард), а не на каждого пользователя
+    already_sent = await bot.db_repository.find_sent_reminders(
+        [(med.id, med.next_event_date, "expired") for med in reminder_pass.expired]
+        + [(med.id, med.next_event_date, "expiring") for med, _ in reminder_pass.expiring]
+    )
+    
+    async def notify(user_id: int, expired, expiring) -> bool:
+        keys = [(med.id, med.next_event_date, "expired") for med in expired]
+        keys += [(med.id, med.next_event_date, "expiring") for med, _ in expiring]
+        expired = [med for med in expired if (med.id, med.next_event_date, "expired") not in already_sent]
+        expiring = [(med, days) for med, days in expiring if (med.id, med.next_event_date, "expiring") not in already_sent]
+        if not expired and not expiring:
+            return True
+        sent = await bot.notification_dispatcher.send(user_id, bot.formatter.format_reminder_digest(expired, expiring))
+        if sent:
+            await bot.db_repository.record_sent_reminders(user_id, [key for key in keys if key not in already_sent])
+        return sent
+    
+    user_ids = list(digests)
+    results = await asyncio.gather(
+        *(notify(user_id, *digests[user_id]) for user_id in user_ids),
+        return_exceptions=True
+    )
+    failed = set()
+    for user_id, result in zip(user_ids, results):
+        if result is not True:
+            if isinstance(result, Exception):
+                logger.error(f"Ошибка отправки напоминаний пользователю {user_id}: {result}")
+            failed.add(user_id)
+    
+    # События пользователей, которым не удалось отправить дайджест, остаются на следующий проход;
+    # журнал отправленных напоминаний не даст повторить уже доставленное
+    if failed:
+        reminder_pass.expired = [med for med in reminder_pass.expired if med.user_id not in failed]
+        failed_ids = {med.id for med, _ in reminder_pass.expiring if med.user_id in failed}
+        reminder_pass.rescheduled = [item for item in reminder_pass.rescheduled if item[0] not in failed_ids]
+    for med in reminder_pass.expired:
+        logger.info(f"Удаление просроченного лекарства {med.name} для пользователя {med.user_id}")
+    await bot.expiry_scheduler.complete(reminder_pass)
 
-async def reminder_task(application):
+async def reminder_task(bot: MedicineBot):
     """
-    Асинхронная задача для проверки напоминаний каждый день.
+    Асинхронная задача для проверки напоминаний каждый час.
+    
+    Несколько реплик бота делят один проход по шардам пользователей.
     """
+    runner = ShardedReminderRunner(bot.db_repository, lambda shard, shards: check_reminders(bot, shard, shards))
     while True:
-        await check_reminders(application)
-        await asyncio.sleep(3600)  # Проверка каждый час
+        try:
+            await runner.run_pass()
+        except Exception as e:
+            logger.error(f"Ошибка прохода напоминаний: {e}")
+        # Проходы выровнены по интервалу, чтобы реплики попадали в один и тот же проход
+        await asyncio.sleep(REMINDER_PASS_INTERVAL - time.time() % REMINDER_PASS_INTERVAL)
 
 if __name__ == '__main__':
-    asyncio.run(main()) 
\ No newline at end of file
+    main() 
\ No newline at end of file
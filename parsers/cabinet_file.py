@@ -0,0 +1,158 @@
+import csv
+import json
+import os
+import re
+from datetime import date
+from typing import IO, Any, Dict, Iterator, Optional, Union
+from constants import MEDICATION_NAME_MAX_LENGTH
+from parsers.medication_parser import MedicationParseError, ParsedMedication, parse_expiry
+from parsers.schedule_parser import ParsedCourse
+
+# Файл аптечки: одна запись на лекарство или курс. В CSV колонка kind необязательна —
+# без неё все строки считаются лекарствами ("name,expiry_date,quantity")
+CSV_FIELDS = ("kind", "name", "expiry_date", "quantity", "dosage", "schedule", "method")
+KIND_MEDICATION = "medication"
+KIND_COURSE = "course"
+_FORMATS = {".csv": "csv", ".json": "json", ".jsonl": "json", ".ndjson": "json"}
+_SHORT_EXPIRY = re.compile(r"\d{2}\.\d{2}")
+_JSON_SEPARATORS = " \t\r\n,[]"
+
+CabinetEntry = Union[ParsedMedication, ParsedCourse, MedicationParseError]
+
+
+class CabinetFileError(ValueError):
+    """Файл нельзя читать дальше: повреждённый JSON или CSV"""
+
+
+def cabinet_format(filename: str) -> Optional[str]:
+    """Формат файла по расширению: "csv", "json" (массив или JSON Lines) или None"""
+    return _FORMATS.get(os.path.splitext(filename.lower())[1])
+
+
+def iter_json_objects(stream: IO[str], chunk_size: int = 64 * 1024, max_record_size: int = 1024 * 1024) -> Iterator[Any]:
+    """
+    Значения JSON-массива верхнего уровня или JSON Lines по одному.
+
+    Читается не больше chunk_size символов сверх текущей записи, поэтому
+    память не зависит от размера файла; запись длиннее max_record_size
+    считается повреждением файла.
+    """
+    decoder = json.JSONDecoder()
+    buffer, position, eof = "", 0, False
+    while True:
+        while position < len(buffer) and buffer[position] in _JSON_SEPARATORS:
+            position += 1
+        if position == len(buffer):
+            buffer, position = stream.read(chunk_size), 0
+            if not buffer:
+                return
+            continue
+        try:
+            value, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError as e:
+            if eof or len(buffer) - position > max_record_size:
+                raise CabinetFileError(f"повреждённый JSON: {e.msg}") from e
+            # Запись не поместилась в буфер целиком: дочитываем
+            chunk = stream.read(chunk_size)
+            eof = not chunk
+            buffer, position = buffer[position:] + chunk, 0
+            continue
+        eof = False
+        position = end
+        yield value
+
+
+def _expiry(value: Any) -> str:
+    """ММ.ГГ, как в сообщении боту (последний день месяца), или дата ГГГГ-ММ-ДД, как в выгрузке"""
+    value = str(value or "").strip()
+    if _SHORT_EXPIRY.fullmatch(value):
+        return parse_expiry(value)
+    try:
+        return date.fromisoformat(value).isoformat()
+    except ValueError:
+        raise ValueError(f"срок годности '{value}': ожидается ММ.ГГ или ГГГГ-ММ-ДД") from None
+
+
+def parse_record(record: Dict[str, Any], number: int) -> CabinetEntry:
+    """Проверяет запись файла; number — номер строки CSV или записи JSON для сообщения об ошибке"""
+    kind = str(record.get("kind") or KIND_MEDICATION).strip().lower()
+    name = str(record.get("name") or "").strip()
+    line = name or json.dumps(record, ensure_ascii=False)[:100]
+    if not name:
+        return MedicationParseError(number, line, "не указано название")
+    if len(name) > MEDICATION_NAME_MAX_LENGTH:
+        return MedicationParseError(number, line[:MEDICATION_NAME_MAX_LENGTH], "слишком длинное название")
+
+    if kind == KIND_COURSE:
+        dosage = str(record.get("dosage") or "").strip()
+        schedule = str(record.get("schedule") or "").strip()
+        if not dosage or not schedule:
+            return MedicationParseError(number, line, "у курса должны быть дозировка и расписание")
+        return ParsedCourse(name, dosage, schedule, str(record.get("method") or "").strip() or "Не указан")
+    if kind != KIND_MEDICATION:
+        return MedicationParseError(number, line, f"неизвестный тип записи '{kind}'")
+
+    try:
+        expiry_date = _expiry(record.get("expiry_date"))
+    except ValueError as e:
+        return MedicationParseError(number, line, str(e))
+    quantity = str(record.get("quantity", "")).strip()
+    if not quantity.isdigit():
+        return MedicationParseError(number, line, "количество должно быть целым неотрицательным числом")
+    return ParsedMedication(name, expiry_date, int(quantity))
+
+
+def iter_cabinet_records(stream: IO[str], file_format: str) -> Iterator[CabinetEntry]:
+    """Записи файла аптечки по одной, не загружая файл в память; CabinetFileError, если файл повреждён"""
+    if file_format == "csv":
+        reader = csv.DictReader(stream)
+        try:
+            for record in reader:
+                yield parse_record(record, reader.line_num)
+        except csv.Error as e:
+            raise CabinetFileError(f"повреждённый CSV в строке {reader.line_num}: {e}") from e
+        return
+    for number, record in enumerate(iter_json_objects(stream), 1):
+        if isinstance(record, dict):
+            yield parse_record(record, number)
+        else:
+            yield MedicationParseError(number, str(record)[:100], "запись должна быть объектом")
+
+
+def medication_record(med) -> Dict[str, Any]:
+    return {"kind": KIND_MEDICATION, "name": med.name, "expiry_date": med.expiry_date, "quantity": med.quantity}
+
+
+def course_record(course) -> Dict[str, Any]:
+    return {
+        "kind": KIND_COURSE,
+        "name": course.medicine_name,
+        "dosage": course.dosage,
+        "schedule": course.schedule,
+        "method": course.method,
+    }
+
+
+class CabinetWriter:
+    """Потоковая запись файла аптечки: JSON-массив пишется по объекту на строку"""
+
+    def __init__(self, stream: IO[str], file_format: str):
+        self.stream = stream
+        self.file_format = file_format
+        self.count = 0
+        if file_format == "csv":
+            self._csv = csv.DictWriter(stream, CSV_FIELDS, lineterminator="\n")
+            self._csv.writeheader()
+        else:
+            stream.write("[")
+
+    def write(self, record: Dict[str, Any]) -> None:
+        if self.file_format == "csv":
+            self._csv.writerow(record)
+        else:
+            self.stream.write(("\n" if not self.count else ",\n") + json.dumps(record, ensure_ascii=False))
+        self.count += 1
+
+    def close(self) -> None:
+        if self.file_format != "csv":
+            self.stream.write("\n]\n")
@@ -0,0 +1,75 @@
+import re
+from typing import FrozenSet, List, Tuple
+from constants import MEDICATION_NAME_TRANSLITERATE
+
+# Дозировка различает лекарства ("Парацетамол 125 мг" и "500 мг" — разные), поэтому остаётся в ключе
+# в одном написании: "500мг", "500 mg" и "500 мг" дают "500 мг", "0,01%" — "0.01 %"
+_DOSAGE = re.compile(r"(?<![\w.,])(\d+(?:[.,]\d+)?)\s*(мкг|mcg|мг|mg|мл|ml|ме|iu|ед|г|g|%)?(?!\w)")
+_UNITS = {"mcg": "мкг", "mg": "мг", "ml": "мл", "iu": "ме", "g": "г"}
+# Форма выпуска и единицы без числа не различают лекарства: "Ибупрофен табл." — тот же ибупрофен
+_FORMS = frozenset((
+    "таб", "табл", "таблетки", "таблеток", "tab", "tabs", "капс", "капсулы", "капсул", "caps", "шт",
+    "мг", "mg", "мл", "ml", "г", "g",
+))
+_NON_WORD = re.compile(r"[^\w\s]+")
+_LATIN_WORD = re.compile(r"[a-z]+")
+# Латиница → кириллица: сначала сочетания букв, затем отдельные буквы; "c" перед e/i/y читается как "ц"
+_TRANSLIT_PAIRS = (
+    ("shch", "щ"), ("sch", "щ"), ("sh", "ш"), ("ch", "ч"), ("zh", "ж"), ("kh", "х"), ("ts", "ц"), ("ph", "ф"),
+    ("th", "т"), ("ya", "я"), ("yu", "ю"), ("yo", "е"), ("ce", "це"), ("ci", "ци"), ("cy", "ци"), ("x", "кс"),
+    ("a", "а"), ("b", "б"), ("c", "к"), ("d", "д"), ("e", "е"), ("f", "ф"), ("g", "г"), ("h", "х"), ("i", "и"),
+    ("j", "й"), ("k", "к"), ("l", "л"), ("m", "м"), ("n", "н"), ("o", "о"), ("p", "п"), ("q", "к"), ("r", "р"),
+    ("s", "с"), ("t", "т"), ("u", "у"), ("v", "в"), ("w", "в"), ("y", "и"), ("z", "з"),
+)
+_TRANSLIT = re.compile("|".join(latin for latin, _ in _TRANSLIT_PAIRS))
+_TRANSLIT_MAP = dict(_TRANSLIT_PAIRS)
+
+
+def transliterate(word: str) -> str:
+    """Кириллическое написание латинского названия: "nurofen" → "нурофен" """
+    return _TRANSLIT.sub(lambda match: _TRANSLIT_MAP[match.group()], word)
+
+
+def _words(text: str, translit: bool) -> List[str]:
+    words = [word for word in _NON_WORD.sub(" ", text).split() if word not in _FORMS]
+    if translit:
+        words = [transliterate(word) if _LATIN_WORD.fullmatch(word) else word for word in words]
+    return words
+
+
+def name_parts(name: str, translit: bool = MEDICATION_NAME_TRANSLITERATE) -> Tuple[str, str]:
+    """
+    Название без дозировки и дозировка в одном написании: "Aspirin 500mg" → ("аспирин", "500 мг");
+    не указанная часть — "".
+    """
+    text = name.casefold().replace("ё", "е").replace("-", "")
+    words, dosages, position = [], [], 0
+    for match in _DOSAGE.finditer(text):
+        words += _words(text[position:match.start()], translit)
+        position = match.end()
+        number, unit = match.group(1).replace(",", "."), match.group(2)
+        dosages += [number, _UNITS.get(unit, unit)] if unit else [number]
+    words += _words(text[position:], translit)
+    return " ".join(words), " ".join(dosages)
+
+
+def canonical_name(name: str, translit: bool = MEDICATION_NAME_TRANSLITERATE) -> str:
+    """
+    Ключ лекарства в аптечке: регистр, "ё", знаки, дефисы и форма выпуска
+    не учитываются, дозировка записывается в одном виде после названия,
+    латинские слова при translit записываются кириллицей.
+
+    "Аспирин 500мг" и "Aspirin 500 mg" дают "аспирин 500 мг"; "Но-шпа" — "ношпа".
+    """
+    key = " ".join(part for part in name_parts(name, translit) if part)
+    # Название из одних форм выпуска ("таблетки") оставляем как есть, чтобы ключ не был пустым
+    return key or " ".join(_NON_WORD.sub(" ", name.casefold()).split())
+
+
+def name_trigrams(canonical: str) -> FrozenSet[str]:
+    """Триграммы названия с границами слов, как в pg_trgm: "  аспирин " → "  а", " ас", "асп", ..."""
+    trigrams = set()
+    for word in canonical.split():
+        padded = f"  {word} "
+        trigrams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return frozenset(trigrams)
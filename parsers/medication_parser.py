@@ -0,0 +1,91 @@
+import re
+from calendar import monthrange
+from dataclasses import dataclass
+from datetime import date
+from typing import Iterator, Optional, Union
+
+# Одно лекарство: "[лекарство] Название ММ.ГГ xКоличество"
+MEDICATION_PATTERN = re.compile(r"лекарство\s+([\w\s\-]+)\s+(\d{2}\.\d{2})\s*x(\d+)", re.IGNORECASE)
+MEDICATION_ENTRY_PATTERN = re.compile(r"(?:лекарство\s+)?([\w\s\-]+?)\s+(\d{2}\.\d{2})\s*x(\d+)", re.IGNORECASE)
+MEDICATION_COMMAND_PATTERN = re.compile(r"\s*лекарство\s", re.IGNORECASE)
+# Приём лекарства из аптечки: "принял Название [xКоличество]". Название — не больше трёх слов,
+# чтобы "выпил парацетамол, но голова болит" ушло в определение намерения, а не в списание
+TAKE_PATTERN = re.compile(
+    r"\s*(?:я\s+)?(?:принял|приняла|выпил|выпила)\s+((?!x\d+\b)[\w\-]+(?:\s+(?!x\d+\b)[\w\-]+){0,2})"
+    r"(?:\s+x(\d+))?[\s.!]*$",
+    re.IGNORECASE
+)
+# Записи в сообщении разделяются переводами строк или точкой с запятой
+_ENTRY_PATTERN = re.compile(r"[^;\n]+")
+
+
+@dataclass
+class ParsedMedication:
+    name: str
+    expiry_date: str
+    quantity: int
+
+
+@dataclass
+class ParsedTake:
+    name: str
+    quantity: int
+
+
+@dataclass
+class MedicationParseError:
+    line_number: int
+    line: str
+    reason: str
+
+
+def parse_expiry(expiry: str) -> str:
+    """ММ.ГГ -> последний день месяца в формате ISO; ValueError при неверном месяце"""
+    month, year = expiry.split(".")
+    year_full = int("20" + year)
+    month = int(month)
+    if not 1 <= month <= 12:
+        raise ValueError(f"неверный месяц: {month:02d}")
+    last_day = monthrange(year_full, month)[1]
+    return date(year_full, month, last_day).isoformat()
+
+
+def parse_medication_message(text: str) -> Optional[ParsedMedication]:
+    """Первое лекарство из сообщения вида 'лекарство Название ММ.ГГ xКоличество'"""
+    match = MEDICATION_PATTERN.search(text)
+    if not match:
+        return None
+    return ParsedMedication(match.group(1).strip(), parse_expiry(match.group(2).strip()), int(match.group(3)))
+
+
+def iter_medication_entries(text: str) -> Iterator[Union[ParsedMedication, MedicationParseError]]:
+    """
+    Построчно разбирает сообщение с несколькими лекарствами.
+
+    Для каждой непустой записи возвращает ParsedMedication либо MedicationParseError
+    с номером записи и причиной, не прерывая разбор остальных.
+    """
+    line_number = 0
+    for entry in _ENTRY_PATTERN.finditer(text):
+        line = entry.group().strip()
+        if not line:
+            continue
+        line_number += 1
+        match = MEDICATION_ENTRY_PATTERN.fullmatch(line)
+        if not match:
+            yield MedicationParseError(line_number, line, "ожидается формат 'Название ММ.ГГ xКоличество'")
+            continue
+        try:
+            expiry_date = parse_expiry(match.group(2))
+        except ValueError as e:
+            yield MedicationParseError(line_number, line, str(e))
+            continue
+        yield ParsedMedication(match.group(1).strip(), expiry_date, int(match.group(3)))
+
+
+def parse_take_message(text: str) -> Optional[ParsedTake]:
+    """Название и количество из сообщения 'принял Название [xКоличество]'"""
+    match = TAKE_PATTERN.match(text)
+    if not match or (match.group(2) and int(match.group(2)) == 0):
+        return None
+    return ParsedTake(match.group(1).strip(), int(match.group(2) or 1))
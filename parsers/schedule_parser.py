@@ -0,0 +1,228 @@
+import re
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from typing import Optional, Tuple
+
+# "курс Название Дозировка Расписание [метод Метод]"; дозировка, начинающаяся с цифры, отделяет название
+# из нескольких слов, иначе дозировкой считается второе слово
+COURSE_PATTERNS = (
+    re.compile(r"курс\s+(.+?)\s+(\d\S*)\s+(.+?)(?:\s+метод\s+(.+))?$", re.IGNORECASE),
+    re.compile(r"курс\s+(\S+)\s+(\S+)\s+(.+?)(?:\s+метод\s+(.+))?$", re.IGNORECASE),
+)
+
+_TIME = re.compile(r"\b([01]?\d|2[0-3]):([0-5]\d)\b")
+_TIMES_PER_DAY = re.compile(r"(\d+)\s*раз", re.IGNORECASE)
+_EVERY_HOURS = re.compile(r"кажд\w*\s+(\d+)\s*час", re.IGNORECASE)
+_FROM_DATE = re.compile(r"\bс\s+(\d{1,2})\.(\d{1,2})(?:\.(\d{2,4}))?", re.IGNORECASE)
+_TO_DATE = re.compile(r"\b(?:по|до)\s+(\d{1,2})\.(\d{1,2})(?:\.(\d{2,4}))?", re.IGNORECASE)
+_DAYS = re.compile(r"(\d+)\s*(?:дн|сут)", re.IGNORECASE)
+_WEEKDAYS = (
+    re.compile(r"\b(?:пн|понедельник\w*)\b", re.IGNORECASE),
+    re.compile(r"\b(?:вт|вторник\w*)\b", re.IGNORECASE),
+    re.compile(r"\b(?:ср|сред[аыу])\b", re.IGNORECASE),
+    re.compile(r"\b(?:чт|четверг\w*)\b", re.IGNORECASE),
+    re.compile(r"\b(?:пт|пятниц\w*)\b", re.IGNORECASE),
+    re.compile(r"\b(?:сб|суббот\w*)\b", re.IGNORECASE),
+    re.compile(r"\b(?:вс|воскресень\w*)\b", re.IGNORECASE),
+)
+_WORKDAYS = re.compile(r"\bбудн", re.IGNORECASE)
+_WEEKENDS = re.compile(r"\bвыходн", re.IGNORECASE)
+_DAY_PARTS = (
+    (re.compile(r"\bутр", re.IGNORECASE), 8 * 60),
+    (re.compile(r"\bдн[её]м\b|\bв обед", re.IGNORECASE), 14 * 60),
+    (re.compile(r"\bвечер", re.IGNORECASE), 20 * 60),
+    (re.compile(r"\bна ночь|\bперед сном", re.IGNORECASE), 22 * 60),
+)
+# Время приёма для "N раз в день" без указанных часов
+_DEFAULT_TIMES = {
+    1: (9 * 60,),
+    2: (9 * 60, 21 * 60),
+    3: (8 * 60, 14 * 60, 20 * 60),
+    4: (8 * 60, 12 * 60, 16 * 60, 20 * 60),
+}
+# Дневное окно для частых приёмов ("6 раз в день"): первый и последний приём, минуты от полуночи
+_DAY_WINDOW = (8 * 60, 22 * 60)
+ALL_WEEKDAYS = 0b1111111
+DOSE_TIME_FORMAT = "%Y-%m-%dT%H:%M"
+
+
+@dataclass(frozen=True)
+class ParsedCourse:
+    medicine_name: str
+    dosage: str
+    schedule: str
+    method: str
+
+
+@dataclass(frozen=True)
+class CourseSchedule:
+    """
+    Расписание приёма в структурированном виде.
+
+    times — минуты от начала суток; every_hours — интервал между приёмами,
+    отсчитываемый от первого времени в times (или 08:00) в день начала;
+    weekdays — битовая маска дней недели (бит 0 — понедельник).
+    """
+    times: Tuple[int, ...] = ()
+    every_hours: Optional[int] = None
+    start: Optional[date] = None
+    end: Optional[date] = None
+    weekdays: int = ALL_WEEKDAYS
+
+    def dumps(self) -> str:
+        """Компактная строка для колонки courses.schedule_spec: "t=08:00,20:00;h=8;from=...;to=...;dow=135" """
+        parts = []
+        if self.times:
+            parts.append("t=" + ",".join(f"{minute // 60:02d}:{minute % 60:02d}" for minute in self.times))
+        if self.every_hours:
+            parts.append(f"h={self.every_hours}")
+        if self.start:
+            parts.append(f"from={self.start.isoformat()}")
+        if self.end:
+            parts.append(f"to={self.end.isoformat()}")
+        if self.weekdays != ALL_WEEKDAYS:
+            parts.append("dow=" + "".join(str(day + 1) for day in range(7) if self.weekdays >> day & 1))
+        return ";".join(parts)
+
+    @classmethod
+    def loads(cls, spec: str) -> Optional["CourseSchedule"]:
+        if not spec:
+            return None
+        fields = dict(part.split("=", 1) for part in spec.split(";"))
+        times = tuple(int(hours) * 60 + int(minutes) for hours, minutes in
+                      (value.split(":") for value in fields["t"].split(","))) if "t" in fields else ()
+        weekdays = sum(1 << (int(day) - 1) for day in fields["dow"]) if "dow" in fields else ALL_WEEKDAYS
+        return cls(
+            times=times,
+            every_hours=int(fields["h"]) if "h" in fields else None,
+            start=date.fromisoformat(fields["from"]) if "from" in fields else None,
+            end=date.fromisoformat(fields["to"]) if "to" in fields else None,
+            weekdays=weekdays,
+        )
+
+    def _day_allowed(self, day: date) -> bool:
+        return bool(self.weekdays >> day.weekday() & 1)
+
+    def next_dose(self, after: datetime) -> Optional[datetime]:
+        """Ближайший приём строго позже after или None, если курс закончился"""
+        after = after.replace(second=0, microsecond=0)
+        if self.every_hours:
+            start = self.start or after.date()
+            anchor = datetime.combine(start, time(0)) + timedelta(minutes=self.times[0] if self.times else 8 * 60)
+            step = timedelta(hours=self.every_hours)
+            if after < anchor:
+                candidate = anchor
+            else:
+                candidate = anchor + step * ((after - anchor) // step + 1)
+            # Перебор ограничен неделей: дальше дни недели повторяются
+            limit = candidate + timedelta(days=8)
+            while candidate <= limit:
+                if self.end and candidate.date() > self.end:
+                    return None
+                if self._day_allowed(candidate.date()):
+                    return candidate
+                candidate += step
+            return None
+
+        day = max(after.date(), self.start) if self.start else after.date()
+        for _ in range(8):
+            if self.end and day > self.end:
+                return None
+            if self._day_allowed(day):
+                for minute in self.times:
+                    candidate = datetime.combine(day, time(minute // 60, minute % 60))
+                    if candidate > after:
+                        return candidate
+            day += timedelta(days=1)
+        return None
+
+    def describe(self) -> str:
+        """Расписание для ответа пользователю"""
+        parts = []
+        if self.every_hours:
+            parts.append(f"каждые {self.every_hours} ч")
+        if self.times:
+            parts.append(", ".join(f"{minute // 60:02d}:{minute % 60:02d}" for minute in self.times))
+        if self.weekdays != ALL_WEEKDAYS:
+            names = ("пн", "вт", "ср", "чт", "пт", "сб", "вс")
+            parts.append(" ".join(names[day] for day in range(7) if self.weekdays >> day & 1))
+        if self.start and self.end:
+            parts.append(f"с {self.start:%d.%m.%Y} по {self.end:%d.%m.%Y}")
+        elif self.end:
+            parts.append(f"до {self.end:%d.%m.%Y}")
+        return ", ".join(parts)
+
+
+def parse_course_message(text: str) -> Optional[ParsedCourse]:
+    """Поля курса из сообщения 'курс Название Дозировка Расписание [метод Метод]'"""
+    for pattern in COURSE_PATTERNS:
+        match = pattern.search(text.strip())
+        if match:
+            method = match.group(4).strip() if match.group(4) else "Не указан"
+            return ParsedCourse(match.group(1).strip(), match.group(2).strip(), match.group(3).strip(), method)
+    return None
+
+
+def _parse_date(day: str, month: str, year: Optional[str], today: date) -> date:
+    if year is None:
+        full_year = today.year
+    else:
+        full_year = int(year) if len(year) == 4 else 2000 + int(year)
+    return date(full_year, int(month), int(day))
+
+
+def parse_schedule(text: str, today: Optional[date] = None) -> Optional[CourseSchedule]:
+    """
+    Разбирает расписание приёма: "08:00 20:00", "3 раза в день", "каждые 8 часов",
+    "утром и вечером", "по пн ср пт", "по будням", "с 01.11 по 10.11", "7 дней".
+
+    :return: None, если в тексте нет ни времени, ни частоты приёма
+    """
+    today = today or date.today()
+    times = {int(hours) * 60 + int(minutes) for hours, minutes in _TIME.findall(text)}
+    times.update(minute for pattern, minute in _DAY_PARTS if pattern.search(text))
+
+    every = _EVERY_HOURS.search(text)
+    every_hours = int(every.group(1)) if every and 0 < int(every.group(1)) <= 24 else None
+    per_day = _TIMES_PER_DAY.search(text)
+    if not times and per_day and not every_hours:
+        count = int(per_day.group(1))
+        times.update(_DEFAULT_TIMES.get(count, ()))
+        if not times and 0 < count <= 24:
+            # Больше четырёх раз в день — ровно count приёмов равными интервалами с 08:00 до 22:00
+            first, last = _DAY_WINDOW
+            times.update(first + round(i * (last - first) / (count - 1)) for i in range(count))
+
+    weekdays = 0
+    for day, pattern in enumerate(_WEEKDAYS):
+        if pattern.search(text):
+            weekdays |= 1 << day
+    if _WORKDAYS.search(text):
+        weekdays |= 0b0011111
+    if _WEEKENDS.search(text):
+        weekdays |= 0b1100000
+
+    start = end = None
+    from_match, to_match = _FROM_DATE.search(text), _TO_DATE.search(text)
+    try:
+        if from_match:
+            start = _parse_date(*from_match.groups(), today)
+        if to_match:
+            end = _parse_date(*to_match.groups(), today)
+            if start and end < start and not to_match.group(3):
+                # "с 25.12 по 05.01" — конец курса в следующем году
+                end = end.replace(year=end.year + 1)
+    except ValueError:
+        return None
+    if (days := _DAYS.search(text)) and int(days.group(1)) > 0:
+        start = start or today
+        end = start + timedelta(days=int(days.group(1)) - 1)
+
+    if every_hours and not start:
+        # Интервал отсчитывается от дня начала курса, иначе он сбивался бы каждые сутки
+        start = today
+    if not times and not every_hours:
+        if not (weekdays or start or end or re.search(r"ежедневн|каждый день", text, re.IGNORECASE)):
+            return None
+        times = {9 * 60}
+    return CourseSchedule(tuple(sorted(times)), every_hours, start, end, weekdays or ALL_WEEKDAYS)
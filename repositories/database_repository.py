@@ -1,79 +1,891 @@
-from typing import List, Optional, Tuple
-from datetime import datetime
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
-from sqlalchemy.orm import sessionmaker
-from dataclasses import dataclass
+import asyncio
+import time
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+from datetime import date, datetime
+from sqlalchemy import Index, Integer, UniqueConstraint, bindparam, case, delete, event, func, insert, or_, text, tuple_, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import DeclarativeBase, Mapped, MappedAsDataclass, mapped_column
 from sqlalchemy.sql import select
+from constants import (
+    EXPIRY_WARNING_DAYS,
+    EXPIRY_PAGE_SIZE,
+    LIST_PAGE_SIZE,
+    REMINDER_INTERVAL_DAYS,
+    DB_BUSY_TIMEOUT_MS,
+    DB_MMAP_SIZE,
+    DB_POOL_SIZE,
+    DB_MAX_OVERFLOW,
+    DB_POOL_TIMEOUT,
+    DOSE_UPDATE_CHUNK,
+    EXPORT_BATCH_SIZE,
+    SQL_IN_CHUNK,
+)
+from parsers.medication_name import canonical_name
+from parsers.schedule_parser import DOSE_TIME_FORMAT, parse_schedule
+from repositories.medication_name_index import MedicationNameIndex
+from repositories.user_list_cache import UserListCache
+from services.metrics import DB_ERRORS, DB_SECONDS, instrument_methods
+
+
+class Base(MappedAsDataclass, DeclarativeBase):
+    pass
+
+
+class Medication(Base):
+    __tablename__ = "medications"
+    __table_args__ = (
+        # Индекс планировщика: проход напоминаний читает только строки, у которых наступило событие
+        Index("ix_medications_next_event", "next_event_date", "id"),
+        # Сроки годности пользователя в порядке истечения; rowid (id) SQLite добавляет в индекс сам
+        Index("ix_medications_user_expiry", "user_id", "expiry_date"),
+        # Одно лекарство с одним сроком годности — одна строка; повторное добавление суммирует количество
+        Index("ux_medications_user_name_expiry", "user_id", "canonical_name", "expiry_date", unique=True),
+    )
+
+    id: Mapped[Optional[int]] = mapped_column(primary_key=True, default=None)
+    user_id: Mapped[int] = mapped_column(index=True, default=0)
+    name: Mapped[str] = mapped_column(default="")
+    expiry_date: Mapped[str] = mapped_column(default="")
+    quantity: Mapped[int] = mapped_column(default=0)
+    added_date: Mapped[str] = mapped_column(default="")
+    next_event_date: Mapped[Optional[str]] = mapped_column(default=None)
+    canonical_name: Mapped[str] = mapped_column(default="", server_default="")
+
+
+class Course(Base):
+    __tablename__ = "courses"
+    __table_args__ = (
+        # Таймер приёмов восстанавливается после перезапуска чтением только этого индекса
+        Index("ix_courses_next_dose", "next_dose_at", "id"),
+    )
+
+    id: Mapped[Optional[int]] = mapped_column(primary_key=True, default=None)
+    user_id: Mapped[int] = mapped_column(index=True, default=0)
+    medicine_name: Mapped[str] = mapped_column(default="")
+    dosage: Mapped[str] = mapped_column(default="")
+    schedule: Mapped[str] = mapped_column(default="")
+    method: Mapped[str] = mapped_column(default="")
+    added_date: Mapped[str] = mapped_column(default="")
+    # Разобранное расписание (CourseSchedule.dumps) и ближайший приём "YYYY-MM-DDTHH:MM"; NULL — напоминаний нет
+    schedule_spec: Mapped[str] = mapped_column(default="")
+    next_dose_at: Mapped[Optional[str]] = mapped_column(default=None)
+
+
+class SentReminder(Base):
+    """Журнал отправленных напоминаний: повторный проход не отправляет то же событие дважды"""
+    __tablename__ = "sent_reminders"
+    __table_args__ = (UniqueConstraint("medication_id", "event_date", "kind"),)
+
+    id: Mapped[Optional[int]] = mapped_column(primary_key=True, default=None)
+    user_id: Mapped[int] = mapped_column(default=0)
+    medication_id: Mapped[int] = mapped_column(default=0)
+    event_date: Mapped[str] = mapped_column(default="")
+    kind: Mapped[str] = mapped_column(default="")
+    sent_date: Mapped[str] = mapped_column(index=True, default="")
+
+
+class ReminderLease(Base):
+    """
+    Аренда шарда прохода напоминаний между репликами бота.
+
+    Шард обрабатывает тот, чья аренда не истекла; владелец продлевает её,
+    пока работает. completed_pass — номер последнего завершённого прохода.
+    """
+    __tablename__ = "reminder_leases"
+
+    shard: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
+    owner: Mapped[Optional[str]] = mapped_column(default=None)
+    expires_at: Mapped[float] = mapped_column(default=0.0)
+    completed_pass: Mapped[int] = mapped_column(default=-1)
+
+
+def reminder_shard(user_id: int, shards: int) -> int:
+    """Шард пользователя; то же выражение используется в запросе list_due_medications"""
+    return abs(user_id) % shards
+
+
+def _chunks(items: Iterable, size: int = SQL_IN_CHUNK) -> Iterable[list]:
+    """Пачки не больше size элементов для условий IN (...) и пакетных запросов"""
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def next_event_date(expiry_date: str, today: date) -> str:
+    """
+    Возвращает дату ближайшего события для лекарства, начиная с today.
+
+    Событиями считаются напоминания за EXPIRY_WARNING_DAYS дней до истечения срока
+    и далее каждые REMINDER_INTERVAL_DAYS дней, а также день после истечения срока,
+    когда лекарство удаляется из аптечки.
+    """
+    expiry = date.fromisoformat(expiry_date[:10])
+    days_to_expiry = (expiry - today).days
+    if days_to_expiry < 0:
+        return today.isoformat()
+    if days_to_expiry > EXPIRY_WARNING_DAYS:
+        return date.fromordinal(expiry.toordinal() - EXPIRY_WARNING_DAYS).isoformat()
+    passed = EXPIRY_WARNING_DAYS - days_to_expiry
+    remaining = -passed % REMINDER_INTERVAL_DAYS
+    if days_to_expiry - remaining >= 0:
+        return date.fromordinal(today.toordinal() + remaining).isoformat()
+    return date.fromordinal(expiry.toordinal() + 1).isoformat()
+
+
+def _to_async_uri(database_uri: str) -> str:
+    """Приводит путь к файлу SQLite (как в DATABASE_URI из .env) к URI для aiosqlite"""
+    if "://" in database_uri:
+        return database_uri
+    return f"sqlite+aiosqlite:///{database_uri}"
 
-@dataclass
-class Medication:
-    id: int
-    user_id: int
-    name: str
-    expiry_date: str
-    quantity: int
-    added_date: str
-
-@dataclass
-class Course:
-    id: int
-    user_id: int
-    medicine_name: str
-    dosage: str
-    schedule: str
-    method: str
-    added_date: str
 
 DATABASE_URI = "sqlite+aiosqlite:///app.db"
 
-engine = create_async_engine(DATABASE_URI, echo=True)
-AsyncSessionLocal = sessionmaker(
-    bind=engine,
-    class_=AsyncSession,
-    expire_on_commit=False
-)
+# Один движок на базу данных на весь процесс; создаётся при первом обращении
+_engines: Dict[str, AsyncEngine] = {}
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={DB_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA mmap_size={DB_MMAP_SIZE}")
+    cursor.close()
+
+
+def get_engine(database_uri: str = DATABASE_URI, echo: bool = False) -> AsyncEngine:
+    """
+    Возвращает общий для процесса движок базы данных.
+
+    Файловая SQLite работает в режиме WAL с synchronous=NORMAL, busy_timeout и mmap,
+    поэтому чтения не блокируются записью. База в памяти (:memory:) существует
+    только внутри своего движка, поэтому для неё каждый раз создаётся новый.
+    """
+    database_uri = _to_async_uri(database_uri)
+    if database_uri.endswith(":memory:"):
+        return create_async_engine(database_uri, echo=echo)
+
+    engine = _engines.get(database_uri)
+    if engine is None:
+        engine = create_async_engine(
+            database_uri,
+            echo=echo,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+        )
+        event.listen(engine.sync_engine, "connect", _set_sqlite_pragmas)
+        _engines[database_uri] = engine
+    return engine
+
 
+async def dispose_engines() -> None:
+    """Закрывает соединения всех движков; вызывается при остановке бота"""
+    engines = list(_engines.values())
+    _engines.clear()
+    for engine in engines:
+        await engine.dispose()
+
+
+@instrument_methods(DB_SECONDS, DB_ERRORS)
 class DatabaseRepository:
-    def __init__(self, database_uri: str = DATABASE_URI):
-        self.engine = create_async_engine(database_uri, echo=True)
-        self.async_session = sessionmaker(
+    def __init__(self, database_uri: str = DATABASE_URI, echo: bool = False):
+        self.engine = get_engine(database_uri, echo)
+        self.async_session = async_sessionmaker(
             bind=self.engine,
             class_=AsyncSession,
             expire_on_commit=False
         )
+        # Списки пользователя читаются через кэш и сбрасываются при каждой записи
+        self.cache = UserListCache()
+        # Строки журнала отправленных напоминаний, ждущие общей транзакции
+        self._pending_sent: List[dict] = []
+        self._sent_write_lock = asyncio.Lock()
 
-    async def get_session(self) -> AsyncSession:
-        async with self.async_session() as session:
-            return session
+    def get_session(self) -> AsyncSession:
+        return self.async_session()
 
     async def create_tables(self):
-        async with engine.begin() as conn:
+        async with self.engine.begin() as conn:
             await conn.run_sync(Base.metadata.create_all)
+            await conn.run_sync(self._migrate_next_event_date)
+            await conn.run_sync(self._migrate_course_schedule)
+            await conn.run_sync(self._migrate_canonical_name)
+            await conn.run_sync(self._migrate_canonical_dosage)
+            # create_all не добавляет новые индексы в уже существующие таблицы
+            await conn.run_sync(
+                lambda sync_conn: sync_conn.execute(text(
+                    "CREATE INDEX IF NOT EXISTS ix_medications_user_expiry ON medications (user_id, expiry_date)"
+                ))
+            )
+
+    @staticmethod
+    def _migrate_next_event_date(sync_conn) -> None:
+        """Добавляет колонку next_event_date в базы, созданные до появления планировщика"""
+        columns = {row[1] for row in sync_conn.execute(text("PRAGMA table_info(medications)"))}
+        if "next_event_date" in columns:
+            return
+        sync_conn.execute(text("ALTER TABLE medications ADD COLUMN next_event_date VARCHAR"))
+        sync_conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_medications_next_event ON medications (next_event_date, id)"
+        ))
+        today = date.today()
+        rows = sync_conn.execute(text("SELECT id, expiry_date FROM medications")).all()
+        if rows:
+            sync_conn.execute(
+                text("UPDATE medications SET next_event_date = :next_event_date WHERE id = :id"),
+                [{"id": row[0], "next_event_date": next_event_date(row[1], today)} for row in rows]
+            )
+
+    @staticmethod
+    def _migrate_course_schedule(sync_conn) -> None:
+        """Добавляет колонки разобранного расписания и разбирает расписания уже сохранённых курсов"""
+        columns = {row[1] for row in sync_conn.execute(text("PRAGMA table_info(courses)"))}
+        if "schedule_spec" in columns:
+            return
+        sync_conn.execute(text("ALTER TABLE courses ADD COLUMN schedule_spec VARCHAR NOT NULL DEFAULT ''"))
+        sync_conn.execute(text("ALTER TABLE courses ADD COLUMN next_dose_at VARCHAR"))
+        sync_conn.execute(text("CREATE INDEX IF NOT EXISTS ix_courses_next_dose ON courses (next_dose_at, id)"))
+        now = datetime.now()
+        updates = []
+        for course_id, schedule, added_date in sync_conn.execute(text("SELECT id, schedule, added_date FROM courses")):
+            parsed = parse_schedule(schedule, date.fromisoformat(added_date[:10]) if added_date else now.date())
+            next_dose = parsed.next_dose(now) if parsed else None
+            if parsed:
+                updates.append({
+                    "id": course_id,
+                    "spec": parsed.dumps(),
+                    "next_dose_at": next_dose.strftime(DOSE_TIME_FORMAT) if next_dose else None
+                })
+        if updates:
+            sync_conn.execute(
+                text("UPDATE courses SET schedule_spec = :spec, next_dose_at = :next_dose_at WHERE id = :id"),
+                updates
+            )
+
+    @staticmethod
+    def _migrate_canonical_name(sync_conn) -> None:
+        """
+        Добавляет колонку canonical_name и сливает уже накопившиеся дубликаты
+        (одно название и срок годности) в одну строку с суммой количества
+        """
+        columns = {row[1] for row in sync_conn.execute(text("PRAGMA table_info(medications)"))}
+        if "canonical_name" in columns:
+            return
+        sync_conn.execute(text("ALTER TABLE medications ADD COLUMN canonical_name VARCHAR NOT NULL DEFAULT ''"))
+        kept: Dict[Tuple[int, str, str], dict] = {}
+        duplicates = []
+        for med_id, user_id, name, expiry_date, quantity in sync_conn.execute(text(
+            "SELECT id, user_id, name, expiry_date, quantity FROM medications ORDER BY id"
+        )):
+            key = (user_id, canonical_name(name), expiry_date)
+            if key in kept:
+                kept[key]["quantity"] += quantity
+                duplicates.append({"id": med_id})
+            else:
+                kept[key] = {"id": med_id, "canonical_name": key[1], "quantity": quantity}
+        if kept:
+            sync_conn.execute(
+                text("UPDATE medications SET canonical_name = :canonical_name, quantity = :quantity WHERE id = :id"),
+                list(kept.values())
+            )
+        if duplicates:
+            sync_conn.execute(text("DELETE FROM medications WHERE id = :id"), duplicates)
+        sync_conn.execute(text(
+            "CREATE UNIQUE INDEX IF NOT EXISTS ux_medications_user_name_expiry "
+            "ON medications (user_id, canonical_name, expiry_date)"
+        ))
 
-    async def add_medication(self, user_id: int, name: str, expiry_date: str, quantity: int) -> None:
+    @staticmethod
+    def _migrate_canonical_dosage(sync_conn) -> None:
         """
-        Добавляет новое лекарство в базу данных.
-        
+        Пересчитывает canonical_name, в который раньше не входила дозировка.
+        Новые ключи только различают прежние (добавляется дозировка), поэтому
+        уникальный индекс не нарушается. Выполнение отмечается в PRAGMA user_version.
+        """
+        if sync_conn.execute(text("PRAGMA user_version")).scalar() >= 1:
+            return
+        updates = []
+        for med_id, name, old_canonical in sync_conn.execute(text("SELECT id, name, canonical_name FROM medications")):
+            canonical = canonical_name(name)
+            if canonical != old_canonical:
+                updates.append({"id": med_id, "canonical_name": canonical})
+        if updates:
+            sync_conn.execute(text("UPDATE medications SET canonical_name = :canonical_name WHERE id = :id"), updates)
+        sync_conn.execute(text("PRAGMA user_version = 1"))
+
+    @staticmethod
+    def _medication_values(user_id: int, name: str, expiry_date: str, quantity: int, today: date, added_date: str) -> dict:
+        return {
+            "user_id": user_id,
+            "name": name,
+            "canonical_name": canonical_name(name),
+            "expiry_date": expiry_date,
+            "quantity": quantity,
+            "added_date": added_date,
+            "next_event_date": next_event_date(expiry_date, today),
+        }
+
+    @staticmethod
+    def _merge_medication():
+        """INSERT, который при совпадении канонического названия и срока годности прибавляет количество"""
+        statement = sqlite_insert(Medication)
+        return statement.on_conflict_do_update(
+            index_elements=[Medication.user_id, Medication.canonical_name, Medication.expiry_date],
+            set_={"quantity": Medication.quantity + statement.excluded.quantity}
+        )
+
+    async def add_medication(self, user_id: int, name: str, expiry_date: str, quantity: int) -> int:
+        """
+        Добавляет лекарство в аптечку. Если лекарство с тем же каноническим
+        названием и сроком годности уже есть, его количество увеличивается.
+
         :param user_id: ID пользователя
         :param name: Название лекарства
         :param expiry_date: Дата истечения срока годности
         :param quantity: Количество
+        :return: ID лекарства
+        """
+        async with self.get_session() as session:
+            result = await session.execute(
+                self._merge_medication()
+                .values(self._medication_values(user_id, name, expiry_date, quantity, date.today(), datetime.now().isoformat()))
+                .returning(Medication.id)
+            )
+            medication_id = result.scalar_one()
+            await session.commit()
+        self.cache.invalidate([user_id])
+        return medication_id
+
+    async def add_medications_many(self, user_id: int, medications: Sequence) -> int:
+        """
+        Добавляет несколько лекарств одной транзакцией; повторы сливаются, как в add_medication.
+
+        :param user_id: ID пользователя
+        :param medications: Объекты с атрибутами name, expiry_date, quantity
+        :return: Количество добавленных лекарств
+        """
+        if not medications:
+            return 0
+        today = date.today()
+        added_date = datetime.now().isoformat()
+        async with self.get_session() as session:
+            await session.execute(
+                self._merge_medication(),
+                [
+                    self._medication_values(user_id, med.name, med.expiry_date, med.quantity, today, added_date)
+                    for med in medications
+                ]
+            )
+            await session.commit()
+        self.cache.invalidate([user_id])
+        return len(medications)
+
+    async def import_medications_many(self, user_id: int, medications: Sequence, added_date: str) -> int:
+        """
+        Записывает порцию импорта из файла одной транзакцией. Количество уже
+        имеющегося лекарства заменяется, как в upsert_medication, поэтому
+        повторная загрузка своей выгрузки не удваивает аптечку; повторы внутри
+        одного импорта (тот же added_date) складываются.
+
+        :param added_date: Общая метка всех порций одного импорта
+        :return: Количество записанных лекарств
         """
-        async with AsyncSessionLocal() as session:
-            medication = Medication(
+        if not medications:
+            return 0
+        today = date.today()
+        statement = sqlite_insert(Medication)
+        statement = statement.on_conflict_do_update(
+            index_elements=[Medication.user_id, Medication.canonical_name, Medication.expiry_date],
+            set_={
+                "quantity": case(
+                    (Medication.added_date == statement.excluded.added_date, Medication.quantity + statement.excluded.quantity),
+                    else_=statement.excluded.quantity
+                ),
+                "added_date": statement.excluded.added_date,
+            }
+        )
+        async with self.get_session() as session:
+            await session.execute(
+                statement,
+                [
+                    self._medication_values(user_id, med.name, med.expiry_date, med.quantity, today, added_date)
+                    for med in medications
+                ]
+            )
+            await session.commit()
+        self.cache.invalidate([user_id])
+        return len(medications)
+
+    async def add_course(
+        self,
+        user_id: int,
+        medicine_name: str,
+        dosage: str,
+        schedule: str,
+        method: str,
+        schedule_spec: str = "",
+        next_dose_at: Optional[str] = None
+    ) -> int:
+        """
+        :return: id добавленного курса
+        """
+        async with self.get_session() as session:
+            course = Course(
                 id=None,
                 user_id=user_id,
-                name=name,
-                expiry_date=expiry_date,
-                quantity=quantity,
-                added_date=datetime.now().isoformat()
+                medicine_name=medicine_name,
+                dosage=dosage,
+                schedule=schedule,
+                method=method,
+                added_date=datetime.now().isoformat(),
+                schedule_spec=schedule_spec,
+                next_dose_at=next_dose_at
+            )
+            session.add(course)
+            await session.commit()
+        self.cache.invalidate([user_id])
+        return course.id
+
+    async def add_courses_many(self, user_id: int, courses: Sequence[Course], skip_existing: bool = False) -> int:
+        """
+        Добавляет несколько курсов одной транзакцией.
+
+        :param courses: Несохранённые Course; user_id и added_date проставляются здесь
+        :param skip_existing: Пропускать курсы, совпадающие с уже сохранёнными
+            (или с предыдущими в courses) по названию, дозировке и расписанию
+        :return: Количество добавленных курсов
+        """
+        if not courses:
+            return 0
+        added_date = datetime.now().isoformat()
+        async with self.get_session() as session:
+            if skip_existing:
+                existing = set()
+                for chunk in _chunks({course.medicine_name for course in courses}):
+                    result = await session.execute(
+                        select(Course.medicine_name, Course.dosage, Course.schedule)
+                        .where(Course.user_id == user_id, Course.medicine_name.in_(chunk))
+                    )
+                    existing.update(tuple(row) for row in result)
+                fresh = []
+                for course in courses:
+                    key = (course.medicine_name, course.dosage, course.schedule)
+                    if key not in existing:
+                        existing.add(key)
+                        fresh.append(course)
+                courses = fresh
+                if not courses:
+                    return 0
+            await session.execute(
+                insert(Course),
+                [
+                    {
+                        "user_id": user_id,
+                        "medicine_name": course.medicine_name,
+                        "dosage": course.dosage,
+                        "schedule": course.schedule,
+                        "method": course.method,
+                        "added_date": added_date,
+                        "schedule_spec": course.schedule_spec,
+                        "next_dose_at": course.next_dose_at,
+                    }
+                    for course in courses
+                ]
+            )
+            await session.commit()
+        self.cache.invalidate([user_id])
+        return len(courses)
+
+    async def upsert_medication(self, user_id: int, name: str, expiry_date: str, quantity: int) -> int:
+        """
+        Устанавливает количество лекарства с тем же каноническим названием
+        и сроком годности или добавляет новое, если такого ещё нет.
+
+        :return: ID лекарства
+        """
+        statement = sqlite_insert(Medication).values(
+            self._medication_values(user_id, name, expiry_date, quantity, date.today(), datetime.now().isoformat())
+        )
+        async with self.get_session() as session:
+            result = await session.execute(
+                statement.on_conflict_do_update(
+                    index_elements=[Medication.user_id, Medication.canonical_name, Medication.expiry_date],
+                    set_={"quantity": statement.excluded.quantity}
+                ).returning(Medication.id)
             )
-            session.add(medication)
+            medication_id = result.scalar_one()
             await session.commit()
+        self.cache.invalidate([user_id])
+        return medication_id
 
     async def list_medications(self, user_id: int) -> List[Medication]:
+        """Лекарства пользователя; возвращаемый список общий для кэша и не должен изменяться"""
+        medications = self.cache.get(user_id, "medications")
+        if medications is None:
+            version = self.cache.version()
+            async with self.get_session() as session:
+                result = await session.execute(
+                    select(Medication).where(Medication.user_id == user_id)
+                )
+                medications = result.scalars().all()
+            self.cache.set(user_id, "medications", medications, since=version)
+        return medications
+
+    async def find_medications(self, user_id: int, name: str, limit: int = 5) -> List[Tuple[Medication, float]]:
+        """Лекарства аптечки с похожим названием и их сходство, лучшие первыми"""
+        index = self.cache.get(user_id, "name_index")
+        if index is None:
+            version = self.cache.version()
+            index = MedicationNameIndex(await self.list_medications(user_id))
+            self.cache.set(user_id, "name_index", index, since=version)
+        return index.search(name, limit)
+
+    async def take_medication(self, user_id: int, name: str, amount: int = 1) -> Optional[Tuple[Medication, int]]:
+        """
+        Уменьшает количество лекарства, найденного по неточному названию.
+        Из нескольких сроков годности списывается тот, что истекает раньше, пока он не закончится.
+
+        :return: Лекарство и оставшееся количество или None, если похожего лекарства нет
+        """
+        matches = await self.find_medications(user_id, name, limit=20)
+        if not matches:
+            return None
+        best = matches[0][0].canonical_name
+        batches = [med for med, _ in matches if med.canonical_name == best]
+        medication = min(batches, key=lambda med: (med.quantity <= 0, med.expiry_date))
+        async with self.get_session() as session:
+            result = await session.execute(
+                update(Medication)
+                .where(Medication.id == medication.id, Medication.user_id == user_id)
+                .values(quantity=func.max(Medication.quantity - amount, 0))
+                .returning(Medication.quantity)
+            )
+            remaining = result.scalar_one_or_none()
+            await session.commit()
+        self.cache.invalidate([user_id])
+        if remaining is None:
+            return None
+        return medication, remaining
+
+    async def list_courses(self, user_id: int) -> List[Course]:
+        courses = self.cache.get(user_id, "courses")
+        if courses is None:
+            version = self.cache.version()
+            async with self.get_session() as session:
+                result = await session.execute(
+                    select(Course).where(Course.user_id == user_id)
+                )
+                courses = result.scalars().all()
+            self.cache.set(user_id, "courses", courses, since=version)
+        return courses
+
+    async def _keyset_page(self, model, user_id: int, cursor: Optional[int], backward: bool, limit: int) -> Tuple[list, bool]:
+        query = select(model).where(model.user_id == user_id)
+        if backward:
+            if cursor is not None:
+                query = query.where(model.id < cursor)
+            query = query.order_by(model.id.desc())
+        else:
+            if cursor is not None:
+                query = query.where(model.id > cursor)
+            query = query.order_by(model.id)
+        async with self.get_session() as session:
+            result = await session.execute(query.limit(limit + 1))
+            rows = result.scalars().all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if backward:
+            rows.reverse()
+        return rows, has_more
+
+    async def list_medications_page(
+        self,
+        user_id: int,
+        cursor: Optional[int] = None,
+        backward: bool = False,
+        limit: int = LIST_PAGE_SIZE
+    ) -> Tuple[List[Medication], bool]:
+        """
+        Страница аптечки по ключу id без загрузки всего списка.
+
+        :param cursor: id, после которого (или до которого при backward) начинается страница
+        :param backward: Листать назад
+        :return: Лекарства страницы по возрастанию id и признак наличия следующих строк в направлении листания
+        """
+        return await self._keyset_page(Medication, user_id, cursor, backward, limit)
+
+    async def list_courses_page(
+        self,
+        user_id: int,
+        cursor: Optional[int] = None,
+        backward: bool = False,
+        limit: int = LIST_PAGE_SIZE
+    ) -> Tuple[List[Course], bool]:
+        return await self._keyset_page(Course, user_id, cursor, backward, limit)
+
+    async def _iter_rows(self, model, user_id: int, batch: int):
+        cursor = None
+        while True:
+            rows, has_more = await self._keyset_page(model, user_id, cursor, False, batch)
+            for row in rows:
+                yield row
+            if not has_more:
+                return
+            cursor = rows[-1].id
+
+    def iter_medications(self, user_id: int, batch: int = EXPORT_BATCH_SIZE) -> AsyncIterator[Medication]:
+        """Все лекарства пользователя по возрастанию id, порциями по batch строк без загрузки всего списка"""
+        return self._iter_rows(Medication, user_id, batch)
+
+    def iter_courses(self, user_id: int, batch: int = EXPORT_BATCH_SIZE) -> AsyncIterator[Course]:
+        return self._iter_rows(Course, user_id, batch)
+
+    async def list_expiring_medications(
+        self,
+        user_id: int,
+        within_days: int = EXPIRY_WARNING_DAYS,
+        after: Optional[Tuple[str, int]] = None,
+        limit: int = EXPIRY_PAGE_SIZE,
+        today: Optional[date] = None
+    ) -> List[Tuple[Medication, int]]:
+        """
+        Лекарства пользователя, срок годности которых истекает в ближайшие within_days дней,
+        в порядке истечения срока вместе с числом оставшихся дней.
+
+        Фильтр, сортировка и расчёт дней выполняются в SQLite по индексу (user_id, expiry_date).
+
+        :param after: Ключ (expiry_date, id) последней строки предыдущей страницы
+        :param limit: Размер страницы
+        """
+        today = (today or date.today()).isoformat()
+        days_to_expiry = func.cast(
+            func.julianday(func.substr(Medication.expiry_date, 1, 10)) - func.julianday(today), Integer
+        )
+        query = (
+            select(Medication, days_to_expiry)
+            .where(
+                Medication.user_id == user_id,
+                Medication.expiry_date >= func.date(today, "+1 day"),
+                Medication.expiry_date < func.date(today, f"+{within_days + 1} days")
+            )
+            .order_by(Medication.expiry_date, Medication.id)
+            .limit(limit)
+        )
+        if after is not None:
+            query = query.where(tuple_(Medication.expiry_date, Medication.id) > tuple_(*after))
+        async with self.get_session() as session:
+            result = await session.execute(query)
+            return [(med, days) for med, days in result.all()]
+
+    async def list_due_medications(self, today: date, shard: Optional[int] = None, shards: int = 1) -> List[Medication]:
+        """
+        Лекарства, у которых на дату today наступило событие планировщика (по индексу next_event_date).
+
+        :param shard: Только лекарства пользователей этого шарда из shards (см. reminder_shard)
+        """
+        query = (
+            select(Medication)
+            .where(Medication.next_event_date <= today.isoformat())
+            .order_by(Medication.next_event_date, Medication.id)
+        )
+        if shard is not None:
+            query = query.where(func.abs(Medication.user_id) % shards == shard)
+        async with self.get_session() as session:
+            result = await session.execute(query)
+            return result.scalars().all()
+
+    async def apply_reminder_pass(
+        self,
+        expired_ids: Sequence[int],
+        rescheduled: Sequence[Tuple[int, str]],
+        user_ids: Iterable[int] = ()
+    ) -> None:
+        """
+        Применяет результаты прохода напоминаний в одной транзакции:
+        удаляет просроченные лекарства (DELETE пачками по SQL_IN_CHUNK id) и переносит next_event_date у остальных.
+
+        :param user_ids: Владельцы затронутых лекарств, их кэш сбрасывается
+        """
+        async with self.get_session() as session:
+            for chunk in _chunks(expired_ids):
+                await session.execute(delete(Medication).where(Medication.id.in_(chunk)))
+            if rescheduled:
+                await session.execute(
+                    update(Medication.__table__)
+                    .where(Medication.__table__.c.id == bindparam("med_id"))
+                    .values(next_event_date=bindparam("next_date")),
+                    [{"med_id": med_id, "next_date": next_date} for med_id, next_date in rescheduled]
+                )
+            await session.commit()
+        self.cache.invalidate(user_ids)
+
+    async def delete_medications(self, medication_ids: Sequence[int]) -> int:
+        """
+        Удаляет лекарства в одной транзакции, пачками по SQL_IN_CHUNK id.
+
+        :return: Количество удалённых лекарств
+        """
+        if not medication_ids:
+            return 0
+        user_ids = []
+        async with self.get_session() as session:
+            for chunk in _chunks(medication_ids):
+                result = await session.execute(
+                    delete(Medication).where(Medication.id.in_(chunk)).returning(Medication.user_id)
+                )
+                user_ids.extend(result.scalars().all())
+            await session.commit()
+        self.cache.invalidate(set(user_ids))
+        return len(user_ids)
+
+    async def find_sent_reminders(self, keys: Sequence[Tuple[int, str, str]]) -> Set[Tuple[int, str, str]]:
+        """Возвращает подмножество ключей (medication_id, event_date, kind), уже записанных в журнал"""
+        if not keys:
+            return set()
+        found = set()
+        async with self.get_session() as session:
+            for chunk in _chunks({key[0] for key in keys}):
+                result = await session.execute(
+                    select(SentReminder.medication_id, SentReminder.event_date, SentReminder.kind)
+                    .where(SentReminder.medication_id.in_(chunk))
+                )
+                found.update(map(tuple, result.all()))
+        return found & set(keys)
+
+    async def record_sent_reminders(self, user_id: int, keys: Sequence[Tuple[int, str, str]]) -> None:
+        """
+        Записывает отправленные напоминания в журнал и возвращается, когда запись закоммичена.
+
+        Одновременные вызовы объединяются в одну транзакцию (group commit): пока один вызов
+        пишет, остальные копят строки для следующей. Так несколько реплик на одной базе
+        не толкаются за блокировку записи на каждого пользователя.
+        """
+        if not keys:
+            return
+        sent_date = date.today().isoformat()
+        self._pending_sent.extend(
+            {"user_id": user_id, "medication_id": medication_id, "event_date": event_date,
+             "kind": kind, "sent_date": sent_date}
+            for medication_id, event_date, kind in keys
+        )
+        async with self._sent_write_lock:
+            if not self._pending_sent:
+                # Строки уже записал предыдущий вызов
+                return
+            rows, self._pending_sent = self._pending_sent, []
+            try:
+                async with self.get_session() as session:
+                    await session.execute(sqlite_insert(SentReminder).on_conflict_do_nothing(), rows)
+                    await session.commit()
+            except BaseException:
+                # Строки вернутся в очередь, и их запишет (или получит ту же ошибку) следующий вызов
+                self._pending_sent[:0] = rows
+                raise
+
+    async def prune_sent_reminders(self, before: date) -> None:
         async with self.get_session() as session:
+            await session.execute(delete(SentReminder).where(SentReminder.sent_date < before.isoformat()))
+            await session.commit()
+
+    async def claim_reminder_shard(self, shard: int, owner: str, pass_number: int, ttl: float) -> bool:
+        """
+        Берёт шард в аренду на ttl секунд, если проход pass_number по нему ещё не завершён
+        и шард свободен, аренда истекла или уже принадлежит owner.
+        """
+        now = time.time()
+        async with self.get_session() as session:
+            # Запись идёт первой: транзакция сразу берёт блокировку на запись, и два процесса
+            # не могут одновременно увидеть шард свободным
+            await session.execute(sqlite_insert(ReminderLease).values(shard=shard).on_conflict_do_nothing())
             result = await session.execute(
-                select(Medication).where(Medication.user_id == user_id)
+                update(ReminderLease)
+                .where(
+                    ReminderLease.shard == shard,
+                    ReminderLease.completed_pass < pass_number,
+                    or_(ReminderLease.owner.is_(None), ReminderLease.owner == owner, ReminderLease.expires_at <= now)
+                )
+                .values(owner=owner, expires_at=now + ttl)
             )
-            return result.scalars().all() 
\ No newline at end of file
+            await session.commit()
+            return result.rowcount == 1
+
+    async def renew_reminder_lease(self, shard: int, owner: str, ttl: float) -> bool:
+        """Продлевает аренду; False, если шард уже перехватил другой владелец"""
+        async with self.get_session() as session:
+            result = await session.execute(
+                update(ReminderLease)
+                .where(ReminderLease.shard == shard, ReminderLease.owner == owner)
+                .values(expires_at=time.time() + ttl)
+            )
+            await session.commit()
+            return result.rowcount == 1
+
+    async def release_reminder_shard(self, shard: int, owner: str, completed_pass: Optional[int] = None) -> bool:
+        """Освобождает аренду; с completed_pass отмечает проход по шарду завершённым"""
+        values = {"owner": None, "expires_at": 0.0}
+        if completed_pass is not None:
+            values["completed_pass"] = completed_pass
+        async with self.get_session() as session:
+            result = await session.execute(
+                update(ReminderLease).where(ReminderLease.shard == shard, ReminderLease.owner == owner).values(**values)
+            )
+            await session.commit()
+            return result.rowcount == 1
+
+    async def pending_reminder_shards(self, shards: int, pass_number: int) -> Set[int]:
+        """Шарды из range(shards), проход pass_number по которым ещё не завершён"""
+        async with self.get_session() as session:
+            result = await session.execute(
+                select(ReminderLease.shard).where(ReminderLease.completed_pass >= pass_number)
+            )
+            return set(range(shards)) - set(result.scalars().all())
+
+    async def list_scheduled_doses(self) -> List[Tuple[str, int]]:
+        """Пары (next_dose_at, id) всех курсов с напоминаниями; читается только индекс ix_courses_next_dose"""
+        async with self.get_session() as session:
+            result = await session.execute(
+                select(Course.next_dose_at, Course.id).where(Course.next_dose_at.is_not(None))
+            )
+            return [tuple(row) for row in result.all()]
+
+    async def get_courses(self, course_ids: Sequence[int]) -> List[Course]:
+        if not course_ids:
+            return []
+        courses = []
+        async with self.get_session() as session:
+            for chunk in _chunks(course_ids):
+                result = await session.execute(select(Course).where(Course.id.in_(chunk)))
+                courses.extend(result.scalars().all())
+        return courses
+
+    async def advance_course_doses(self, changes: Sequence[Tuple[int, str, Optional[str]]]) -> Set[int]:
+        """
+        Переносит next_dose_at курсов (id, ожидаемое значение, новое значение) в одной транзакции.
+
+        Строка меняется, только если next_dose_at всё ещё равен ожидаемому, поэтому из нескольких
+        реплик приём отправляет та, что перенесла его первой.
+
+        :return: id перенесённых курсов
+        """
+        advanced = set()
+        if not changes:
+            return advanced
+        async with self.get_session() as session:
+            connection = await session.connection()
+            # Один UPDATE ... FROM (VALUES ...) RETURNING на пачку: в пиковую минуту приёмов десятки тысяч.
+            # Позиционные параметры передаются драйверу напрямую, без компиляции выражения SQLAlchemy
+            for start in range(0, len(changes), DOSE_UPDATE_CHUNK):
+                chunk = changes[start:start + DOSE_UPDATE_CHUNK]
+                result = await connection.exec_driver_sql(
+                    "UPDATE courses SET next_dose_at = v.column3 "
+                    f"FROM (VALUES {', '.join(['(?, ?, ?)'] * len(chunk))}) AS v "
+                    "WHERE courses.id = v.column1 AND courses.next_dose_at = v.column2 "
+                    "RETURNING courses.id",
+                    tuple(value for change in chunk for value in change)
+                )
+                advanced.update(row[0] for row in result.all())
+            await session.commit()
+        return advanced
@@ -0,0 +1,68 @@
+from collections import defaultdict
+from typing import Dict, List, Sequence, Tuple
+from constants import MEDICATION_MATCH_THRESHOLD
+from parsers.medication_name import canonical_name, name_parts, name_trigrams
+
+
+class MedicationNameIndex:
+    """
+    Обратный индекс «триграмма → лекарства» по каноническим названиям аптечки пользователя.
+
+    Поиск просматривает только списки лекарств для триграмм запроса и считает
+    сходство Жаккара по числу общих триграмм, не сравнивая запрос с каждым
+    лекарством. Триграммы строятся по названию без дозировки; дозировка,
+    если она есть в запросе, должна совпасть. Индекс строится по
+    закэшированному списку лекарств и сбрасывается вместе с ним при любой
+    записи в аптечку.
+    """
+
+    def __init__(self, medications: Sequence):
+        self._medications = list(medications)
+        self._exact: Dict[str, List[int]] = defaultdict(list)
+        self._by_name: Dict[str, List[int]] = defaultdict(list)
+        self._postings: Dict[str, List[int]] = defaultdict(list)
+        self._sizes: List[int] = []
+        self._dosages: List[str] = []
+        for position, med in enumerate(self._medications):
+            name, dosage = name_parts(med.name)
+            trigrams = name_trigrams(name)
+            self._exact[med.canonical_name or canonical_name(med.name)].append(position)
+            self._by_name[name].append(position)
+            self._sizes.append(len(trigrams))
+            self._dosages.append(dosage)
+            for trigram in trigrams:
+                self._postings[trigram].append(position)
+
+    def __len__(self) -> int:
+        return len(self._medications)
+
+    def _same_dosage(self, position: int, dosage: str) -> bool:
+        return not dosage or not self._dosages[position] or self._dosages[position] == dosage
+
+    def search(self, name: str, limit: int = 5, threshold: float = MEDICATION_MATCH_THRESHOLD) -> List[Tuple[object, float]]:
+        """
+        Лекарства, похожие на name, по убыванию сходства (1.0 — совпадение канонических названий).
+
+        :return: Пары (лекарство, сходство) со сходством не ниже threshold
+        """
+        base, dosage = name_parts(name)
+        # Дозировка не указана в запросе или у лекарства — подходит любая: "принял аспирин"
+        exact = self._exact.get(canonical_name(name)) or [
+            position for position in self._by_name.get(base, ()) if self._same_dosage(position, dosage)
+        ]
+        if exact:
+            return [(self._medications[position], 1.0) for position in exact[:limit]]
+        trigrams = name_trigrams(base)
+        shared: Dict[int, int] = defaultdict(int)
+        for trigram in trigrams:
+            for position in self._postings.get(trigram, ()):
+                shared[position] += 1
+        scored = []
+        for position, count in shared.items():
+            if not self._same_dosage(position, dosage):
+                continue
+            similarity = count / (len(trigrams) + self._sizes[position] - count)
+            if similarity >= threshold:
+                scored.append((-similarity, position))
+        scored.sort()
+        return [(self._medications[position], -similarity) for similarity, position in scored[:limit]]
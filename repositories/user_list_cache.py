@@ -0,0 +1,76 @@
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
+from constants import USER_CACHE_MAX_USERS, USER_CACHE_TTL
+
+
+class UserListCache:
+    """
+    LRU-кэш данных пользователя: списки лекарств и курсов, а также уже
+    отформатированный текст этих списков. Все значения пользователя хранятся
+    в одной записи и сбрасываются вместе при любой записи в его данные.
+
+    Запись живёт не дольше ttl секунд: изменения, сделанные другой репликой
+    (например, удаление истёкших лекарств её проходом напоминаний), этот кэш
+    не сбрасывают. Чтение из базы начинается с version(), и set(..., since=...)
+    не сохраняет результат, если данные пользователя сбрасывались после этого:
+    иначе чтение, пересёкшееся с записью, закэшировало бы устаревший список.
+    """
+
+    def __init__(self, max_users: int = USER_CACHE_MAX_USERS, ttl: float = USER_CACHE_TTL, clock=time.monotonic):
+        self.max_users = max_users
+        self.ttl = ttl
+        self.clock = clock
+        self._entries: "OrderedDict[int, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        # Номер последнего сброса по пользователям; для вытесненных из словаря — _floor
+        self._tick = 0
+        self._invalidated: "OrderedDict[int, int]" = OrderedDict()
+        self._floor = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: int, key: str) -> Optional[Any]:
+        item = self._entries.get(user_id)
+        if item is not None and item[0] <= self.clock():
+            del self._entries[user_id]
+            item = None
+        if item is None or key not in item[1]:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(user_id)
+        self.hits += 1
+        return item[1][key]
+
+    def version(self) -> int:
+        """Метка начала чтения из базы для set(..., since=...)"""
+        return self._tick
+
+    def set(self, user_id: int, key: str, value: Any, since: Optional[int] = None) -> None:
+        if since is not None and self._invalidated.get(user_id, self._floor) > since:
+            # Данные изменились, пока читались: прочитанное может быть устаревшим
+            return
+        item = self._entries.get(user_id)
+        if item is None or item[0] <= self.clock():
+            item = self._entries[user_id] = (self.clock() + self.ttl, {})
+            while len(self._entries) > self.max_users:
+                self._entries.popitem(last=False)
+        self._entries.move_to_end(user_id)
+        item[1][key] = value
+
+    def invalidate(self, user_ids: Iterable[int]) -> None:
+        self._tick += 1
+        for user_id in user_ids:
+            self._entries.pop(user_id, None)
+            self._invalidated[user_id] = self._tick
+            self._invalidated.move_to_end(user_id)
+        while len(self._invalidated) > self.max_users:
+            _, tick = self._invalidated.popitem(last=False)
+            self._floor = max(self._floor, tick)
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> Dict[str, float]:
+        return {"hits": self.hits, "misses": self.misses, "hit_ratio": self.hit_ratio, "users": len(self._entries)}
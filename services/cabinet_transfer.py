@@ -0,0 +1,110 @@
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import IO, Callable, List, Optional
+from constants import IMPORT_CHUNK_SIZE, IMPORT_MAX_REPORTED_ERRORS
+from parsers.cabinet_file import CabinetFileError, CabinetWriter, course_record, iter_cabinet_records, medication_record
+from parsers.medication_parser import MedicationParseError, ParsedMedication
+from parsers.schedule_parser import DOSE_TIME_FORMAT, ParsedCourse, parse_schedule
+from repositories.database_repository import Course, DatabaseRepository
+
+
+@dataclass
+class ImportResult:
+    medications: int = 0
+    courses: int = 0
+    error_count: int = 0
+    # Первые IMPORT_MAX_REPORTED_ERRORS ошибок; остальные только считаются
+    errors: List[MedicationParseError] = field(default_factory=list)
+    # Причина, по которой чтение файла прервано; уже записанные порции остаются в базе
+    aborted: Optional[str] = None
+
+
+def _course(parsed: ParsedCourse, now: datetime) -> Course:
+    """Курс с разобранным расписанием, как при добавлении сообщением"""
+    schedule = parse_schedule(parsed.schedule, now.date())
+    next_dose = schedule.next_dose(now) if schedule else None
+    return Course(
+        medicine_name=parsed.medicine_name,
+        dosage=parsed.dosage,
+        schedule=parsed.schedule,
+        method=parsed.method,
+        schedule_spec=schedule.dumps() if schedule else "",
+        next_dose_at=next_dose.strftime(DOSE_TIME_FORMAT) if next_dose else None,
+    )
+
+
+async def import_cabinet(
+    db_repository: DatabaseRepository,
+    user_id: int,
+    stream: IO[str],
+    file_format: str,
+    chunk_size: int = IMPORT_CHUNK_SIZE,
+    on_chunk: Optional[Callable[[ImportResult], None]] = None,
+) -> ImportResult:
+    """
+    Построчно читает файл аптечки и пишет его порциями по chunk_size записей,
+    каждая порция — одной транзакцией. В памяти держится только текущая порция.
+
+    Количество уже имеющихся лекарств заменяется значением из файла, а курсы,
+    совпадающие с сохранёнными, пропускаются: восстановление своей выгрузки
+    в тот же аккаунт ничего не удваивает.
+
+    :param on_chunk: Вызывается после записи каждой порции (для прогресса)
+    """
+    result = ImportResult()
+    medications: List[ParsedMedication] = []
+    courses: List[Course] = []
+    now = datetime.now()
+    added_date = now.isoformat()
+
+    async def flush() -> None:
+        result.medications += await db_repository.import_medications_many(user_id, medications, added_date)
+        result.courses += await db_repository.add_courses_many(user_id, courses, skip_existing=True)
+        medications.clear()
+        courses.clear()
+        if on_chunk:
+            on_chunk(result)
+
+    try:
+        for entry in iter_cabinet_records(stream, file_format):
+            if isinstance(entry, MedicationParseError):
+                result.error_count += 1
+                if len(result.errors) < IMPORT_MAX_REPORTED_ERRORS:
+                    result.errors.append(entry)
+                continue
+            if isinstance(entry, ParsedCourse):
+                courses.append(_course(entry, now))
+            else:
+                medications.append(entry)
+            if len(medications) + len(courses) >= chunk_size:
+                await flush()
+    except (CabinetFileError, UnicodeDecodeError) as e:
+        result.aborted = str(e)
+    await flush()
+    return result
+
+
+async def import_cabinet_file(db_repository: DatabaseRepository, user_id: int, path: str, file_format: str, **kwargs) -> ImportResult:
+    # utf-8-sig: Excel сохраняет CSV с BOM
+    with open(path, encoding="utf-8-sig", newline="") as stream:
+        return await import_cabinet(db_repository, user_id, stream, file_format, **kwargs)
+
+
+async def export_cabinet(db_repository: DatabaseRepository, user_id: int, stream: IO[str], file_format: str) -> int:
+    """
+    Пишет лекарства и курсы пользователя в файл, читая их порциями по ключу id.
+
+    :return: Количество записей
+    """
+    writer = CabinetWriter(stream, file_format)
+    async for med in db_repository.iter_medications(user_id):
+        writer.write(medication_record(med))
+    async for course in db_repository.iter_courses(user_id):
+        writer.write(course_record(course))
+    writer.close()
+    return writer.count
+
+
+async def export_cabinet_file(db_repository: DatabaseRepository, user_id: int, path: str, file_format: str) -> int:
+    with open(path, "w", encoding="utf-8", newline="") as stream:
+        return await export_cabinet(db_repository, user_id, stream, file_format)
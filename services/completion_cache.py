@@ -0,0 +1,170 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+import aiosqlite
+from constants import LLM_CACHE_TTL, MAX_CACHE_SIZE
+
+CacheKey = Tuple[str, int, str]
+
+
+def make_cache_key(model: str, max_tokens: int, prompt: str) -> CacheKey:
+    """Ключ кэша: модель, лимит токенов и промпт с нормализованными пробелами"""
+    return model, max_tokens, " ".join(prompt.split())
+
+
+class SQLiteCacheBackend:
+    """Хранение кэша на диске, чтобы прогретый кэш переживал перезапуск бота"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._db: Optional[aiosqlite.Connection] = None
+
+    async def open(self) -> None:
+        self._db = await aiosqlite.connect(self.path)
+        await self._db.execute(
+            "CREATE TABLE IF NOT EXISTS completion_cache ("
+            "model TEXT, max_tokens INTEGER, prompt TEXT, value TEXT, expires_at REAL, "
+            "PRIMARY KEY (model, max_tokens, prompt))"
+        )
+        await self._db.commit()
+
+    async def close(self) -> None:
+        if self._db is not None:
+            await self._db.close()
+            self._db = None
+
+    async def load(self, limit: int) -> Dict[CacheKey, Tuple[str, float]]:
+        """Удаляет устаревшие записи и возвращает не более limit самых свежих"""
+        await self._db.execute("DELETE FROM completion_cache WHERE expires_at <= ?", (time.time(),))
+        await self._db.commit()
+        async with self._db.execute(
+            "SELECT model, max_tokens, prompt, value, expires_at FROM completion_cache "
+            "ORDER BY expires_at DESC LIMIT ?", (limit,)
+        ) as cursor:
+            rows = await cursor.fetchall()
+        # Возвращаем от старых к новым, чтобы порядок LRU в памяти совпадал со свежестью
+        return {(row[0], row[1], row[2]): (row[3], row[4]) for row in reversed(rows)}
+
+    async def set(self, key: CacheKey, value: str, expires_at: float) -> None:
+        await self._db.execute(
+            "INSERT OR REPLACE INTO completion_cache VALUES (?, ?, ?, ?, ?)", (*key, value, expires_at)
+        )
+        await self._db.commit()
+
+    async def delete(self, key: CacheKey) -> None:
+        await self._db.execute(
+            "DELETE FROM completion_cache WHERE model = ? AND max_tokens = ? AND prompt = ?", key
+        )
+        await self._db.commit()
+
+
+def _retrieve_exception(task: asyncio.Task) -> None:
+    # Исключение передаётся ожидающим; если все они отменены, не оставляем его «неполученным»
+    if not task.cancelled():
+        task.exception()
+
+
+class CompletionCache:
+    """
+    Асинхронный кэш ответов LLM с TTL и LRU-вытеснением.
+
+    Одновременные запросы с одинаковым ключом объединяются (single-flight):
+    к API уходит один запрос, остальные ждут его результат. Запрос выполняется
+    в отдельной задаче, поэтому отмена первого вызвавшего не отменяет его
+    для остальных ожидающих.
+    """
+
+    def __init__(self, max_size: int = MAX_CACHE_SIZE, ttl: float = LLM_CACHE_TTL, persist_path: Optional[str] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[CacheKey, Tuple[str, float]]" = OrderedDict()
+        self._in_flight: Dict[CacheKey, asyncio.Task] = {}
+        self._backend = SQLiteCacheBackend(persist_path) if persist_path else None
+        self._opened = False
+        self._open_lock = asyncio.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    async def open(self) -> None:
+        if self._opened:
+            return
+        async with self._open_lock:
+            if self._opened:
+                return
+            if self._backend is not None:
+                await self._backend.open()
+                self._entries.update(await self._backend.load(self.max_size))
+            self._opened = True
+
+    async def close(self) -> None:
+        if self._backend is not None:
+            await self._backend.close()
+        self._opened = False
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions, "size": len(self._entries)}
+
+    def _lookup(self, key: CacheKey) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at <= time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def _store(self, key: CacheKey, value: str) -> None:
+        expires_at = time.time() + self.ttl
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        evicted = []
+        while len(self._entries) > self.max_size:
+            evicted.append(self._entries.popitem(last=False)[0])
+            self.evictions += 1
+        if self._backend is not None:
+            await self._backend.set(key, value, expires_at)
+            for evicted_key in evicted:
+                await self._backend.delete(evicted_key)
+
+    async def get(self, key: CacheKey) -> Optional[str]:
+        await self.open()
+        value = self._lookup(key)
+        if value is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return value
+
+    async def set(self, key: CacheKey, value: str) -> None:
+        await self.open()
+        await self._store(key, value)
+
+    async def get_or_compute(self, key: CacheKey, compute: Callable[[], Awaitable[Optional[str]]]) -> Optional[str]:
+        await self.open()
+        value = self._lookup(key)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+            in_flight = self._in_flight[key] = asyncio.ensure_future(self._compute(key, compute))
+            in_flight.add_done_callback(_retrieve_exception)
+        # shield: отмена одного ожидающего не отменяет общий запрос
+        return await asyncio.shield(in_flight)
+
+    async def _compute(self, key: CacheKey, compute: Callable[[], Awaitable[Optional[str]]]) -> Optional[str]:
+        try:
+            value = await compute()
+            if value:
+                await self._store(key, value)
+            return value
+        finally:
+            del self._in_flight[key]
@@ -0,0 +1,166 @@
+import asyncio
+import heapq
+import logging
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from constants import DOSE_LATE_TOLERANCE, DOSE_REBUILD_INTERVAL
+from parsers.schedule_parser import DOSE_TIME_FORMAT, CourseSchedule
+from repositories.database_repository import Course, DatabaseRepository
+
+logger = logging.getLogger(__name__)
+
+# У многих курсов одинаковое расписание; разбор строки кэшируется
+_load_schedule = lru_cache(maxsize=4096)(CourseSchedule.loads)
+
+
+class DoseScheduler:
+    """
+    Напоминания о приёме лекарств по курсам.
+
+    Все запланированные приёмы лежат в одной куче (время приёма, id курса),
+    и задача просыпается ровно к ближайшему из них, а не опрашивает курсы.
+    Время хранится с точностью до минуты в колонке courses.next_dose_at, поэтому
+    после перезапуска куча восстанавливается одним чтением индекса. Приём
+    отправляется, только если его next_dose_at удалось перенести условным UPDATE,
+    так что несколько реплик не дублируют напоминания. Приёмы, пропущенные
+    больше чем на late_tolerance секунд (бот был остановлен), не отправляются.
+    """
+
+    def __init__(
+        self,
+        db_repository: DatabaseRepository,
+        send: Callable[[int, List[Course]], Awaitable[object]],
+        clock: Callable[[], datetime] = datetime.now,
+        late_tolerance: float = DOSE_LATE_TOLERANCE,
+        rebuild_interval: float = DOSE_REBUILD_INTERVAL,
+    ):
+        """
+        :param send: Корутина (user_id, курсы), отправляющая одно напоминание о приёмах пользователя
+        :param rebuild_interval: Как часто перечитывать курсы из базы, чтобы увидеть добавленные другими репликами
+        """
+        self.db_repository = db_repository
+        self.send = send
+        self.clock = clock
+        self.late_tolerance = timedelta(seconds=late_tolerance)
+        self.rebuild_interval = rebuild_interval
+        self.wakeups = 0
+        self._heap: List[Tuple[str, int]] = []
+        # Актуальное время приёма курса; записи кучи с другим временем устарели и пропускаются
+        self._scheduled: Dict[int, str] = {}
+        self._wakeup = asyncio.Event()
+        self._rebuilt_at = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._scheduled)
+
+    async def rebuild(self) -> None:
+        """Перечитывает все запланированные приёмы из базы"""
+        rows = await self.db_repository.list_scheduled_doses()
+        self._scheduled = {course_id: when for when, course_id in rows}
+        heapq.heapify(rows)
+        self._heap = rows
+        self._rebuilt_at = time.monotonic()
+        self._wakeup.set()
+
+    def schedule(self, course_id: int, when: Optional[str]) -> None:
+        """Ставит (или снимает при when=None) приём курса; будит таймер, если приём стал ближайшим"""
+        if when is None:
+            self._scheduled.pop(course_id, None)
+            return
+        self._scheduled[course_id] = when
+        heapq.heappush(self._heap, (when, course_id))
+        if self._heap[0] == (when, course_id):
+            self._wakeup.set()
+
+    def next_due(self) -> Optional[str]:
+        """Время ближайшего приёма "YYYY-MM-DDTHH:MM" или None"""
+        heap = self._heap
+        while heap and self._scheduled.get(heap[0][1]) != heap[0][0]:
+            heapq.heappop(heap)
+        return heap[0][0] if heap else None
+
+    async def run_due(self, now: Optional[datetime] = None) -> int:
+        """
+        Обрабатывает приёмы, время которых наступило: переносит их на следующий приём и отправляет напоминания.
+
+        :return: Количество отправленных напоминаний о курсах
+        """
+        now = now or self.clock()
+        now_key = now.strftime(DOSE_TIME_FORMAT)
+        due = []
+        while (when := self.next_due()) is not None and when <= now_key:
+            _, course_id = heapq.heappop(self._heap)
+            del self._scheduled[course_id]
+            due.append((course_id, when))
+        if not due:
+            return 0
+
+        courses = {course.id: course for course in await self.db_repository.get_courses([course_id for course_id, _ in due])}
+        changes = []
+        for course_id, when in due:
+            course = courses.get(course_id)
+            if course is None:
+                continue
+            if course.next_dose_at != when:
+                # Приём уже перенесла другая реплика
+                if course.next_dose_at is not None:
+                    self.schedule(course_id, course.next_dose_at)
+                continue
+            schedule = _load_schedule(course.schedule_spec)
+            next_dose = schedule.next_dose(now) if schedule else None
+            changes.append((course_id, when, next_dose.strftime(DOSE_TIME_FORMAT) if next_dose else None))
+
+        advanced = await self.db_repository.advance_course_doses(changes)
+        by_user = defaultdict(list)
+        for course_id, when, next_dose_at in changes:
+            if course_id not in advanced:
+                continue
+            self.schedule(course_id, next_dose_at)
+            if now - datetime.fromisoformat(when) <= self.late_tolerance:
+                course = courses[course_id]
+                by_user[course.user_id].append(course)
+
+        results = await asyncio.gather(*(self.send(user_id, user_courses) for user_id, user_courses in by_user.items()),
+                                       return_exceptions=True)
+        for user_id, result in zip(by_user, results):
+            if isinstance(result, Exception):
+                logger.error(f"Ошибка отправки напоминания о приёме пользователю {user_id}: {result}")
+        return sum(len(user_courses) for user_courses in by_user.values())
+
+    async def run(self) -> None:
+        await self.rebuild()
+        while True:
+            if time.monotonic() - self._rebuilt_at >= self.rebuild_interval:
+                await self.rebuild()
+            self._wakeup.clear()
+            timeout = self.rebuild_interval - (time.monotonic() - self._rebuilt_at)
+            when = self.next_due()
+            if when is not None:
+                delay = (datetime.fromisoformat(when) - self.clock()).total_seconds()
+                if delay <= 0:
+                    try:
+                        await self.run_due()
+                    except Exception as e:
+                        logger.error(f"Ошибка обработки приёмов: {e}")
+                        await asyncio.sleep(1)
+                    continue
+                timeout = min(timeout, delay)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), max(timeout, 0))
+            except asyncio.TimeoutError:
+                pass
+            self.wakeups += 1
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
@@ -0,0 +1,63 @@
+from dataclasses import dataclass, field
+from datetime import date
+from typing import List, Optional, Tuple
+from constants import SENT_REMINDERS_RETENTION_DAYS
+from repositories.database_repository import DatabaseRepository, Medication, next_event_date
+
+
+@dataclass
+class ReminderPass:
+    """Результат одного прохода планировщика сроков годности"""
+    today: date
+    expired: List[Medication] = field(default_factory=list)
+    expiring: List[Tuple[Medication, int]] = field(default_factory=list)
+    rescheduled: List[Tuple[int, str]] = field(default_factory=list)
+
+
+class ExpiryScheduler:
+    """
+    Инкрементальный планировщик напоминаний о сроках годности.
+
+    Вместо полного сканирования таблицы каждый проход читает только строки,
+    у которых next_event_date уже наступила, удаляет просроченные одним DELETE
+    и переносит next_event_date остальных на следующее событие.
+    """
+
+    def __init__(self, db_repository: DatabaseRepository):
+        self.db_repository = db_repository
+
+    async def collect(self, today: Optional[date] = None, shard: Optional[int] = None, shards: int = 1) -> ReminderPass:
+        """Находит события на сегодня (только для пользователей шарда, если он задан), не изменяя базу"""
+        today = today or date.today()
+        due = await self.db_repository.list_due_medications(today, shard, shards)
+
+        result = ReminderPass(today)
+        tomorrow = date.fromordinal(today.toordinal() + 1)
+        for med in due:
+            days_to_expiry = (date.fromisoformat(med.expiry_date[:10]) - today).days
+            if days_to_expiry < 0:
+                result.expired.append(med)
+                continue
+            # Строка могла попасть в выборку с опозданием (бот был остановлен) —
+            # напоминаем один раз и переносим событие на следующую дату после сегодняшней
+            result.expiring.append((med, days_to_expiry))
+            result.rescheduled.append((med.id, next_event_date(med.expiry_date, tomorrow)))
+        return result
+
+    async def complete(self, reminder_pass: ReminderPass) -> None:
+        """Удаляет просроченные лекарства, переносит события и чистит старые записи журнала"""
+        rescheduled_ids = {med_id for med_id, _ in reminder_pass.rescheduled}
+        user_ids = {med.user_id for med in reminder_pass.expired}
+        user_ids.update(med.user_id for med, _ in reminder_pass.expiring if med.id in rescheduled_ids)
+        await self.db_repository.apply_reminder_pass(
+            [med.id for med in reminder_pass.expired],
+            reminder_pass.rescheduled,
+            user_ids
+        )
+        retention_start = date.fromordinal(reminder_pass.today.toordinal() - SENT_REMINDERS_RETENTION_DAYS)
+        await self.db_repository.prune_sent_reminders(retention_start)
+
+    async def run_pass(self, today: Optional[date] = None) -> ReminderPass:
+        reminder_pass = await self.collect(today)
+        await self.complete(reminder_pass)
+        return reminder_pass
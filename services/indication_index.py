@@ -0,0 +1,115 @@
+import os
+import re
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Iterable, List, Optional, Sequence, Set
+from constants import RECOMMENDATION_SHORTLIST_SIZE
+from services.intent_classifier import normalize
+
+INDICATIONS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "indications.tsv")
+
+_NAME_TOKEN = re.compile(r"[\w-]+")
+# Основы короче трёх букв совпадают только со словом целиком
+_MIN_PREFIX = 3
+
+
+@dataclass(frozen=True)
+class Indication:
+    """Строка таблицы показаний: действующее вещество, группа и основы слов симптомов"""
+    substance: str
+    category: str
+    terms: FrozenSet[str]
+
+
+def _name_tokens(name: str) -> List[str]:
+    """Слова названия лекарства; составные через дефис дополнительно разбиваются на части"""
+    tokens = []
+    for token in _NAME_TOKEN.findall(name.lower().replace("ё", "е")):
+        tokens.append(token)
+        if "-" in token:
+            tokens.extend(part for part in token.split("-") if part)
+    return tokens
+
+
+class IndicationIndex:
+    """
+    Таблица показаний из data/indications.tsv и обратный индекс «основа симптома → вещества».
+
+    Таблица небольшая и целиком разбирается в словари при создании. Индекс нужен,
+    чтобы передать в промпт рекомендации только лекарства аптечки, подходящие
+    к симптомам, а не всю аптечку.
+    """
+
+    def __init__(self, path: str = INDICATIONS_PATH):
+        self._by_name: Dict[str, Indication] = {}
+        self._by_term: Dict[str, Set[str]] = defaultdict(set)
+        self._load(path)
+
+    def _load(self, path: str) -> None:
+        with open(path, encoding="utf-8") as f:
+            lines = f.read().splitlines()
+        for line in lines:
+            if not line.strip() or line.startswith("#"):
+                continue
+            names, category, terms = line.split("\t")
+            names = [name.strip().lower().replace("ё", "е") for name in names.split("|")]
+            indication = Indication(names[0], category, frozenset(term.strip() for term in terms.split(",")))
+            for name in names:
+                self._by_name.setdefault(name, indication)
+            for term in indication.terms:
+                self._by_term[term].add(indication.substance)
+
+    def lookup(self, medication_name: str) -> Optional[Indication]:
+        for token in _name_tokens(medication_name):
+            indication = self._by_name.get(token)
+            if indication is not None:
+                return indication
+        return None
+
+    def symptom_terms(self, text: str) -> Set[str]:
+        """Основы из таблицы, встречающиеся в тексте: слово начинается с основы или равно ей"""
+        found = set()
+        for word in normalize(text).split():
+            if word in self._by_term:
+                found.add(word)
+            for length in range(_MIN_PREFIX, len(word)):
+                if word[:length] in self._by_term:
+                    found.add(word[:length])
+        return found
+
+    def score(self, terms: Iterable[str]) -> Dict[str, int]:
+        """Число совпавших симптомов для каждого вещества"""
+        scores: Dict[str, int] = defaultdict(int)
+        for term in terms:
+            for substance in self._by_term.get(term, ()):
+                scores[substance] += 1
+        return scores
+
+    def shortlist(self, text: str, medications: Sequence, limit: int = RECOMMENDATION_SHORTLIST_SIZE) -> List[str]:
+        """
+        Не более limit названий лекарств из аптечки для промпта, без повторов.
+
+        Сначала лекарства с совпавшими показаниями по убыванию числа совпадений,
+        затем — на свободные места — лекарства, которых нет в таблице: о них
+        индекс ничего не знает, и решать остаётся LLM. Лекарства из таблицы
+        без совпадений в промпт не попадают, если симптомы удалось распознать.
+        """
+        scores = self.score(self.symptom_terms(text))
+        matched, unknown, unique = [], [], []
+        seen = set()
+        for position, med in enumerate(medications):
+            key = " ".join(_name_tokens(med.name))
+            if key in seen:
+                continue
+            seen.add(key)
+            unique.append(med.name)
+            indication = self.lookup(med.name)
+            if indication is None:
+                unknown.append(med.name)
+            elif scores.get(indication.substance):
+                matched.append((-scores[indication.substance], position, med.name))
+        if not scores:
+            # Симптомы не распознаны: сузить выбор нечем, остаётся ограничить число лекарств
+            return unique[:limit]
+        names = [name for _, _, name in sorted(matched)] + unknown
+        return names[:limit]
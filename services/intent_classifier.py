@@ -0,0 +1,124 @@
+import math
+import os
+import random
+import re
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+INTENTS = ("добавить", "рекомендация", "аптечка", "курс")
+
+INTENTS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "intents.tsv")
+
+# Правила по основам слов: срабатывание правила сдвигает вероятность в сторону намерения
+_RULES = {
+    "добавить": re.compile(
+        r"\b(добав\w*|купил\w*|приобр\w*|пополн\w*|внес\w*|занес\w*|положи\w*|докупил\w*|принес\w*|зарегистрир\w*)"
+    ),
+    "рекомендация": re.compile(
+        r"\b(бол(ит|ят|ь|и)|болел\w*|заболел\w*|голова|температур\w*|кашл\w*|кашель|насморк\w*|тошн\w*|жар\w*|озноб\w*|"
+        r"изжог\w*|аллерги\w*|симптом\w*|посоветуй|простыл\w*|простуд\w*|мигрен\w*|ноет|ломит|от (головы|кашля|температуры|боли))"
+    ),
+    "аптечка": re.compile(r"\b(аптечк\w*|спис(ок|ке)|лист|наличи\w*|перечень|перечисли|содержимое|остал(ось|ся|ись)\w*)"),
+    "курс": re.compile(
+        r"\b(курс\w*|схем\w*|расписани\w*|график\w*|при[её]м\w*|раза? в день|кажд\w+|дозировк\w*|назнач\w*|натощак)"
+    ),
+}
+_NON_WORD = re.compile(r"[^\w\s]+")
+_SPACES = re.compile(r"\s+")
+
+RULE_WEIGHT = 0.4
+
+
+@dataclass
+class IntentPrediction:
+    intent: str
+    confidence: float
+
+
+def normalize(text: str) -> str:
+    text = text.lower().replace("ё", "е")
+    return _SPACES.sub(" ", _NON_WORD.sub(" ", text)).strip()
+
+
+def _features(text: str) -> List[str]:
+    """Символьные 2–4-граммы по словам с границами и сами слова"""
+    features = []
+    for word in text.split():
+        padded = f" {word} "
+        features.append(f"w:{word}")
+        for n in (2, 3, 4):
+            features.extend(padded[i:i + n] for i in range(len(padded) - n + 1))
+    return features
+
+
+def load_examples(path: str = INTENTS_PATH) -> List[Tuple[str, str]]:
+    examples = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip() or line.startswith("#"):
+                continue
+            intent, phrase = line.rstrip("\n").split("\t", 1)
+            examples.append((intent, phrase))
+    return examples
+
+
+class IntentClassifier:
+    """
+    Локальный классификатор намерений: правила по основам слов плюс
+    линейная модель (softmax-регрессия) на символьных n-граммах.
+
+    Модель обучается при создании на размеченных фразах из data/intents.tsv;
+    на наборе из нескольких сотен фраз это занимает доли секунды.
+    """
+
+    def __init__(self, examples: Optional[Iterable[Tuple[str, str]]] = None, epochs: int = 15, learning_rate: float = 0.5):
+        self._weights: Dict[str, List[float]] = {}
+        self._bias = [0.0] * len(INTENTS)
+        self._train(list(examples if examples is not None else load_examples()), epochs, learning_rate)
+
+    def _scores(self, features: Sequence[str]) -> List[float]:
+        scores = list(self._bias)
+        for feature in features:
+            weights = self._weights.get(feature)
+            if weights is not None:
+                for i, weight in enumerate(weights):
+                    scores[i] += weight
+        return scores
+
+    @staticmethod
+    def _softmax(scores: List[float]) -> List[float]:
+        top = max(scores)
+        exps = [math.exp(score - top) for score in scores]
+        total = sum(exps)
+        return [value / total for value in exps]
+
+    def _train(self, examples: List[Tuple[str, str]], epochs: int, learning_rate: float) -> None:
+        samples = [(_features(normalize(phrase)), INTENTS.index(intent)) for intent, phrase in examples]
+        rng = random.Random(0)
+        for epoch in range(epochs):
+            rng.shuffle(samples)
+            rate = learning_rate / (1 + epoch)
+            for features, label in samples:
+                probabilities = self._softmax(self._scores(features))
+                # Градиент кросс-энтропии: (p - y) для каждого класса; признаки нормируются на их число
+                step = rate / max(len(features), 1) ** 0.5
+                gradient = [step * (p - (1.0 if i == label else 0.0)) for i, p in enumerate(probabilities)]
+                for feature in features:
+                    weights = self._weights.setdefault(feature, [0.0] * len(INTENTS))
+                    for i, value in enumerate(gradient):
+                        weights[i] -= value
+                for i, value in enumerate(gradient):
+                    self._bias[i] -= value
+
+    def classify(self, text: str) -> IntentPrediction:
+        normalized = normalize(text)
+        probabilities = self._softmax(self._scores(_features(normalized)))
+        matched = [i for i, intent in enumerate(INTENTS) if _RULES[intent].search(normalized)]
+        if matched:
+            share = 1.0 / len(matched)
+            probabilities = [
+                (1 - RULE_WEIGHT) * p + RULE_WEIGHT * (share if i in matched else 0.0)
+                for i, p in enumerate(probabilities)
+            ]
+        best = max(range(len(INTENTS)), key=probabilities.__getitem__)
+        return IntentPrediction(INTENTS[best], probabilities[best])
@@ -0,0 +1,244 @@
+import asyncio
+import re
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Deque, Dict, Mapping, Optional
+from constants import (
+    LLM_MAX_CONCURRENCY,
+    LLM_QUEUE_MAX_SIZE,
+    LLM_REQUESTS_PER_MINUTE,
+    LLM_TOKENS_PER_MINUTE,
+    LLM_USER_QUEUE_DEPTH,
+)
+from services.metrics import LLM_QUEUE_DEPTH, LLM_QUEUE_WAIT_SECONDS, LLM_SHED
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_SECONDS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+class Priority(IntEnum):
+    """Меньшее значение обслуживается раньше"""
+    INTERACTIVE = 0
+    BACKGROUND = 1
+
+
+def parse_reset(value: Optional[str]) -> Optional[float]:
+    """Длительность из заголовков x-ratelimit-reset-*: "7.66s", "1m30s", "120ms" или число секунд"""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(number) * _DURATION_SECONDS[unit] for number, unit in parts)
+
+
+class RateBucket:
+    """Token bucket на минутный лимит; остаток и лимит можно переписать по ответу API"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        if now > self._blocked_until:
+            start = max(self._updated, self._blocked_until)
+            self._tokens = min(self.capacity, self._tokens + (now - start) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Через сколько секунд можно будет списать amount; 0 — можно сейчас"""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if now < self._blocked_until:
+            return self._blocked_until - now + max(amount - self._tokens, 0) / self.rate
+        return max(amount - self._tokens, 0) / self.rate
+
+    def take(self, amount: float) -> None:
+        self._tokens -= min(amount, self.capacity)
+
+    def update(self, limit: Optional[float], remaining: Optional[float], reset: Optional[float], now: float) -> None:
+        self._refill(now)
+        if limit:
+            self.capacity = float(limit)
+            self.rate = self.capacity / 60.0
+        if remaining is not None:
+            # Остаток из ответа не учитывает запросы, ещё идущие к API, поэтому только уменьшает запас
+            self._tokens = min(self._tokens, self.capacity, remaining)
+            if remaining <= 0 and reset:
+                # Лимит исчерпан: до сброса новых запросов не будет
+                self._blocked_until = max(self._blocked_until, now + reset)
+
+    def block(self, seconds: float, now: float) -> None:
+        self._refill(now)
+        self._tokens = min(self._tokens, 0.0)
+        self._blocked_until = max(self._blocked_until, now + seconds)
+
+
+@dataclass
+class _Waiter:
+    user_id: Optional[int]
+    priority: Priority
+    cost: float
+    future: asyncio.Future
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+def _header_float(headers: Mapping[str, str], name: str) -> Optional[float]:
+    value = headers.get(name)
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class LLMScheduler:
+    """
+    Очередь запросов к LLM перед отправкой в API.
+
+    Запрос получает слот, когда свободно одно из max_concurrency мест и в бакетах
+    запросов и токенов в минуту хватает запаса. Лимиты бакетов подстраиваются
+    по заголовкам x-ratelimit-* и Retry-After. Интерактивные запросы обслуживаются
+    раньше фоновых; внутри приоритета пользователи чередуются по кругу, поэтому
+    один активный пользователь не задерживает остальных. admit() отказывает,
+    если очередь пользователя или общая очередь заполнены.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float = LLM_REQUESTS_PER_MINUTE,
+        tokens_per_minute: float = LLM_TOKENS_PER_MINUTE,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        user_queue_depth: int = LLM_USER_QUEUE_DEPTH,
+        max_queue_size: int = LLM_QUEUE_MAX_SIZE,
+    ):
+        self.requests = RateBucket(requests_per_minute)
+        self.tokens = RateBucket(tokens_per_minute)
+        self.max_concurrency = max_concurrency
+        self.user_queue_depth = user_queue_depth
+        self.max_queue_size = max_queue_size
+        self.in_flight = 0
+        self._queues: Dict[Priority, "OrderedDict[Optional[int], Deque[_Waiter]]"] = {
+            priority: OrderedDict() for priority in Priority
+        }
+        self._queued = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def queued(self) -> int:
+        return self._queued
+
+    def admit(self, user_id: Optional[int], priority: Priority = Priority.INTERACTIVE) -> Optional[str]:
+        """Причина отказа ("user_queue" или "queue_full") либо None, если запрос можно ставить в очередь"""
+        reason = None
+        if self._queued >= self.max_queue_size:
+            reason = "queue_full"
+        elif user_id is not None and len(self._queues[priority].get(user_id, ())) >= self.user_queue_depth:
+            reason = "user_queue"
+        if reason:
+            LLM_SHED.inc(priority=priority.name.lower(), reason=reason)
+        return reason
+
+    @asynccontextmanager
+    async def slot(self, user_id: Optional[int], priority: Priority = Priority.INTERACTIVE, cost: float = 1.0):
+        """Ожидает очереди и лимитов; на время блока запрос считается выполняющимся"""
+        waiter = _Waiter(user_id, priority, cost, asyncio.get_running_loop().create_future())
+        self._queues[priority].setdefault(user_id, deque()).append(waiter)
+        self._queued += 1
+        self._update_depth(priority)
+        self._dispatch()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Слот уже выдан, но ожидающий отменён — возвращаем его
+                self._release()
+            else:
+                self._remove(waiter)
+            raise
+        LLM_QUEUE_WAIT_SECONDS.observe(time.monotonic() - waiter.enqueued_at, priority=priority.name.lower())
+        try:
+            yield
+        finally:
+            self._release()
+
+    def update_from_headers(self, headers: Mapping[str, str]) -> None:
+        """Подстраивает бакеты по x-ratelimit-* и Retry-After из ответа API"""
+        now = time.monotonic()
+        for kind, bucket in (("requests", self.requests), ("tokens", self.tokens)):
+            bucket.update(
+                _header_float(headers, f"x-ratelimit-limit-{kind}"),
+                _header_float(headers, f"x-ratelimit-remaining-{kind}"),
+                parse_reset(headers.get(f"x-ratelimit-reset-{kind}")),
+                now
+            )
+        retry_after = parse_reset(headers.get("Retry-After"))
+        if retry_after:
+            self.requests.block(retry_after, now)
+        self._dispatch()
+
+    def _release(self) -> None:
+        self.in_flight -= 1
+        self._dispatch()
+
+    def _remove(self, waiter: _Waiter) -> None:
+        queue = self._queues[waiter.priority].get(waiter.user_id)
+        if queue is not None and waiter in queue:
+            queue.remove(waiter)
+            self._queued -= 1
+            if not queue:
+                del self._queues[waiter.priority][waiter.user_id]
+            self._update_depth(waiter.priority)
+        self._dispatch()
+
+    def _update_depth(self, priority: Priority) -> None:
+        LLM_QUEUE_DEPTH.set(sum(len(queue) for queue in self._queues[priority].values()), priority=priority.name.lower())
+
+    def _next_waiter(self) -> Optional[_Waiter]:
+        for priority in Priority:
+            queues = self._queues[priority]
+            if queues:
+                return next(iter(queues.values()))[0]
+        return None
+
+    def _pop(self, waiter: _Waiter) -> None:
+        queues = self._queues[waiter.priority]
+        queue = queues.pop(waiter.user_id)
+        queue.popleft()
+        if queue:
+            # Пользователь с оставшимися запросами уходит в конец круга
+            queues[waiter.user_id] = queue
+        self._queued -= 1
+        self._update_depth(waiter.priority)
+
+    def _dispatch(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self.in_flight < self.max_concurrency:
+            waiter = self._next_waiter()
+            if waiter is None:
+                return
+            if waiter.future.done():
+                # Ожидающий отменён до выдачи слота
+                self._pop(waiter)
+                continue
+            now = time.monotonic()
+            delay = max(self.requests.wait_time(1, now), self.tokens.wait_time(waiter.cost, now))
+            if delay > 0:
+                self._timer = asyncio.get_running_loop().call_later(delay, self._dispatch)
+                return
+            self._pop(waiter)
+            self.requests.take(1)
+            self.tokens.take(waiter.cost)
+            self.in_flight += 1
+            waiter.future.set_result(None)
@@ -1,9 +1,119 @@
 from abc import ABC, abstractmethod
-from typing import Optional
+from typing import AsyncIterator, Optional
 import asyncio
-from aiohttp import ClientSession
-from constants import DEFAULT_MAX_TOKENS, MAX_CACHE_SIZE
-from functools import lru_cache
+import json
+import random
+import time
+from contextlib import aclosing
+from aiohttp import ClientError, ClientSession, ClientTimeout, TCPConnector
+from constants import (
+    DEFAULT_MAX_TOKENS,
+    MAX_CACHE_SIZE,
+    LLM_CACHE_TTL,
+    LLM_API_URL,
+    LLM_CONNECT_TIMEOUT,
+    LLM_READ_TIMEOUT,
+    LLM_MAX_RETRIES,
+    LLM_RETRY_BACKOFF,
+    LLM_CONNECTION_LIMIT,
+    LLM_KEEPALIVE_TIMEOUT,
+    LLM_CIRCUIT_FAILURE_THRESHOLD,
+    LLM_CIRCUIT_RESET_TIMEOUT,
+)
+from services.completion_cache import CompletionCache, make_cache_key
+from services.llm_scheduler import LLMScheduler, Priority
+from services.metrics import LLM_ERRORS, LLM_FIRST_TOKEN_SECONDS, LLM_SECONDS, timed
+
+
+class LLMServiceError(Exception):
+    """Ошибка обращения к LLM API после исчерпания повторных попыток"""
+
+
+class LLMUnavailableError(LLMServiceError):
+    """LLM API считается недоступным: circuit breaker разомкнут"""
+
+
+class LLMOverloadedError(LLMServiceError):
+    """Запрос отклонён планировщиком: очередь пользователя или общая очередь заполнены"""
+
+
+class CircuitBreaker:
+    """
+    Размыкается после failure_threshold подряд неудачных запросов и отклоняет
+    новые запросы reset_timeout секунд, после чего пропускает один пробный.
+    Пробный запрос, завершившийся без record_success/record_failure (отмена,
+    непредвиденное исключение, брошенный поток), снимается через release
+    и считается неудачным — иначе разомкнутый breaker не закрылся бы никогда.
+    """
+
+    def __init__(self, failure_threshold: int = LLM_CIRCUIT_FAILURE_THRESHOLD, reset_timeout: float = LLM_CIRCUIT_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probe_in_flight = False
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+
+    def before_request(self) -> bool:
+        """Пропускает запрос или бросает LLMUnavailableError; True — запрос пробный"""
+        if self._opened_at is None:
+            return False
+        if time.monotonic() - self._opened_at < self.reset_timeout or self._probe_in_flight:
+            raise LLMUnavailableError("LLM API временно недоступен")
+        self._probe_in_flight = True
+        return True
+
+    def release(self, probe: bool) -> None:
+        """Вызывается в finally после запроса: незавершённый пробный запрос считается неудачей"""
+        if probe and self._probe_in_flight:
+            self.record_failure()
+
+    def record_success(self) -> None:
+        self._failures = 0
+        self._opened_at = None
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        self._probe_in_flight = False
+        if self._opened_at is not None or self._failures >= self.failure_threshold:
+            self._opened_at = time.monotonic()
+
+
+def _chunk_text(event: dict) -> str:
+    """Текст фрагмента: {"text": ...} или формат OpenAI {"choices": [{"delta": {"content": ...}}]}"""
+    if "text" in event:
+        return event["text"] or ""
+    choices = event.get("choices") or [{}]
+    return (choices[0].get("delta") or {}).get("content") or ""
+
+
+async def _iter_sse_text(response) -> AsyncIterator[str]:
+    """Разбирает поток server-sent events и отдаёт текстовые фрагменты до data: [DONE]"""
+    data_lines = []
+    async for raw_line in response.content:
+        line = raw_line.decode("utf-8").rstrip("\r\n")
+        if line.startswith("data:"):
+            data = line[5:]
+            data_lines.append(data[1:] if data.startswith(" ") else data)
+            continue
+        # Поля event/id/retry и комментарии не нужны; пустая строка завершает событие
+        if line or not data_lines:
+            continue
+        payload, data_lines = "\n".join(data_lines), []
+        if payload == "[DONE]":
+            return
+        text = _chunk_text(json.loads(payload))
+        if text:
+            yield text
+    if data_lines and data_lines != ["[DONE]"]:
+        text = _chunk_text(json.loads("\n".join(data_lines)))
+        if text:
+            yield text
+
 
 class LLMService(ABC):
     @abstractmethod
@@ -11,45 +121,216 @@ class LLMService(ABC):
         pass
 
 class GroqLLMService(LLMService):
-    def __init__(self, api_key: str, model: str, max_tokens: int = DEFAULT_MAX_TOKENS, cache_size: int = MAX_CACHE_SIZE):
+    def __init__(
+        self,
+        api_key: str,
+        model: str,
+        max_tokens: int = DEFAULT_MAX_TOKENS,
+        cache_size: int = MAX_CACHE_SIZE,
+        cache_ttl: float = LLM_CACHE_TTL,
+        cache_path: Optional[str] = None,
+        api_url: str = LLM_API_URL,
+        connect_timeout: float = LLM_CONNECT_TIMEOUT,
+        read_timeout: float = LLM_READ_TIMEOUT,
+        max_retries: int = LLM_MAX_RETRIES,
+        retry_backoff: float = LLM_RETRY_BACKOFF,
+        connection_limit: int = LLM_CONNECTION_LIMIT,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+        scheduler: Optional[LLMScheduler] = None,
+    ):
         self.api_key = api_key
         self.model = model
         self.max_tokens = max_tokens
-        self._rate_limit = asyncio.Semaphore(5)  # Максимум 5 одновременных запросов
-        self._cache = {}
-        self._cache_size = cache_size
+        self.api_url = api_url
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self._timeout = ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout)
+        self._connection_limit = connection_limit
+        self._session: Optional[ClientSession] = None
+        self._circuit_breaker = circuit_breaker or CircuitBreaker()
+        self.scheduler = scheduler or LLMScheduler()
+        self.cache = CompletionCache(cache_size, cache_ttl, cache_path)
 
-    async def get_completion(self, prompt: str) -> Optional[str]:
+    async def start(self) -> None:
+        """Создаёт долгоживущую сессию; соединения с API переиспользуются между запросами"""
+        if self._session is not None and not self._session.closed:
+            return
+        await self.cache.open()
+        connector = TCPConnector(
+            limit_per_host=self._connection_limit,
+            keepalive_timeout=LLM_KEEPALIVE_TIMEOUT,
+            ttl_dns_cache=300,
+        )
+        self._session = ClientSession(
+            connector=connector,
+            timeout=self._timeout,
+            headers={
+                "Authorization": f"Bearer {self.api_key}",
+                "Content-Type": "application/json"
+            }
+        )
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+        await self.cache.close()
+
+    def _backoff_delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        # Full jitter: случайная задержка от 0 до retry_backoff * 2^attempt
+        delay = random.uniform(0, self.retry_backoff * (2 ** attempt))
+        if retry_after:
+            try:
+                delay = max(delay, float(retry_after))
+            except ValueError:
+                pass
+        return delay
+
+    def _admit(self, prompt: str, user_id: Optional[int], priority: Priority) -> float:
+        """Проверяет очередь планировщика и возвращает оценку токенов запроса"""
         if not isinstance(prompt, str) or not prompt.strip():
             raise ValueError("Invalid prompt")
+        reason = self.scheduler.admit(user_id, priority)
+        if reason:
+            raise LLMOverloadedError(f"Очередь запросов к LLM заполнена ({reason})")
+        # Около трёх символов на токен в промпте плюс максимальная длина ответа
+        return len(prompt) / 3 + self.max_tokens
+
+    @timed(LLM_SECONDS, LLM_ERRORS, operation="completion")
+    async def get_completion(
+        self,
+        prompt: str,
+        user_id: Optional[int] = None,
+        priority: Priority = Priority.INTERACTIVE
+    ) -> Optional[str]:
+        cost = self._admit(prompt, user_id, priority)
+        probe = self._circuit_breaker.before_request()
+        try:
+            return await self._post_completion(prompt, user_id, priority, cost)
+        finally:
+            self._circuit_breaker.release(probe)
 
-        async with self._rate_limit:
-            async with ClientSession() as session:
-                headers = {
-                    "Authorization": f"Bearer {self.api_key}",
-                    "Content-Type": "application/json"
-                }
-                data = {
-                    "prompt": prompt,
-                    "max_tokens": self.max_tokens,
-                    "model": self.model
-                }
-                try:
-                    async with session.post("https://api.groq.com/v1/llm", headers=headers, json=data) as response:
+    async def _post_completion(self, prompt: str, user_id: Optional[int], priority: Priority, cost: float) -> Optional[str]:
+        await self.start()
+        data = {
+            "prompt": prompt,
+            "max_tokens": self.max_tokens,
+            "model": self.model
+        }
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            try:
+                async with self.scheduler.slot(user_id, priority, cost):
+                    async with self._session.post(self.api_url, json=data) as response:
+                        self.scheduler.update_from_headers(response.headers)
                         if response.status == 200:
                             result = await response.json()
+                            self._circuit_breaker.record_success()
                             return result.get("text", "").strip()
-                        return None
-                except Exception as e:
-                    raise Exception(f"LLM API error: {str(e)}")
-
-    @lru_cache(maxsize=MAX_CACHE_SIZE)
-    async def get_completion_cached(self, prompt: str) -> Optional[str]:
-        cache_key = f"{self.model}:{prompt}"
-        if cache_key in self._cache:
-            return self._cache[cache_key]
-        
-        result = await self.get_completion(prompt)
-        if result and len(self._cache) < self._cache_size:
-            self._cache[cache_key] = result
-        return result 
\ No newline at end of file
+                        if response.status != 429 and response.status < 500:
+                            # Ошибка запроса, а не сервиса: повтор не поможет
+                            self._circuit_breaker.record_success()
+                            return None
+                        retry_after = response.headers.get("Retry-After")
+                        last_error = f"HTTP {response.status}"
+            except (ClientError, asyncio.TimeoutError) as e:
+                last_error = f"{type(e).__name__}: {e}"
+            if attempt < self.max_retries:
+                await asyncio.sleep(self._backoff_delay(attempt, retry_after))
+
+        self._circuit_breaker.record_failure()
+        raise LLMServiceError(f"LLM API error: {last_error}")
+
+    async def get_completion_cached(
+        self,
+        prompt: str,
+        user_id: Optional[int] = None,
+        priority: Priority = Priority.INTERACTIVE
+    ) -> Optional[str]:
+        key = make_cache_key(self.model, self.max_tokens, prompt)
+        return await self.cache.get_or_compute(key, lambda: self.get_completion(prompt, user_id, priority))
+
+    async def stream_completion(
+        self,
+        prompt: str,
+        user_id: Optional[int] = None,
+        priority: Priority = Priority.INTERACTIVE
+    ) -> AsyncIterator[str]:
+        """
+        Потоковый ответ: фрагменты текста по мере генерации (server-sent events).
+
+        Повторы и circuit breaker работают так же, как в get_completion, но только
+        до первого фрагмента: оборванный посреди ответа поток не повторяется.
+        """
+        cost = self._admit(prompt, user_id, priority)
+        probe = self._circuit_breaker.before_request()
+        try:
+            async with aclosing(self._stream_events(prompt, user_id, priority, cost)) as events:
+                async for text in events:
+                    yield text
+        finally:
+            # Выполняется и при отмене, и когда потребитель бросил генератор
+            self._circuit_breaker.release(probe)
+
+    async def _stream_events(self, prompt: str, user_id: Optional[int], priority: Priority, cost: float) -> AsyncIterator[str]:
+        await self.start()
+        data = {
+            "prompt": prompt,
+            "max_tokens": self.max_tokens,
+            "model": self.model,
+            "stream": True
+        }
+        started = time.perf_counter()
+        received = False
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            try:
+                async with self.scheduler.slot(user_id, priority, cost):
+                    async with self._session.post(self.api_url, json=data) as response:
+                        self.scheduler.update_from_headers(response.headers)
+                        if response.status == 200:
+                            async for text in _iter_sse_text(response):
+                                if not received:
+                                    received = True
+                                    LLM_FIRST_TOKEN_SECONDS.observe(time.perf_counter() - started)
+                                yield text
+                            self._circuit_breaker.record_success()
+                            LLM_SECONDS.observe(time.perf_counter() - started, operation="stream")
+                            return
+                        if response.status != 429 and response.status < 500:
+                            self._circuit_breaker.record_success()
+                            return
+                        retry_after = response.headers.get("Retry-After")
+                        last_error = f"HTTP {response.status}"
+            except (ClientError, asyncio.TimeoutError, ValueError) as e:
+                last_error = f"{type(e).__name__}: {e}"
+                if received:
+                    break
+            if attempt < self.max_retries:
+                await asyncio.sleep(self._backoff_delay(attempt, retry_after))
+
+        self._circuit_breaker.record_failure()
+        LLM_ERRORS.inc(operation="stream")
+        raise LLMServiceError(f"LLM API error: {last_error}")
+
+    async def stream_completion_cached(
+        self,
+        prompt: str,
+        user_id: Optional[int] = None,
+        priority: Priority = Priority.INTERACTIVE
+    ) -> AsyncIterator[str]:
+        """Потоковый ответ с кэшем: сохранённый ответ отдаётся одним фрагментом, новый — сохраняется целиком"""
+        key = make_cache_key(self.model, self.max_tokens, prompt)
+        cached = await self.cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+        parts = []
+        async for text in self.stream_completion(prompt, user_id, priority):
+            parts.append(text)
+            yield text
+        completion = "".join(parts).strip()
+        if completion:
+            await self.cache.set(key, completion)
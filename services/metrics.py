@@ -0,0 +1,374 @@
+import cProfile
+import functools
+import heapq
+import inspect
+import itertools
+import logging
+import os
+import random
+import time
+from bisect import bisect_left
+from typing import Dict, List, Optional, Sequence, Tuple
+from aiohttp import web
+from constants import METRICS_HOST, METRICS_LATENCY_BUCKETS, PROFILER_DUMP_DIR, PROFILER_KEEP_SLOWEST, PROFILER_SAMPLE_RATE
+
+logger = logging.getLogger(__name__)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Sequence[Tuple[str, str]]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, registry: "MetricsRegistry", name: str, documentation: str, labelnames: Sequence[str]):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, **labels):
+        """Дочерняя серия с конкретными значениями меток; создаётся при первом обращении"""
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            child = self._children[key] = self._new_child()
+        return child
+
+    def _series(self):
+        for key, child in sorted(self._children.items()):
+            yield list(zip(self.labelnames, key)), child
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        lines.extend(self._render_series())
+        return lines
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def _new_child(self) -> _CounterChild:
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        self.labels(**labels).inc(amount)
+
+    def _render_series(self) -> List[str]:
+        return [f"{self.name}{_format_labels(labels)} {child.value:g}" for labels, child in self._series()]
+
+
+class _GaugeChild(_CounterChild):
+    __slots__ = ()
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class Gauge(Counter):
+    type_name = "gauge"
+
+    def _new_child(self) -> _GaugeChild:
+        return _GaugeChild()
+
+    def set(self, value: float, **labels) -> None:
+        self.labels(**labels).set(value)
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, registry, name, documentation, labelnames, buckets: Sequence[float] = METRICS_LATENCY_BUCKETS):
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float, **labels) -> None:
+        self.labels(**labels).observe(value)
+
+    def _render_series(self) -> List[str]:
+        lines = []
+        for labels, child in self._series():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), child.counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                lines.append(f"{self.name}_bucket{_format_labels(labels + [('le', le)])} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {child.sum:.6f}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {child.count}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Счётчики и гистограммы в памяти процесса с выводом в текстовом формате Prometheus.
+
+    Запись метрики — несколько операций со списками без блокировок: всё
+    выполняется в одном потоке event loop. enabled = False отключает замеры.
+    """
+
+    def __init__(self):
+        self.enabled = True
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Метрика {metric.name} уже зарегистрирована")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(self, name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(self, name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = METRICS_LATENCY_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(self, name, documentation, labelnames, buckets))
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+HANDLER_SECONDS = REGISTRY.histogram("bot_handler_seconds", "Время обработки апдейта Telegram", ("handler",))
+HANDLER_ERRORS = REGISTRY.counter("bot_handler_errors_total", "Необработанные исключения в обработчиках", ("handler",))
+DB_SECONDS = REGISTRY.histogram("bot_db_seconds", "Время вызова метода DatabaseRepository", ("method",))
+DB_ERRORS = REGISTRY.counter("bot_db_errors_total", "Исключения в методах DatabaseRepository", ("method",))
+LLM_SECONDS = REGISTRY.histogram("bot_llm_request_seconds", "Время запроса к LLM API с повторами", ("operation",))
+LLM_FIRST_TOKEN_SECONDS = REGISTRY.histogram(
+    "bot_llm_first_token_seconds", "Время до первого фрагмента потокового ответа LLM"
+)
+LLM_ERRORS = REGISTRY.counter("bot_llm_errors_total", "Неудачные запросы к LLM API", ("operation",))
+LLM_QUEUE_WAIT_SECONDS = REGISTRY.histogram(
+    "bot_llm_queue_wait_seconds", "Ожидание в очереди планировщика LLM", ("priority",)
+)
+LLM_QUEUE_DEPTH = REGISTRY.gauge("bot_llm_queue_depth", "Запросов в очереди планировщика LLM", ("priority",))
+LLM_SHED = REGISTRY.counter("bot_llm_shed_total", "Запросы к LLM, отклонённые при перегрузке", ("priority", "reason"))
+SEMANTIC_CACHE_LOOKUPS = REGISTRY.counter(
+    "bot_semantic_cache_lookups_total", "Поиски в семантическом кэше рекомендаций по результату", ("result",)
+)
+UPDATES_IN_PROGRESS = REGISTRY.gauge("bot_updates_in_progress", "Апдейты в обработке, включая ждущие очереди своего чата")
+WEBHOOK_UPDATES = REGISTRY.counter("bot_webhook_updates_total", "Апдейты, полученные через webhook, по результату", ("result",))
+REMINDER_PASS_SECONDS = REGISTRY.histogram(
+    "bot_reminder_pass_seconds", "Длительность прохода напоминаний", (),
+    buckets=(0.1, 0.5, 1, 5, 10, 30, 60, 300)
+)
+REMINDER_PASS_ERRORS = REGISTRY.counter("bot_reminder_pass_errors_total", "Проходы напоминаний, завершившиеся ошибкой")
+TELEGRAM_SEND_SECONDS = REGISTRY.histogram("bot_telegram_send_seconds", "Время вызова send_message", ())
+TELEGRAM_SENDS = REGISTRY.counter("bot_telegram_sends_total", "Исходящие сообщения по результату", ("result",))
+
+
+def timed(histogram: Histogram, errors: Optional[Counter] = None, **labels):
+    """Декоратор корутины: длительность вызова в histogram, исключения — в errors"""
+    registry = histogram.registry
+    series = histogram.labels(**labels)
+    error_series = errors.labels(**labels) if errors is not None else None
+
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if not registry.enabled:
+                return await func(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            except Exception:
+                if error_series is not None:
+                    error_series.inc()
+                raise
+            finally:
+                series.observe(time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+def instrument_methods(histogram: Histogram, errors: Optional[Counter] = None, label: str = "method"):
+    """Декоратор класса: оборачивает в timed все публичные корутины, метка — имя метода"""
+    def decorator(cls):
+        for name, member in list(vars(cls).items()):
+            if not name.startswith("_") and inspect.iscoroutinefunction(member):
+                setattr(cls, name, timed(histogram, errors, **{label: name})(member))
+        return cls
+    return decorator
+
+
+class UpdateProfiler:
+    """
+    Выборочный профилировщик апдейтов, включаемый во время работы.
+
+    Профилируется доля sample_rate апдейтов, но не более одного одновременно:
+    cProfile работает на весь поток, поэтому в профиль попадают и задачи,
+    выполнявшиеся параллельно с этим апдейтом. Хранятся keep самых медленных профилей.
+    """
+
+    def __init__(self, keep: int = PROFILER_KEEP_SLOWEST, sample_rate: float = PROFILER_SAMPLE_RATE, seed: Optional[int] = None):
+        self.keep = keep
+        self.sample_rate = sample_rate
+        self.enabled = False
+        self._active: Optional[cProfile.Profile] = None
+        self._slowest: List[Tuple[float, int, str, cProfile.Profile]] = []
+        self._sequence = itertools.count()
+        self._random = random.Random(seed)
+
+    def start(self, sample_rate: Optional[float] = None) -> None:
+        if sample_rate is not None:
+            self.sample_rate = sample_rate
+        self.enabled = True
+
+    def stop(self) -> None:
+        self.enabled = False
+
+    def reset(self) -> None:
+        self._slowest = []
+
+    def slowest(self) -> List[Tuple[str, float]]:
+        return [(name, duration) for duration, _, name, _ in sorted(self._slowest, reverse=True)]
+
+    def _record(self, duration: float, name: str, profile: cProfile.Profile) -> None:
+        entry = (duration, next(self._sequence), name, profile)
+        if len(self._slowest) < self.keep:
+            heapq.heappush(self._slowest, entry)
+        elif duration > self._slowest[0][0]:
+            heapq.heapreplace(self._slowest, entry)
+
+    def dump(self, directory: str = PROFILER_DUMP_DIR) -> List[str]:
+        """Сохраняет профили в формате pstats, самый медленный — первым"""
+        os.makedirs(directory, exist_ok=True)
+        paths = []
+        for rank, (duration, _, name, profile) in enumerate(sorted(self._slowest, reverse=True), 1):
+            path = os.path.join(directory, f"{rank:02d}_{name}_{duration * 1000:.0f}ms.pstats")
+            profile.dump_stats(path)
+            paths.append(path)
+        return paths
+
+    def wrap(self, func):
+        name = func.__name__
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if not self.enabled or self._active is not None or self._random.random() >= self.sample_rate:
+                return await func(*args, **kwargs)
+            profile = self._active = cProfile.Profile()
+            started = time.perf_counter()
+            profile.enable()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                profile.disable()
+                self._active = None
+                self._record(time.perf_counter() - started, name, profile)
+        return wrapper
+
+
+PROFILER = UpdateProfiler()
+
+
+class MetricsServer:
+    """
+    Локальный HTTP-сервер наблюдаемости:
+    GET /metrics — метрики Prometheus; POST /profiler/start|stop|dump — управление профилировщиком.
+    """
+
+    def __init__(
+        self,
+        port: int,
+        host: str = METRICS_HOST,
+        registry: MetricsRegistry = REGISTRY,
+        profiler: UpdateProfiler = PROFILER,
+        dump_dir: str = PROFILER_DUMP_DIR
+    ):
+        self.host = host
+        self.port = port
+        self.registry = registry
+        self.profiler = profiler
+        self.dump_dir = dump_dir
+        self._runner: Optional[web.AppRunner] = None
+
+    async def _metrics(self, request: web.Request) -> web.Response:
+        return web.Response(text=self.registry.render(), content_type="text/plain", charset="utf-8")
+
+    async def _profiler(self, request: web.Request) -> web.Response:
+        action = request.match_info["action"]
+        if action == "start":
+            rate = request.query.get("sample_rate")
+            self.profiler.start(float(rate) if rate else None)
+        elif action == "stop":
+            self.profiler.stop()
+        elif action == "dump":
+            return web.json_response({"files": self.profiler.dump(self.dump_dir)})
+        else:
+            raise web.HTTPNotFound()
+        return web.json_response({
+            "enabled": self.profiler.enabled,
+            "sample_rate": self.profiler.sample_rate,
+            "slowest": [{"handler": name, "seconds": round(duration, 6)} for name, duration in self.profiler.slowest()],
+        })
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_get("/metrics", self._metrics)
+        app.router.add_post("/profiler/{action}", self._profiler)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        if not self.port:
+            self.port = site._server.sockets[0].getsockname()[1]
+        logger.info(f"Метрики доступны на http://{self.host}:{self.port}/metrics")
+
+    async def close(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
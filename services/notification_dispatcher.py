@@ -0,0 +1,149 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+from telegram.error import RetryAfter
+from constants import (
+    NOTIFICATION_MAX_RETRIES,
+    NOTIFICATION_QUEUE_SIZE,
+    NOTIFICATION_WORKERS,
+    TELEGRAM_GLOBAL_RATE,
+    TELEGRAM_PER_CHAT_INTERVAL,
+)
+from services.metrics import TELEGRAM_SEND_SECONDS, TELEGRAM_SENDS
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Асинхронный token bucket: не более rate операций в секунду с запасом capacity"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+def _resolve(future: asyncio.Future, value: bool) -> None:
+    # Ожидающий send() мог быть отменён, пока сообщение стояло в очереди
+    if not future.done():
+        future.set_result(value)
+
+
+@dataclass
+class _Outgoing:
+    chat_id: int
+    text: str
+    future: asyncio.Future
+    attempts: int = field(default=0)
+
+
+class NotificationDispatcher:
+    """
+    Очередь исходящих сообщений с ограничением скорости.
+
+    Пул из workers отправителей разбирает общую очередь; глобальный token bucket
+    держит суммарную скорость в пределах лимита Telegram, а для каждого чата
+    выдерживается интервал per_chat_interval. Ответ 429 (RetryAfter) приостанавливает
+    все отправители на указанное время, после чего сообщение отправляется повторно.
+    """
+
+    def __init__(
+        self,
+        bot,
+        global_rate: float = TELEGRAM_GLOBAL_RATE,
+        per_chat_interval: float = TELEGRAM_PER_CHAT_INTERVAL,
+        workers: int = NOTIFICATION_WORKERS,
+        max_retries: int = NOTIFICATION_MAX_RETRIES,
+        queue_size: int = NOTIFICATION_QUEUE_SIZE,
+    ):
+        self.bot = bot
+        self.per_chat_interval = per_chat_interval
+        self.max_retries = max_retries
+        self._bucket = TokenBucket(global_rate)
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._workers_count = workers
+        self._workers: List[asyncio.Task] = []
+        self._chat_next_slot: Dict[int, float] = {}
+        self._paused_until = 0.0
+
+    async def start(self) -> None:
+        if self._workers:
+            return
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self._workers_count)]
+
+    async def close(self) -> None:
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def send(self, chat_id: int, text: str) -> bool:
+        """Ставит сообщение в очередь и ждёт результата отправки"""
+        await self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put(_Outgoing(chat_id, text, future))
+        return await future
+
+    async def _wait_for_chat_slot(self, chat_id: int) -> None:
+        # Слот резервируется сразу, поэтому параллельные отправители одного чата не пересекаются
+        now = time.monotonic()
+        if len(self._chat_next_slot) > self._queue.maxsize:
+            self._chat_next_slot = {chat: ready for chat, ready in self._chat_next_slot.items() if ready > now}
+        slot = max(now, self._chat_next_slot.get(chat_id, 0.0))
+        self._chat_next_slot[chat_id] = slot + self.per_chat_interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    async def _worker(self) -> None:
+        while True:
+            item = await self._queue.get()
+            try:
+                await self._deliver(item)
+            finally:
+                self._queue.task_done()
+
+    async def _deliver(self, item: _Outgoing) -> None:
+        while True:
+            pause = self._paused_until - time.monotonic()
+            if pause > 0:
+                await asyncio.sleep(pause)
+            await self._wait_for_chat_slot(item.chat_id)
+            await self._bucket.acquire()
+            item.attempts += 1
+            started = time.perf_counter()
+            try:
+                await self.bot.send_message(chat_id=item.chat_id, text=item.text)
+            except RetryAfter as e:
+                TELEGRAM_SENDS.inc(result="retry_after")
+                retry_after = float(e.retry_after)
+                logger.warning(f"Превышен лимит Telegram, пауза {retry_after} с")
+                self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+                if item.attempts <= self.max_retries:
+                    continue
+                logger.error(f"Сообщение пользователю {item.chat_id} не отправлено после {item.attempts} попыток")
+                _resolve(item.future, False)
+            except Exception as e:
+                TELEGRAM_SENDS.inc(result="error")
+                logger.error(f"Ошибка отправки сообщения пользователю {item.chat_id}: {e}")
+                _resolve(item.future, False)
+            else:
+                TELEGRAM_SENDS.inc(result="ok")
+                _resolve(item.future, True)
+            finally:
+                TELEGRAM_SEND_SECONDS.observe(time.perf_counter() - started)
+            return
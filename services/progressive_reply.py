@@ -0,0 +1,78 @@
+import asyncio
+import logging
+import time
+from typing import Callable, Optional
+from telegram.error import BadRequest, RetryAfter
+from constants import STREAM_EDIT_INTERVAL, STREAM_EDIT_MIN_CHARS, TELEGRAM_MESSAGE_LIMIT
+
+logger = logging.getLogger(__name__)
+
+
+class ProgressiveReply:
+    """
+    Ответ, который дописывается правками одного сообщения.
+
+    Первый текст заменяет заглушку сразу, как только набралось min_chars символов;
+    следующие правки отправляются не чаще min_interval секунд и только если
+    текст вырос хотя бы на min_chars символов. Итоговая правка в finish() не ждёт
+    интервала, но после RetryAfter выжидает указанную Telegram паузу.
+    """
+
+    def __init__(
+        self,
+        message,
+        min_interval: float = STREAM_EDIT_INTERVAL,
+        min_chars: int = STREAM_EDIT_MIN_CHARS,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.message = message
+        self.min_interval = min_interval
+        self.min_chars = min_chars
+        self.edits = 0
+        self._clock = clock
+        self._sent = None
+        self._shown = ""
+        self._shown_chars = 0
+        self._next_edit_at = 0.0
+        self._paused_until = 0.0
+
+    async def start(self, placeholder: str) -> None:
+        self._sent = await self.message.reply_text(placeholder)
+        self._shown = placeholder
+        self._shown_chars = 0
+
+    async def update(self, text: str) -> bool:
+        """Промежуточная правка; False, если она пропущена из-за ограничений"""
+        text = text[:TELEGRAM_MESSAGE_LIMIT]
+        if self._clock() < self._next_edit_at or len(text) - self._shown_chars < self.min_chars:
+            return False
+        return await self._edit(text)
+
+    async def finish(self, text: str) -> None:
+        text = text[:TELEGRAM_MESSAGE_LIMIT]
+        if text == self._shown:
+            return
+        while True:
+            delay = self._paused_until - self._clock()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if await self._edit(text):
+                return
+
+    async def _edit(self, text: str) -> bool:
+        try:
+            await self._sent.edit_text(text)
+        except RetryAfter as e:
+            logger.warning(f"Превышен лимит правок Telegram, пауза {e.retry_after} с")
+            self._paused_until = self._clock() + float(e.retry_after)
+            self._next_edit_at = max(self._next_edit_at, self._paused_until)
+            return False
+        except BadRequest as e:
+            # Текст совпал с показанным — правка не нужна
+            if "not modified" not in str(e).lower():
+                raise
+        self.edits += 1
+        self._shown = text
+        self._shown_chars = len(text)
+        self._next_edit_at = self._clock() + self.min_interval
+        return True
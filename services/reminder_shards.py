@@ -0,0 +1,103 @@
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+import zlib
+from typing import Awaitable, Callable, List, Optional
+from constants import REMINDER_LEASE_TTL, REMINDER_PASS_INTERVAL, REMINDER_SHARDS
+from repositories.database_repository import DatabaseRepository
+
+logger = logging.getLogger(__name__)
+
+
+class ShardedReminderRunner:
+    """
+    Делит проход напоминаний между репликами бота.
+
+    Пользователи разбиты на shards шардов по user_id. Реплика берёт свободный шард
+    в аренду через таблицу reminder_leases, обрабатывает его и продлевает аренду
+    каждые heartbeat_interval секунд. Если реплика упала, её аренда истекает
+    и шард забирает другая; если аренду перехватили, обработка шарда прерывается.
+    Журнал sent_reminders не даёт повторно отправить уже доставленное.
+    """
+
+    def __init__(
+        self,
+        db_repository: DatabaseRepository,
+        process_shard: Callable[[int, int], Awaitable[object]],
+        shards: int = REMINDER_SHARDS,
+        owner: Optional[str] = None,
+        lease_ttl: float = REMINDER_LEASE_TTL,
+        heartbeat_interval: Optional[float] = None,
+    ):
+        """
+        :param process_shard: Корутина (shard, shards), выполняющая проход по одному шарду
+        """
+        self.db_repository = db_repository
+        self.process_shard = process_shard
+        self.shards = shards
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.lease_ttl = lease_ttl
+        self.heartbeat_interval = heartbeat_interval or lease_ttl / 3
+
+    @staticmethod
+    def current_pass(now: Optional[float] = None) -> int:
+        """Номер прохода: реплики, проснувшиеся в одном интервале, делят один проход"""
+        return int((now if now is not None else time.time()) // REMINDER_PASS_INTERVAL)
+
+    async def run_pass(self, pass_number: Optional[int] = None) -> List[int]:
+        """
+        Обрабатывает свободные шарды прохода, пока он не завершён всеми репликами.
+
+        :return: Шарды, обработанные этой репликой
+        """
+        if pass_number is None:
+            pass_number = self.current_pass()
+        # Реплики начинают с разных шардов, чтобы реже сталкиваться на одной аренде
+        start = zlib.crc32(self.owner.encode()) % self.shards
+        order = [(start + i) % self.shards for i in range(self.shards)]
+        processed, failed = [], set()
+        while True:
+            pending = await self.db_repository.pending_reminder_shards(self.shards, pass_number)
+            pending -= failed
+            if not pending:
+                return processed
+            claimed = False
+            for shard in order:
+                if shard not in pending:
+                    continue
+                if not await self.db_repository.claim_reminder_shard(shard, self.owner, pass_number, self.lease_ttl):
+                    continue
+                claimed = True
+                if await self._run_shard(shard):
+                    await self.db_repository.release_reminder_shard(shard, self.owner, pass_number)
+                    processed.append(shard)
+                else:
+                    # Ошибка повторится и у другой реплики; шард останется до следующего прохода
+                    failed.add(shard)
+            if not claimed:
+                # Остальные шарды заняты живыми репликами: ждём их завершения или истечения аренды
+                await asyncio.sleep(self.heartbeat_interval)
+
+    async def _run_shard(self, shard: int) -> bool:
+        task = asyncio.create_task(self.process_shard(shard, self.shards))
+        try:
+            while True:
+                done, _ = await asyncio.wait({task}, timeout=self.heartbeat_interval)
+                if done:
+                    break
+                if not await self.db_repository.renew_reminder_lease(shard, self.owner, self.lease_ttl):
+                    logger.warning(f"Аренда шарда напоминаний {shard} перехвачена, обработка прервана")
+                    task.cancel()
+                    await asyncio.gather(task, return_exceptions=True)
+                    return False
+        except asyncio.CancelledError:
+            task.cancel()
+            raise
+        if task.exception() is not None:
+            logger.error(f"Ошибка прохода напоминаний по шарду {shard}: {task.exception()}")
+            await self.db_repository.release_reminder_shard(shard, self.owner)
+            return False
+        return True
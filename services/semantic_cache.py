@@ -0,0 +1,262 @@
+import hashlib
+import math
+import time
+import zlib
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+import numpy as np
+from constants import SEMANTIC_CACHE_DIM, SEMANTIC_CACHE_SIZE, SEMANTIC_CACHE_THRESHOLD, SEMANTIC_CACHE_TTL
+from services.intent_classifier import load_examples, normalize
+from services.metrics import SEMANTIC_CACHE_LOOKUPS
+
+# Слова, не меняющие смысла жалобы: "у меня болит голова, что выпить" ~ "болит голова".
+# Отрицания здесь нет: "не болит голова" — другая жалоба
+_STOP_WORDS = frozenset((
+    "а", "в", "во", "и", "к", "на", "ну", "о", "от", "по", "при", "с", "со", "у", "уже", "же", "я",
+    "меня", "мне", "мой", "моя", "очень", "сильно", "совсем", "опять", "что", "чем", "как", "можно",
+    "делать", "выпить", "принять", "пить", "посоветуй", "подскажи", "помоги", "кажется", "сильный", "сильная",
+    "мучает", "мучит", "замучил", "замучила", "беспокоит",
+))
+# Окончания, отбрасываемые при лемматизации (длинные проверяются раньше коротких)
+_ENDINGS = tuple(sorted((
+    "ами", "ями", "ого", "его", "ому", "ему", "ыми", "ими", "ая", "яя", "ое", "ее", "ые", "ие", "ый", "ий", "ой",
+    "ую", "юю", "ом", "ем", "ам", "ям", "ах", "ях", "ов", "ев", "ей", "ит", "ят", "ет", "ут", "ют", "ат", "ишь",
+    "ать", "ять", "ить", "еть", "ала", "ало", "али", "ила", "ило", "или", "ал", "ял", "ил", "ел", "ыл",
+    "ла", "ло", "ли",
+    "а", "я", "ы", "и", "у", "ю", "е", "о", "ь", "й", "л",
+), key=len, reverse=True))
+# Контекст жалобы, меняющий рекомендацию: ответ выдаётся только при том же наборе.
+# Слова сравниваются по началу, чтобы покрыть падежи ("ребенка", "детям", "беременна")
+_CONTEXT_PREFIXES = (
+    ("child", ("ребен", "дет", "малыш", "младен", "грудничк", "сын", "доч", "подрост")),
+    ("pregnancy", ("беремен",)),
+    ("breastfeeding", ("кормл", "кормящ", "вскармлив", "лактац")),
+)
+_NEGATIONS = frozenset(("не", "нет", "ни", "без"))
+_MIN_STEM = 3
+_NGRAMS = (3, 4)
+
+
+def lemmatize(word: str) -> str:
+    """Грубая основа слова: отбрасывает возвратную частицу и одно окончание, оставляя не меньше трёх букв"""
+    for suffix in ("ся", "сь"):
+        if word.endswith(suffix) and len(word) - len(suffix) >= _MIN_STEM:
+            word = word[:-len(suffix)]
+            break
+    for ending in _ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= _MIN_STEM:
+            return word[:-len(ending)]
+    return word
+
+
+def symptom_lemmas(text: str) -> List[str]:
+    """Основы значимых слов жалобы без стоп-слов и чисел"""
+    return [lemmatize(word) for word in normalize(text).split() if word not in _STOP_WORDS and not word.isdigit()]
+
+
+def complaint_context(text: str) -> Tuple[str, ...]:
+    """Признаки жалобы, при различии которых ответ из кэша не подходит: пациент и отрицание"""
+    words = normalize(text).split()
+    context = [name for name, prefixes in _CONTEXT_PREFIXES if any(word.startswith(prefixes) for word in words)]
+    if any(word in _NEGATIONS for word in words):
+        context.append("negation")
+    return tuple(context)
+
+
+def _features(lemmas: Sequence[str]) -> List[str]:
+    """Основы целиком и символьные 3–4-граммы основ с границами слова"""
+    features = []
+    for lemma in lemmas:
+        padded = f" {lemma} "
+        features.append(f"w:{lemma}")
+        for n in _NGRAMS:
+            features.extend(padded[i:i + n] for i in range(len(padded) - n + 1))
+    return features
+
+
+def _hash64(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little", signed=True)
+
+
+def shortlist_fingerprint(names: Iterable[str]) -> int:
+    """Отпечаток набора лекарств из промпта: порядок и регистр не важны"""
+    return _hash64("\n".join(sorted(" ".join(normalize(name).split()) for name in names)))
+
+
+class SymptomVectorizer:
+    """
+    TF-IDF по символьным n-граммам основ, свёрнутый хешированием в вектор фиксированной длины.
+
+    Веса IDF считаются по размеченным фразам из data/intents.tsv; n-граммы,
+    которых там нет, получают наибольший вес. Знак признака тоже берётся из хеша,
+    чтобы коллизии в среднем гасили друг друга, а не копились.
+    """
+
+    def __init__(self, dim: int = SEMANTIC_CACHE_DIM, corpus: Optional[Iterable[str]] = None):
+        self.dim = dim
+        documents = list(corpus) if corpus is not None else [phrase for _, phrase in load_examples()]
+        frequencies = Counter(feature for text in documents for feature in set(_features(symptom_lemmas(text))))
+        self._idf: Dict[str, float] = {
+            feature: math.log((len(documents) + 1) / (count + 1)) + 1 for feature, count in frequencies.items()
+        }
+        self._default_idf = math.log(len(documents) + 1) + 1
+        self._buckets: Dict[str, Tuple[int, float]] = {}
+
+    def _bucket(self, feature: str) -> Tuple[int, float]:
+        bucket = self._buckets.get(feature)
+        if bucket is None:
+            digest = zlib.crc32(feature.encode())
+            sign = 1.0 if digest & 1 else -1.0
+            bucket = self._buckets[feature] = (digest >> 1) % self.dim, sign * self._idf.get(feature, self._default_idf)
+            if len(self._buckets) > 100_000:
+                self._buckets.clear()
+        return bucket
+
+    def vectorize(self, text: str) -> Optional[np.ndarray]:
+        """L2-нормированный вектор float32 или None, если в тексте нет значимых слов"""
+        counts = Counter(_features(symptom_lemmas(text)))
+        if not counts:
+            return None
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature, count in counts.items():
+            index, weight = self._bucket(feature)
+            vector[index] += (1 + math.log(count)) * weight
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm else None
+
+
+class SemanticCache:
+    """
+    Кэш рекомендаций по смыслу жалобы, а не по точному тексту.
+
+    Записи разделены по ключу «пользователь + отпечаток аптечки + контекст жалобы»
+    (complaint_context): ответ одному пользователю или для взрослого не выдаётся
+    другому пользователю, для ребёнка или на жалобу с отрицанием.
+
+    Векторы жалоб лежат строками в заранее выделенной матрице max_size × dim,
+    поиск — одно умножение на вектор запроса (косинус, т.к. строки нормированы)
+    строк с тем же ключом, с маской по сроку жизни. Если у ключа больше
+    четверти строк, умножается вся матрица: выборка строк тогда дороже.
+    Ответ выдаётся, если лучшее сходство не ниже threshold. При заполнении новая
+    запись занимает устаревшую строку или строку, к которой дольше всех не обращались.
+    """
+
+    def __init__(
+        self,
+        max_size: int = SEMANTIC_CACHE_SIZE,
+        ttl: float = SEMANTIC_CACHE_TTL,
+        threshold: float = SEMANTIC_CACHE_THRESHOLD,
+        vectorizer: Optional[SymptomVectorizer] = None,
+        clock=time.time,
+    ):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.threshold = threshold
+        self.vectorizer = vectorizer or SymptomVectorizer()
+        self.clock = clock
+        self._vectors = np.zeros((max_size, self.vectorizer.dim), dtype=np.float32)
+        self._keys = np.zeros(max_size, dtype=np.int64)
+        self._expires_at = np.zeros(max_size, dtype=np.float64)
+        self._last_used = np.zeros(max_size, dtype=np.int64)
+        self._values: List[Optional[str]] = [None] * max_size
+        self._rows: Dict[int, Set[int]] = {}
+        self._size = 0
+        self._tick = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self._expires_at[:self._size] > self.clock()))
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions, "size": len(self)}
+
+    def _touch(self, row: int) -> None:
+        self._tick += 1
+        self._last_used[row] = self._tick
+
+    @staticmethod
+    def _key(text: str, user_id: int, fingerprint: int) -> int:
+        return _hash64(f"{user_id}:{fingerprint}:{','.join(complaint_context(text))}")
+
+    def _best(self, vector: np.ndarray, key: int, now: float) -> Tuple[int, float]:
+        """Строка с наибольшим сходством среди живых записей с тем же ключом: (номер, сходство) или (-1, 0)"""
+        rows = self._rows.get(key)
+        if not rows:
+            return -1, 0.0
+        if len(rows) * 4 < self._size:
+            index = np.fromiter(rows, dtype=np.intp, count=len(rows))
+            scores = self._vectors[index] @ vector
+            scores[self._expires_at[index] <= now] = -1.0
+        else:
+            index = None
+            size = self._size
+            scores = self._vectors[:size] @ vector
+            scores[(self._keys[:size] != key) | (self._expires_at[:size] <= now)] = -1.0
+        best = int(np.argmax(scores))
+        if scores[best] <= 0:
+            return -1, 0.0
+        return (int(index[best]) if index is not None else best), float(scores[best])
+
+    def lookup(self, text: str, user_id: int, fingerprint: int) -> Tuple[Optional[str], float]:
+        """Ответ на похожую жалобу и его сходство; (None, сходство лучшего кандидата) при промахе"""
+        vector = self.vectorizer.vectorize(text)
+        if vector is None:
+            return None, 0.0
+        row, similarity = self._best(vector, self._key(text, user_id, fingerprint), self.clock())
+        if row < 0 or similarity < self.threshold:
+            return None, similarity
+        self._touch(row)
+        return self._values[row], similarity
+
+    def get(self, text: str, user_id: int, fingerprint: int) -> Optional[str]:
+        value, _ = self.lookup(text, user_id, fingerprint)
+        if value is None:
+            self.misses += 1
+            SEMANTIC_CACHE_LOOKUPS.labels(result="miss").inc()
+        else:
+            self.hits += 1
+            SEMANTIC_CACHE_LOOKUPS.labels(result="hit").inc()
+        return value
+
+    def set(self, text: str, user_id: int, fingerprint: int, value: str) -> None:
+        vector = self.vectorizer.vectorize(text)
+        if vector is None or not value:
+            return
+        now = self.clock()
+        key = self._key(text, user_id, fingerprint)
+        row, similarity = self._best(vector, key, now)
+        if row < 0 or similarity < self.threshold:
+            row = self._free_row(now)
+        # Перефразировка уже закэшированной жалобы обновляет существующую запись
+        self._write(row, vector, key, value, now + self.ttl)
+
+    def _write(self, row: int, vector: np.ndarray, key: int, value: str, expires_at: float) -> None:
+        if self._values[row] is not None:
+            previous = int(self._keys[row])
+            self._rows[previous].discard(row)
+            if not self._rows[previous]:
+                del self._rows[previous]
+        self._vectors[row] = vector
+        self._keys[row] = key
+        self._expires_at[row] = expires_at
+        self._values[row] = value
+        self._rows.setdefault(key, set()).add(row)
+        self._touch(row)
+
+    def _free_row(self, now: float) -> int:
+        if self._size < self.max_size:
+            self._size += 1
+            return self._size - 1
+        expired = np.flatnonzero(self._expires_at <= now)
+        if expired.size:
+            return int(expired[0])
+        self.evictions += 1
+        return int(np.argmin(self._last_used))
+
+    def clear(self) -> None:
+        self._expires_at[:] = 0
+        self._values = [None] * self.max_size
+        self._rows.clear()
+        self._size = 0
@@ -0,0 +1,64 @@
+import asyncio
+from typing import Any, Awaitable, Dict, List, Optional
+from telegram.ext import BaseUpdateProcessor
+from constants import UPDATE_CONCURRENCY, UPDATE_MAX_PENDING
+from services.metrics import UPDATES_IN_PROGRESS
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """
+    Параллельная обработка апдейтов с сохранением порядка внутри одного чата.
+
+    Апдейты разных чатов выполняются одновременно, не более concurrency сразу;
+    апдейты одного чата ждут своей очереди на asyncio.Lock, который выдаётся
+    в порядке поступления. Семафор базового класса ограничивает число
+    принятых в обработку апдейтов значением max_pending: ожидающие своей
+    очереди в чате не занимают места обработчиков.
+    """
+
+    def __init__(self, concurrency: int = UPDATE_CONCURRENCY, max_pending: int = UPDATE_MAX_PENDING):
+        super().__init__(max(max_pending, concurrency))
+        self.concurrency = concurrency
+        self.active = 0
+        self.processed = 0
+        self._running = asyncio.Semaphore(concurrency)
+        # Замок чата и число апдейтов, которые его ждут или держат
+        self._chat_locks: Dict[int, List[Any]] = {}
+
+    @staticmethod
+    def _chat_key(update: object) -> Optional[int]:
+        chat = getattr(update, "effective_chat", None)
+        if chat is not None:
+            return chat.id
+        user = getattr(update, "effective_user", None)
+        return user.id if user is not None else None
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        self.active += 1
+        UPDATES_IN_PROGRESS.set(self.active)
+        try:
+            key = self._chat_key(update)
+            if key is None:
+                async with self._running:
+                    await coroutine
+                return
+            entry = self._chat_locks.setdefault(key, [asyncio.Lock(), 0])
+            entry[1] += 1
+            try:
+                async with entry[0]:
+                    async with self._running:
+                        await coroutine
+            finally:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._chat_locks[key]
+        finally:
+            self.active -= 1
+            self.processed += 1
+            UPDATES_IN_PROGRESS.set(self.active)
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
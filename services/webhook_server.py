@@ -0,0 +1,85 @@
+import hmac
+import json
+import logging
+from typing import Optional
+from aiohttp import web
+from telegram import Update
+from telegram.ext import Application
+from constants import UPDATE_MAX_PENDING, WEBHOOK_PATH
+from services.metrics import WEBHOOK_UPDATES
+from services.update_processor import PerUserUpdateProcessor
+
+logger = logging.getLogger(__name__)
+
+
+class WebhookServer:
+    """
+    Встроенный aiohttp-сервер для приёма апдейтов Telegram в режиме webhook.
+
+    Апдейт кладётся в application.update_queue, и Telegram сразу получает 200.
+    Когда в обработке уже max_pending апдейтов, сервер отвечает 503 с Retry-After:
+    Telegram повторит доставку позже, а очередь в памяти не растёт без предела.
+    """
+
+    def __init__(
+        self,
+        application: Application,
+        processor: PerUserUpdateProcessor,
+        host: str,
+        port: int,
+        path: str = WEBHOOK_PATH,
+        secret_token: Optional[str] = None,
+        max_pending: int = UPDATE_MAX_PENDING,
+    ):
+        self.application = application
+        self.processor = processor
+        self.host = host
+        self.port = port
+        self.path = path
+        self.secret_token = secret_token
+        self.max_pending = max_pending
+        self._accepted = 0
+        self._runner: Optional[web.AppRunner] = None
+
+    @property
+    def pending(self) -> int:
+        """Принятые, но ещё не обработанные апдейты: в update_queue, в очереди чата или в обработчике"""
+        return self._accepted - self.processor.processed
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        if self.secret_token is not None:
+            received = request.headers.get("X-Telegram-Bot-Api-Secret-Token", "")
+            if not hmac.compare_digest(received, self.secret_token):
+                WEBHOOK_UPDATES.inc(result="forbidden")
+                return web.Response(status=403)
+        if self.pending >= self.max_pending:
+            WEBHOOK_UPDATES.inc(result="rejected")
+            return web.Response(status=503, headers={"Retry-After": "1"})
+        try:
+            update = Update.de_json(await request.json(), self.application.bot)
+        except (json.JSONDecodeError, TypeError, KeyError, ValueError) as e:
+            logger.warning(f"Некорректный апдейт от webhook: {e}")
+            WEBHOOK_UPDATES.inc(result="invalid")
+            return web.Response(status=400)
+        self._accepted += 1
+        await self.application.update_queue.put(update)
+        WEBHOOK_UPDATES.inc(result="accepted")
+        return web.Response()
+
+    async def start(self) -> None:
+        # Апдейты, обработанные до запуска сервера, не должны уменьшать счёт ожидающих
+        self._accepted = self.processor.processed
+        app = web.Application()
+        app.router.add_post(self.path, self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        if not self.port:
+            self.port = site._server.sockets[0].getsockname()[1]
+        logger.info(f"Webhook принимает апдейты на {self.host}:{self.port}{self.path}")
+
+    async def close(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
@@ -0,0 +1,5 @@
+import os
+
+# config.py требует токены при импорте; для тестов достаточно фиктивных значений
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "test-token")
+os.environ.setdefault("GROQ_API_KEY", "test-key")
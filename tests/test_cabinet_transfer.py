@@ -0,0 +1,199 @@
+import asyncio
+import io
+from telegram.error import TimedOut
+from main import MedicineBot
+from parsers.cabinet_file import iter_json_objects
+from repositories.database_repository import DatabaseRepository
+from services.cabinet_transfer import export_cabinet, import_cabinet
+
+CSV_FILE = """kind,name,expiry_date,quantity,dosage,schedule,method
+medication,Аспирин,12.30,10,,,
+,Нурофен,2031-05-01,2,,,
+medication,Без срока,,1,,,
+medication,Смекта,13.30,1,,,
+course,Амоксициллин,,,500 мг,3 раза в день 7 дней,перорально
+course,Витамин Д,,,,,
+medication,Аспирин,12.30,5,,,
+"""
+
+
+async def _repository():
+    repository = DatabaseRepository(":memory:")
+    await repository.create_tables()
+    return repository
+
+
+def test_csv_import_validates_rows_and_merges_duplicates():
+    async def scenario():
+        repository = await _repository()
+        result = await import_cabinet(repository, 1, io.StringIO(CSV_FILE), "csv", chunk_size=2)
+        meds = sorted((med.name, med.expiry_date, med.quantity) for med in await repository.list_medications(1))
+        return result, meds, await repository.list_courses(1)
+
+    result, meds, courses = asyncio.run(scenario())
+
+    assert (result.medications, result.courses, result.error_count, result.aborted) == (3, 1, 3, None)
+    assert [(error.line_number, error.line) for error in result.errors] == [(4, "Без срока"), (5, "Смекта"), (7, "Витамин Д")]
+    assert meds == [("Аспирин", "2030-12-31", 15), ("Нурофен", "2031-05-01", 2)]
+    assert courses[0].medicine_name == "Амоксициллин" and courses[0].next_dose_at
+
+
+def test_export_round_trips_through_both_formats():
+    async def scenario():
+        source = await _repository()
+        await import_cabinet(source, 1, io.StringIO(CSV_FILE), "csv")
+        exported = {}
+        for file_format in ("csv", "json"):
+            stream = io.StringIO()
+            count = await export_cabinet(source, 1, stream, file_format)
+            exported[file_format] = (count, stream.getvalue())
+        copies = []
+        for file_format, (_, text) in exported.items():
+            target = await _repository()
+            result = await import_cabinet(target, 7, io.StringIO(text), file_format)
+            meds = sorted((med.name, med.expiry_date, med.quantity) for med in await target.list_medications(7))
+            courses = [(course.medicine_name, course.schedule) for course in await target.list_courses(7)]
+            copies.append((result.error_count, meds, courses))
+        return exported, copies
+
+    exported, copies = asyncio.run(scenario())
+
+    assert exported["csv"][0] == exported["json"][0] == 3
+    assert exported["json"][1].startswith("[\n{")
+    assert copies[0] == copies[1] == (0, [("Аспирин", "2030-12-31", 15), ("Нурофен", "2031-05-01", 2)],
+                                      [("Амоксициллин", "3 раза в день 7 дней")])
+
+
+def test_restoring_own_export_does_not_double_the_cabinet():
+    async def scenario():
+        repository = await _repository()
+        await import_cabinet(repository, 1, io.StringIO(CSV_FILE), "csv", chunk_size=2)
+        await repository.add_medication(1, "Аспирин", "2030-12-31", 3)
+        stream = io.StringIO()
+        await export_cabinet(repository, 1, stream, "json")
+        await repository.add_medication(1, "Нурофен", "2031-05-01", 4)
+        result = await import_cabinet(repository, 1, io.StringIO(stream.getvalue()), "json", chunk_size=2)
+        meds = sorted((med.name, med.expiry_date, med.quantity) for med in await repository.list_medications(1))
+        return result, meds, await repository.list_courses(1)
+
+    result, meds, courses = asyncio.run(scenario())
+
+    assert (result.medications, result.courses) == (2, 0)
+    assert meds == [("Аспирин", "2030-12-31", 18), ("Нурофен", "2031-05-01", 2)]
+    assert [course.medicine_name for course in courses] == ["Амоксициллин"]
+
+
+def test_json_reader_streams_arrays_and_json_lines():
+    array = '[{"name": "А", "note": "' + "x" * 100 + '"}, {"name": "Б"},\n {"name": "В"}]'
+    lines = '{"name": "А"}\n{"name": "Б"}\n'
+
+    assert [value["name"] for value in iter_json_objects(io.StringIO(array), chunk_size=7)] == ["А", "Б", "В"]
+    assert [value["name"] for value in iter_json_objects(io.StringIO(lines), chunk_size=3)] == ["А", "Б"]
+
+
+def test_broken_json_keeps_imported_chunks():
+    async def scenario():
+        repository = await _repository()
+        text = '[{"name": "Аспирин", "expiry_date": "12.30", "quantity": 1},\n{"name": "Нур'
+        return await import_cabinet(repository, 1, io.StringIO(text), "json"), await repository.list_medications(1)
+
+    result, meds = asyncio.run(scenario())
+
+    assert result.aborted.startswith("повреждённый JSON")
+    assert [med.name for med in meds] == ["Аспирин"]
+
+
+class FakeFile:
+    def __init__(self, content: str):
+        self.content = content
+
+    async def download_to_drive(self, path):
+        with open(path, "w", encoding="utf-8") as stream:
+            stream.write(self.content)
+        return path
+
+
+class FakeDocument:
+    def __init__(self, file_name: str, content: str):
+        self.file_name = file_name
+        self.file_size = len(content.encode())
+        self.content = content
+
+    async def get_file(self):
+        return FakeFile(self.content)
+
+
+class FakeMessage:
+    def __init__(self, user_id: int, document=None):
+        self.from_user = type("User", (), {"id": user_id})()
+        self.document = document
+        self.replies = []
+        self.documents = []
+
+    async def reply_text(self, text, reply_markup=None):
+        self.replies.append(text)
+
+    async def reply_document(self, document, filename=None):
+        self.documents.append((filename, document.read().decode("utf-8")))
+
+
+class FakeUpdate:
+    def __init__(self, message):
+        self.message = message
+        self.effective_user = message.from_user
+
+
+def test_document_import_and_export_command():
+    async def scenario():
+        bot = MedicineBot()
+        bot.db_repository = await _repository()
+        bot.dose_scheduler.db_repository = bot.db_repository
+        uploaded = FakeMessage(1, FakeDocument("аптечка.CSV", CSV_FILE))
+        await bot.handle_document(FakeUpdate(uploaded), None)
+        unsupported = FakeMessage(1, FakeDocument("аптечка.xlsx", ""))
+        await bot.handle_document(FakeUpdate(unsupported), None)
+        exported = FakeMessage(1)
+        await bot.export(FakeUpdate(exported), type("Context", (), {"args": ["json"]})())
+        empty = FakeMessage(2)
+        await bot.export(FakeUpdate(empty), type("Context", (), {"args": []})())
+        return uploaded.replies, unsupported.replies, exported.documents, empty.replies, len(bot.dose_scheduler)
+
+    uploaded, unsupported, documents, empty, scheduled = asyncio.run(scenario())
+
+    assert uploaded[0].startswith("Импортировано лекарств: 3, курсов: 1.\nПропущено записей с ошибками: 3")
+    assert unsupported[0].startswith("Пришлите аптечку файлом .csv или .json")
+    assert documents[0][0] == "cabinet.json" and '"name": "Амоксициллин"' in documents[0][1]
+    assert empty == ["Ваша аптечка пуста."]
+    assert scheduled == 1
+
+
+class FailingUploadMessage(FakeMessage):
+    async def reply_document(self, document, filename=None):
+        raise TimedOut()
+
+
+def test_export_reports_failed_upload():
+    async def scenario():
+        bot = MedicineBot()
+        bot.db_repository = await _repository()
+        await import_cabinet(bot.db_repository, 1, io.StringIO(CSV_FILE), "csv")
+        message = FailingUploadMessage(1)
+        await bot.export(FakeUpdate(message), type("Context", (), {"args": []})())
+        return message.replies
+
+    assert asyncio.run(scenario()) == ["Произошла ошибка взаимодействия с Telegram."]
+
+
+def test_cli_round_trip(tmp_path, capsys):
+    import cabinet_cli
+
+    database = str(tmp_path / "cli.db")
+    source = tmp_path / "cabinet.csv"
+    source.write_text(CSV_FILE, encoding="utf-8-sig")
+    parser = cabinet_cli._parser()
+
+    assert asyncio.run(cabinet_cli._run(parser.parse_args(["--database", database, "import", "--user", "5", str(source)]))) == 0
+    assert asyncio.run(cabinet_cli._run(parser.parse_args(["--database", database, "export", "--user", "5", "-"]))) == 0
+    output = capsys.readouterr().out
+    assert "Импортировано лекарств: 3, курсов: 1." in output
+    assert "medication,Аспирин,2030-12-31,15,,," in output
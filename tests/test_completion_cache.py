@@ -0,0 +1,96 @@
+import asyncio
+from services.completion_cache import CompletionCache, make_cache_key
+
+
+def test_concurrent_identical_prompts_make_one_upstream_call():
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "ответ"
+
+    async def scenario():
+        cache = CompletionCache()
+        key = make_cache_key("model", 150, "болит   голова")
+        results = await asyncio.gather(*(cache.get_or_compute(key, compute) for _ in range(10)))
+        # Повторный запрос с другими пробелами попадает в тот же ключ
+        again = await cache.get_or_compute(make_cache_key("model", 150, " болит голова "), compute)
+        return results, again, cache.stats()
+
+    results, again, stats = asyncio.run(scenario())
+
+    assert calls == 1
+    assert results == ["ответ"] * 10 and again == "ответ"
+    assert stats["misses"] == 1 and stats["hits"] == 10
+
+
+def test_lru_eviction_and_ttl():
+    async def scenario():
+        cache = CompletionCache(max_size=2, ttl=60)
+        for prompt in ("a", "b"):
+            await cache.get_or_compute(make_cache_key("m", 1, prompt), lambda p=prompt: _value(p))
+        # Обращение к "a" делает его самым свежим, поэтому вытесняется "b"
+        await cache.get_or_compute(make_cache_key("m", 1, "a"), lambda: _value("x"))
+        await cache.get_or_compute(make_cache_key("m", 1, "c"), lambda: _value("c"))
+        b = await cache.get_or_compute(make_cache_key("m", 1, "b"), lambda: _value("b2"))
+
+        expiring = CompletionCache(ttl=0)
+        await expiring.get_or_compute(make_cache_key("m", 1, "a"), lambda: _value("old"))
+        fresh = await expiring.get_or_compute(make_cache_key("m", 1, "a"), lambda: _value("new"))
+        return cache.stats(), b, fresh
+
+    stats, b, fresh = asyncio.run(scenario())
+
+    assert b == "b2"
+    assert stats["evictions"] == 2
+    assert fresh == "new"
+
+
+def test_sqlite_backend_survives_restart(tmp_path):
+    path = str(tmp_path / "cache.db")
+
+    async def scenario():
+        key = make_cache_key("m", 1, "prompt")
+        first = CompletionCache(persist_path=path)
+        await first.get_or_compute(key, lambda: _value("сохранено"))
+        await first.close()
+
+        second = CompletionCache(persist_path=path)
+        value = await second.get_or_compute(key, lambda: _value("заново"))
+        await second.close()
+        return value, second.stats()
+
+    value, stats = asyncio.run(scenario())
+
+    assert value == "сохранено"
+    assert stats["hits"] == 1 and stats["misses"] == 0
+
+
+async def _value(value):
+    return value
+
+
+def test_cancelled_leader_does_not_cancel_followers():
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return "ответ"
+
+    async def scenario():
+        cache = CompletionCache()
+        key = make_cache_key("model", 150, "болит голова")
+        leader = asyncio.create_task(cache.get_or_compute(key, compute))
+        await asyncio.sleep(0.01)
+        followers = [asyncio.create_task(cache.get_or_compute(key, compute)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        results = await asyncio.gather(*followers)
+        return leader.cancelled(), results, await cache.get(key)
+
+    assert asyncio.run(scenario()) == (True, ["ответ"] * 3, "ответ")
+    assert calls == 1
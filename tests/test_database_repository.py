@@ -1,5 +1,7 @@
+import asyncio
+import sqlite3
 import pytest
-from repositories.database_repository import DatabaseRepository, Medication
+from repositories.database_repository import DatabaseRepository, Medication, dispose_engines
 from datetime import datetime, timedelta
 
 @pytest.fixture
@@ -14,11 +16,112 @@ def test_add_medication(db_repository):
     quantity = 3
 
     # Act
-    db_repository.create_tables()
-    db_repository.add_medication(user_id, name, expiry_date, quantity)
-    medications = db_repository.list_medications(user_id)
+    async def act():
+        await db_repository.create_tables()
+        await db_repository.add_medication(user_id, name, expiry_date, quantity)
+        return await db_repository.list_medications(user_id)
+    medications = asyncio.run(act())
 
     # Assert
     assert len(medications) == 1
     assert medications[0].name == name
-    assert medications[0].quantity == quantity 
\ No newline at end of file
+    assert medications[0].quantity == quantity 
+
+def test_add_medications_many(db_repository):
+    medications = [Medication(name=f"Med-{i}", expiry_date="2030-01-31", quantity=i) for i in range(50)]
+
+    async def act():
+        await db_repository.create_tables()
+        added = await db_repository.add_medications_many(1, medications)
+        return added, await db_repository.list_medications(1)
+    added, stored = asyncio.run(act())
+
+    assert added == 50
+    assert sorted(med.quantity for med in stored) == list(range(50))
+    assert all(med.next_event_date for med in stored)
+
+def test_file_database_shares_one_tuned_engine(tmp_path):
+    path = str(tmp_path / "app.db")
+    first, second = DatabaseRepository(path), DatabaseRepository(path)
+
+    async def act():
+        async with first.engine.connect() as conn:
+            journal_mode = (await conn.exec_driver_sql("PRAGMA journal_mode")).scalar()
+            synchronous = (await conn.exec_driver_sql("PRAGMA synchronous")).scalar()
+            busy_timeout = (await conn.exec_driver_sql("PRAGMA busy_timeout")).scalar()
+        await dispose_engines()
+        return journal_mode, synchronous, busy_timeout
+    journal_mode, synchronous, busy_timeout = asyncio.run(act())
+
+    assert first.engine is second.engine
+    assert first.engine.echo is False
+    assert journal_mode == "wal"
+    assert synchronous == 1  # NORMAL
+    assert busy_timeout > 0
+
+
+def test_upsert_and_delete_many(db_repository):
+    async def act():
+        await db_repository.create_tables()
+        first_id = await db_repository.upsert_medication(1, "Аспирин", "2030-01-31", 3)
+        same_id = await db_repository.upsert_medication(1, "Аспирин", "2030-01-31", 5)
+        other_id = await db_repository.upsert_medication(1, "Аспирин", "2031-01-31", 1)
+        after_upsert = await db_repository.list_medications(1)
+        deleted = await db_repository.delete_medications([first_id, other_id])
+        return first_id, same_id, other_id, after_upsert, deleted, await db_repository.list_medications(1)
+    first_id, same_id, other_id, after_upsert, deleted, after_delete = asyncio.run(act())
+
+    assert same_id == first_id and other_id != first_id
+    assert sorted(med.quantity for med in after_upsert) == [1, 5]
+    assert deleted == 2
+    assert after_delete == []
+
+def test_list_expiring_medications_window_order_and_keyset_pages(db_repository):
+    today = datetime(2024, 5, 1).date()
+    days = [90, 5, 30, 0, -3, 60, 1, 45]
+
+    async def act():
+        await db_repository.create_tables()
+        await db_repository.add_medications_many(1, [
+            Medication(name=f"Med {d}", expiry_date=(today + timedelta(days=d)).isoformat(), quantity=1) for d in days
+        ])
+        await db_repository.add_medication(2, "Чужое", (today + timedelta(days=2)).isoformat(), 1)
+        first = await db_repository.list_expiring_medications(1, limit=3, today=today)
+        last_med = first[-1][0]
+        second = await db_repository.list_expiring_medications(
+            1, limit=3, today=today, after=(last_med.expiry_date, last_med.id)
+        )
+        async with db_repository.engine.connect() as conn:
+            plan = (await conn.exec_driver_sql(
+                "EXPLAIN QUERY PLAN SELECT id FROM medications WHERE user_id = 1 "
+                "AND expiry_date >= '2024-05-02' ORDER BY expiry_date, id"
+            )).all()
+        return first, second, plan
+    first, second, plan = asyncio.run(act())
+
+    assert [(med.name, d) for med, d in first] == [("Med 1", 1), ("Med 5", 5), ("Med 30", 30)]
+    assert [(med.name, d) for med, d in second] == [("Med 45", 45), ("Med 60", 60)]
+    assert any("ix_medications_user_expiry" in row[-1] for row in plan)
+
+
+def test_large_id_lists_stay_within_sqlite_variable_limit():
+    count = 70_000
+
+    async def scenario():
+        repository = DatabaseRepository(":memory:")
+        await repository.create_tables()
+        # Лимит стандартной сборки SQLite: в дистрибутивах его часто поднимают
+        async with repository.engine.connect() as connection:
+            raw = (await connection.get_raw_connection()).driver_connection
+            await raw._execute(raw._conn.setlimit, sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER, 32766)
+        await repository.add_medications_many(1, [
+            Medication(name=f"Препарат-{i}", expiry_date="2030-01-31", quantity=1) for i in range(count)
+        ])
+        ids = [med.id for med in await repository.list_medications(1)]
+        sent = await repository.find_sent_reminders([(med_id, "2030-01-31", "expired") for med_id in ids])
+        courses = await repository.get_courses(ids)
+        deleted = await repository.delete_medications(ids[:count // 2])
+        await repository.apply_reminder_pass(ids[count // 2:], [], [1])
+        return sent, courses, deleted, await repository.list_medications(1)
+
+    assert asyncio.run(scenario()) == (set(), [], count // 2, [])
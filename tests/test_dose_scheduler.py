@@ -0,0 +1,166 @@
+import asyncio
+from datetime import datetime, timedelta
+from main import MedicineBot
+from parsers.schedule_parser import DOSE_TIME_FORMAT
+from repositories.database_repository import DatabaseRepository, dispose_engines
+from services.dose_scheduler import DoseScheduler
+
+
+def _key(moment: datetime) -> str:
+    return moment.strftime(DOSE_TIME_FORMAT)
+
+
+async def _course(repository, user_id, spec, next_dose_at):
+    return await repository.add_course(user_id, "Аспирин", "100мг", "", "внутрь", spec, next_dose_at)
+
+
+def test_due_doses_are_sent_once_and_rescheduled_across_replicas(tmp_path):
+    now = datetime(2026, 10, 18, 20, 0)
+
+    async def scenario():
+        repository = DatabaseRepository(str(tmp_path / "doses.db"))
+        await repository.create_tables()
+        first = await _course(repository, 1, "t=08:00,20:00", "2026-10-18T20:00")
+        await _course(repository, 1, "t=21:00", "2026-10-18T21:00")
+        late = await _course(repository, 2, "t=08:00", "2026-10-18T08:00")
+        sent = []
+
+        async def send(user_id, courses):
+            sent.append((user_id, [course.id for course in courses]))
+
+        # Две реплики с одинаковой кучей, восстановленной из базы
+        replicas = [DoseScheduler(repository, send), DoseScheduler(repository, send)]
+        for replica in replicas:
+            await replica.rebuild()
+        delivered = [await replica.run_due(now) for replica in replicas]
+        next_due = [replica.next_due() for replica in replicas]
+        doses = dict((course_id, when) for when, course_id in await repository.list_scheduled_doses())
+        await dispose_engines()
+        return first, late, sent, delivered, next_due, doses
+
+    first, late, sent, delivered, next_due, doses = asyncio.run(scenario())
+
+    # Приём в 08:00 пропущен на 12 часов — не напоминаем, только переносим
+    assert sent == [(1, [first])]
+    assert delivered == [1, 0]
+    assert next_due == ["2026-10-18T21:00", "2026-10-18T21:00"]
+    assert doses[first] == "2026-10-19T08:00"
+    assert doses[late] == "2026-10-19T08:00"
+
+
+def test_timer_wakes_for_newly_scheduled_dose_without_polling(tmp_path):
+    async def scenario():
+        repository = DatabaseRepository(str(tmp_path / "timer.db"))
+        await repository.create_tables()
+        future = _key(datetime.now() + timedelta(hours=5))
+        await _course(repository, 1, "t=08:00", future)
+        sent = asyncio.Event()
+
+        async def send(user_id, courses):
+            sent.set()
+
+        scheduler = DoseScheduler(repository, send)
+        await scheduler.start()
+        await asyncio.sleep(0.1)
+        wakeups_while_idle = scheduler.wakeups
+        due_now = _key(datetime.now())
+        course_id = await _course(repository, 2, "t=08:00", due_now)
+        scheduler.schedule(course_id, due_now)
+        await asyncio.wait_for(sent.wait(), 1)
+        await scheduler.close()
+        await dispose_engines()
+        return wakeups_while_idle
+
+    assert asyncio.run(scenario()) <= 1
+
+
+def test_course_command_stores_schedule_and_plans_next_dose():
+    async def scenario():
+        bot = MedicineBot()
+        bot.db_repository = DatabaseRepository(":memory:")
+        await bot.db_repository.create_tables()
+        bot.dose_scheduler = DoseScheduler(bot.db_repository, None)
+        response = await bot._process_message(1, "курс Амоксициллин 500мг 08:00 20:00 7 дней метод внутрь")
+        courses = await bot.db_repository.list_courses(1)
+        return response, courses, bot.dose_scheduler.next_due()
+
+    response, courses, next_due = asyncio.run(scenario())
+
+    assert "Ближайший приём" in response
+    assert courses[0].medicine_name == "Амоксициллин"
+    assert courses[0].schedule_spec.startswith("t=08:00,20:00;from=")
+    assert next_due == courses[0].next_dose_at
+
+
+class FakeMessage:
+    def __init__(self, user_id, text):
+        self.from_user = type("User", (), {"id": user_id})()
+        self.text = text
+        self.replies = []
+
+    async def reply_text(self, text, reply_markup=None):
+        self.replies.append(text)
+
+
+class FakeUpdate:
+    def __init__(self, message):
+        self.message = message
+        self.effective_user = message.from_user
+
+
+def test_course_message_through_handler_adds_course_instead_of_listing():
+    async def scenario():
+        bot = MedicineBot()
+        bot.db_repository = DatabaseRepository(":memory:")
+        await bot.db_repository.create_tables()
+        bot.dose_scheduler = DoseScheduler(bot.db_repository, None)
+        replies = []
+        for text in ("курс Амоксициллин 500мг 08:00 20:00 7 дней", "Мой курс лекарств", "курс"):
+            message = FakeMessage(1, text)
+            await bot.handle_message(FakeUpdate(message), None)
+            replies.append(message.replies[-1])
+        return replies, await bot.db_repository.list_courses(1), len(bot.dose_scheduler)
+
+    replies, courses, scheduled = asyncio.run(scenario())
+
+    assert replies[0].startswith("Курс приема для 'амоксициллин' добавлен")
+    assert "амоксициллин" in replies[1] and replies[1] == replies[2]
+    assert [course.medicine_name for course in courses] == ["амоксициллин"]
+    assert scheduled == 1
+
+
+def test_course_branch_follows_classified_intent():
+    async def scenario():
+        bot = MedicineBot()
+        bot.db_repository = DatabaseRepository(":memory:")
+        await bot.db_repository.create_tables()
+        bot.dose_scheduler = DoseScheduler(bot.db_repository, None)
+        response = await bot._process_message(1, "добавь Амоксициллин для курса")
+        return response, await bot.db_repository.list_courses(1)
+
+    response, courses = asyncio.run(scenario())
+
+    assert response.startswith("Не удалось определить действие")
+    assert courses == []
+
+
+def test_free_text_list_requests_show_courses_and_expiry():
+    async def scenario():
+        bot = MedicineBot()
+        bot.db_repository = DatabaseRepository(":memory:")
+        await bot.db_repository.create_tables()
+        bot.dose_scheduler = DoseScheduler(bot.db_repository, None)
+        await bot.db_repository.add_medication(1, "Аспирин", (datetime.now() + timedelta(days=10)).strftime("%Y-%m-%d"), 1)
+        await bot._process_message(1, "курс Амоксициллин 500мг 08:00 20:00 7 дней")
+        replies = []
+        for text in ("покажи мои курсы", "какие у меня курсы", "покажи сроки годности", "курс Витамин Д"):
+            message = FakeMessage(1, text)
+            await bot.handle_message(FakeUpdate(message), None)
+            replies.append(message.replies[-1])
+        return replies, await bot._list_page("c", 1), await bot._expiry_text(1)
+
+    replies, (courses, _), expiry = asyncio.run(scenario())
+
+    assert replies[0] == replies[1] == courses and "Амоксициллин" in courses
+    assert replies[2] == expiry and "Аспирин" in expiry
+    assert replies[3].startswith("Не удалось распознать данные курса")
@@ -0,0 +1,56 @@
+import asyncio
+import pytest
+from datetime import date, timedelta
+from repositories.database_repository import DatabaseRepository, next_event_date
+from services.expiry_scheduler import ExpiryScheduler
+
+TODAY = date(2024, 5, 1)
+
+
+def _expiry(days: int) -> str:
+    return (TODAY + timedelta(days=days)).isoformat()
+
+
+@pytest.fixture
+def db_repository():
+    repository = DatabaseRepository(":memory:")
+    asyncio.run(repository.create_tables())
+    return repository
+
+
+def test_next_event_date_follows_reminder_rule():
+    # Далеко до истечения — первое напоминание за 60 дней
+    assert next_event_date(_expiry(100), TODAY) == _expiry(40)
+    # В день напоминания событие — сегодня
+    assert next_event_date(_expiry(60), TODAY) == TODAY.isoformat()
+    assert next_event_date(_expiry(46), TODAY) == TODAY.isoformat()
+    # Между напоминаниями — ближайшее следующее (за 46 дней)
+    assert next_event_date(_expiry(50), TODAY) == _expiry(4)
+    # После последнего напоминания — удаление на следующий день после истечения
+    assert next_event_date(_expiry(2), TODAY) == _expiry(3)
+    # Просроченное лекарство обрабатывается сразу
+    assert next_event_date(_expiry(-1), TODAY) == TODAY.isoformat()
+
+
+def test_run_pass_touches_only_due_rows(db_repository):
+    async def scenario():
+        # add_medication считает next_event_date от реальной текущей даты,
+        # поэтому проход выполняем на ту же дату
+        today = date.today()
+        await db_repository.add_medication(1, "Далекий", (today + timedelta(days=300)).isoformat(), 1)
+        await db_repository.add_medication(1, "Напоминание", (today + timedelta(days=60)).isoformat(), 2)
+        await db_repository.add_medication(2, "Просроченный", (today - timedelta(days=3)).isoformat(), 3)
+
+        scheduler = ExpiryScheduler(db_repository)
+        first = await scheduler.run_pass(today)
+        second = await scheduler.run_pass(today)
+        remaining = await db_repository.list_medications(1) + await db_repository.list_medications(2)
+        return first, second, remaining
+
+    first, second, remaining = asyncio.run(scenario())
+
+    assert [med.name for med in first.expired] == ["Просроченный"]
+    assert [(med.name, days) for med, days in first.expiring] == [("Напоминание", 60)]
+    # Повторный проход в тот же день ничего не находит: события перенесены
+    assert not second.expired and not second.expiring
+    assert sorted(med.name for med in remaining) == ["Далекий", "Напоминание"]
@@ -0,0 +1,36 @@
+from repositories.database_repository import Medication
+from services.indication_index import IndicationIndex
+
+index = IndicationIndex()
+
+
+def _cabinet(*names):
+    return [Medication(name=name, expiry_date="2030-01-31", quantity=1) for name in names]
+
+
+def test_lookup_matches_brands_and_compound_names():
+    assert index.lookup("Нурофен Экспресс").substance == "ибупрофен"
+    assert index.lookup("Но-шпа форте").substance == "дротаверин"
+    assert index.lookup("Витамин Д") is None
+
+
+def test_symptom_terms_match_word_stems():
+    assert {"бол", "голов", "температур"} <= index.symptom_terms("Болит голова, температура 38")
+    assert "ушей" not in index.symptom_terms("сильный ушиб колена")
+
+
+def test_shortlist_keeps_relevant_deduplicated_medications():
+    cabinet = _cabinet("Отривин", "Парацетамол 500", "Но-шпа", "парацетамол  500", "Нурофен", "Витамин Д", "Смекта")
+
+    shortlist = index.shortlist("болит голова и температура", cabinet)
+
+    assert shortlist[:2] == ["Парацетамол 500", "Нурофен"]
+    assert shortlist.count("Парацетамол 500") == 1
+    assert "Отривин" not in shortlist and "Смекта" not in shortlist
+    assert "Витамин Д" in shortlist
+
+
+def test_shortlist_is_limited_when_symptoms_are_unknown():
+    cabinet = _cabinet(*(f"Препарат {i}" for i in range(50)))
+
+    assert index.shortlist("что-то мне нехорошо", cabinet, limit=10) == [f"Препарат {i}" for i in range(10)]
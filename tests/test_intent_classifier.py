@@ -0,0 +1,52 @@
+import asyncio
+import pytest
+from main import MedicineBot
+from services.intent_classifier import IntentClassifier, load_examples
+
+
+@pytest.fixture(scope="module")
+def classifier():
+    return IntentClassifier()
+
+
+@pytest.mark.parametrize("text, intent", [
+    ("у меня болит голова", "рекомендация"),
+    ("что у меня в аптечке", "аптечка"),
+    ("купил парацетамол", "добавить"),
+    ("принимать по таблетке три раза в день", "курс"),
+])
+def test_classifies_typical_messages(classifier, text, intent):
+    prediction = classifier.classify(text)
+    assert prediction.intent == intent
+    assert 0 < prediction.confidence <= 1
+
+
+def test_holdout_accuracy():
+    examples = load_examples()
+    classifier = IntentClassifier([example for i, example in enumerate(examples) if i % 5])
+    holdout = [example for i, example in enumerate(examples) if not i % 5]
+    correct = sum(classifier.classify(phrase).intent == intent for intent, phrase in holdout)
+    assert correct / len(holdout) >= 0.9
+
+
+class RecordingLLM:
+    def __init__(self, response):
+        self.response = response
+        self.prompts = []
+
+    async def get_completion_cached(self, prompt, user_id=None):
+        self.prompts.append(prompt)
+        return self.response
+
+
+def test_llm_is_asked_only_below_confidence_threshold():
+    bot = MedicineBot()
+    bot.llm_service = RecordingLLM("Курс")
+
+    confident = asyncio.run(bot._detect_intent("у меня болит голова"))
+    assert confident == "рекомендация"
+    assert bot.llm_service.prompts == []
+
+    uncertain = asyncio.run(bot._detect_intent("ъъъ"))
+    assert uncertain == "курс"
+    assert len(bot.llm_service.prompts) == 1
@@ -0,0 +1,130 @@
+import asyncio
+import time
+import pytest
+from constants import Messages
+from main import MedicineBot
+from repositories.database_repository import DatabaseRepository
+from services.llm_scheduler import LLMScheduler, Priority, parse_reset
+from services.llm_service import GroqLLMService, LLMOverloadedError
+from services.metrics import LLM_SHED
+
+
+def _unlimited(**kwargs):
+    return LLMScheduler(requests_per_minute=1e6, tokens_per_minute=1e9, **kwargs)
+
+
+async def _run_in_order(scheduler, requests):
+    """Занимает единственный слот, ставит запросы в очередь и возвращает порядок их обслуживания"""
+    order = []
+    gate = asyncio.Event()
+
+    async def holder():
+        async with scheduler.slot(None):
+            await gate.wait()
+
+    async def request(name, user_id, priority):
+        async with scheduler.slot(user_id, priority):
+            order.append(name)
+
+    holding = asyncio.create_task(holder())
+    await asyncio.sleep(0)
+    tasks = []
+    for name, user_id, priority in requests:
+        tasks.append(asyncio.create_task(request(name, user_id, priority)))
+        await asyncio.sleep(0)
+    gate.set()
+    await asyncio.gather(holding, *tasks)
+    return order
+
+
+def test_interactive_requests_go_before_background():
+    order = asyncio.run(_run_in_order(_unlimited(max_concurrency=1), [
+        ("digest", None, Priority.BACKGROUND),
+        ("warmup", None, Priority.BACKGROUND),
+        ("symptoms", 1, Priority.INTERACTIVE),
+    ]))
+
+    assert order == ["symptoms", "digest", "warmup"]
+
+
+def test_users_are_served_round_robin():
+    order = asyncio.run(_run_in_order(_unlimited(max_concurrency=1), [
+        ("a1", 1, Priority.INTERACTIVE),
+        ("a2", 1, Priority.INTERACTIVE),
+        ("a3", 1, Priority.INTERACTIVE),
+        ("b1", 2, Priority.INTERACTIVE),
+        ("c1", 3, Priority.INTERACTIVE),
+    ]))
+
+    assert order == ["a1", "b1", "c1", "a2", "a3"]
+
+
+def test_full_user_queue_is_shed():
+    scheduler = _unlimited(max_concurrency=1, user_queue_depth=2)
+    shed = LLM_SHED.labels(priority="interactive", reason="user_queue")
+    before = shed.value
+
+    async def scenario():
+        gate = asyncio.Event()
+
+        async def request():
+            async with scheduler.slot(1):
+                await gate.wait()
+
+        tasks = [asyncio.create_task(request()) for _ in range(3)]
+        await asyncio.sleep(0)
+        reasons = [scheduler.admit(1), scheduler.admit(2)]
+        gate.set()
+        await asyncio.gather(*tasks)
+        return reasons
+
+    assert asyncio.run(scenario()) == ["user_queue", None]
+    assert shed.value == before + 1
+
+
+def test_rate_limit_headers_pause_dispatch():
+    scheduler = _unlimited()
+
+    async def scenario():
+        scheduler.update_from_headers({"x-ratelimit-remaining-requests": "0", "x-ratelimit-reset-requests": "0.2s"})
+        started = time.perf_counter()
+        async with scheduler.slot(1):
+            return time.perf_counter() - started
+
+    assert asyncio.run(scenario()) >= 0.19
+    assert parse_reset("1m30.5s") == 90.5
+    assert parse_reset("120ms") == pytest.approx(0.12)
+
+
+def test_tokens_per_minute_bucket_spaces_large_requests():
+    scheduler = LLMScheduler(requests_per_minute=1e6, tokens_per_minute=600)
+
+    async def scenario():
+        started = time.perf_counter()
+        for _ in range(2):
+            async with scheduler.slot(1, cost=300):
+                pass
+        return time.perf_counter() - started
+
+    # Запаса в 600 токенов хватает на два запроса сразу; третий ждёт пополнения 300 токенов (10 в секунду)
+    assert asyncio.run(scenario()) < 0.1
+    assert 25 < scheduler.tokens.wait_time(300, time.monotonic()) <= 30
+
+
+def test_overloaded_llm_gets_busy_reply():
+    bot = MedicineBot()
+
+    class BusyLLM(GroqLLMService):
+        async def get_completion(self, prompt, user_id=None, priority=Priority.INTERACTIVE):
+            raise LLMOverloadedError("queue full")
+
+    async def scenario():
+        bot.db_repository = DatabaseRepository(":memory:")
+        await bot.db_repository.create_tables()
+        await bot.db_repository.add_medication(1, "Парацетамол", "2030-01-31", 1)
+        bot.llm_service = BusyLLM("key", "model")
+        return await bot._process_message(1, "у меня болит голова")
+
+    response = asyncio.run(scenario())
+
+    assert response == Messages.LLM_BUSY.value
@@ -0,0 +1,205 @@
+import asyncio
+import json
+import time
+import pytest
+from aiohttp import ClientSession, web
+from services.llm_scheduler import LLMScheduler
+from services.llm_service import CircuitBreaker, GroqLLMService, LLMServiceError, LLMUnavailableError
+
+
+class StubServer:
+    """Локальная заглушка Groq API: отвечает заданными статусами и запоминает соединения"""
+
+    def __init__(self, statuses=(), latency: float = 0.0, chunk_delay: float = 0.0, break_after: int = None):
+        self.statuses = list(statuses)
+        self.latency = latency
+        self.chunk_delay = chunk_delay
+        self.break_after = break_after
+        self.calls = 0
+        self.peers = set()
+        self.url = None
+        self._runner = None
+
+    async def _handle(self, request):
+        self.calls += 1
+        self.peers.add(request.transport.get_extra_info("peername"))
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        status = self.statuses.pop(0) if self.statuses else 200
+        if status != 200:
+            return web.json_response({"error": "stub"}, status=status)
+        payload = await request.json()
+        if payload.get("stream"):
+            return await self._stream(request, f"ответ на: {payload['prompt']}")
+        return web.json_response({"text": f" ответ на: {payload['prompt']} "})
+
+    async def _stream(self, request, text):
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        await response.write(b": keep-alive\n\n")
+        for i, word in enumerate(text.split(" ")):
+            if self.break_after is not None and i == self.break_after:
+                request.transport.close()
+                return response
+            chunk = word if i == 0 else f" {word}"
+            await response.write(f"event: chunk\ndata: {json.dumps({'text': chunk}, ensure_ascii=False)}\n\n".encode())
+            await asyncio.sleep(self.chunk_delay)
+        await response.write(b"data: [DONE]\n\n")
+        return response
+
+    async def __aenter__(self):
+        app = web.Application()
+        app.router.add_post("/v1/llm", self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{port}/v1/llm"
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._runner.cleanup()
+
+
+def _service(url, **kwargs):
+    kwargs.setdefault("retry_backoff", 0.001)
+    kwargs.setdefault("scheduler", LLMScheduler(requests_per_minute=1e6, tokens_per_minute=1e9))
+    return GroqLLMService("key", "model", api_url=url, **kwargs)
+
+
+def test_retries_server_errors_with_backoff():
+    async def scenario():
+        async with StubServer(statuses=[500, 429]) as server:
+            service = _service(server.url)
+            result = await service.get_completion("привет")
+            await service.close()
+            return server, result
+
+    server, result = asyncio.run(scenario())
+
+    assert result == "ответ на: привет"
+    assert server.calls == 3
+
+
+def test_circuit_breaker_fails_fast_while_api_is_down():
+    async def scenario():
+        async with StubServer(statuses=[503] * 10) as server:
+            service = _service(server.url, max_retries=1, circuit_breaker=CircuitBreaker(failure_threshold=2, reset_timeout=60))
+            for _ in range(2):
+                with pytest.raises(LLMServiceError):
+                    await service.get_completion("привет")
+            calls_before = server.calls
+            with pytest.raises(LLMUnavailableError):
+                await service.get_completion("привет")
+            await service.close()
+            return calls_before, server.calls
+
+    calls_before, calls_after = asyncio.run(scenario())
+
+    assert calls_before == 4
+    assert calls_after == calls_before
+
+
+def test_cancelled_or_abandoned_probe_does_not_keep_breaker_open():
+    async def scenario():
+        async with StubServer(statuses=[503]) as server:
+            breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+            service = _service(server.url, max_retries=0, circuit_breaker=breaker)
+            with pytest.raises(LLMServiceError):
+                await service.get_completion("привет")
+
+            # Пробный запрос отменяется, пока ждёт ответа
+            await asyncio.sleep(0.06)
+            server.latency = 1.0
+            probe = asyncio.create_task(service.get_completion("привет"))
+            await asyncio.sleep(0.02)
+            probe.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await probe
+            server.latency = 0.0
+            # Отменённый пробный запрос считается неудачей: breaker снова ждёт reset_timeout
+            with pytest.raises(LLMUnavailableError):
+                await service.get_completion("привет")
+
+            # Пробный поток брошен после первого фрагмента
+            await asyncio.sleep(0.06)
+            stream = service.stream_completion("привет")
+            await stream.__anext__()
+            await stream.aclose()
+            await asyncio.sleep(0.06)
+            result = await service.get_completion("привет")
+            await service.close()
+            return result, breaker.is_open
+
+    assert asyncio.run(scenario()) == ("ответ на: привет", False)
+
+
+def test_persistent_session_reuses_connections_and_lowers_latency():
+    calls = 50
+
+    async def fresh_session_call(url):
+        # Прежнее поведение: новая сессия (и новое соединение) на каждый запрос
+        async with ClientSession() as session:
+            async with session.post(url, json={"prompt": "p", "max_tokens": 1, "model": "m"}) as response:
+                return await response.json()
+
+    async def scenario():
+        async with StubServer() as server:
+            started = time.perf_counter()
+            for _ in range(calls):
+                await fresh_session_call(server.url)
+            fresh_latency = (time.perf_counter() - started) / calls
+            fresh_peers = len(server.peers)
+
+            server.peers.clear()
+            service = _service(server.url)
+            await service.start()
+            started = time.perf_counter()
+            for _ in range(calls):
+                await service.get_completion("p")
+            pooled_latency = (time.perf_counter() - started) / calls
+            await service.close()
+            return fresh_peers, len(server.peers), fresh_latency, pooled_latency
+
+    fresh_peers, pooled_peers, fresh_latency, pooled_latency = asyncio.run(scenario())
+
+    print(f"fresh session: {fresh_latency * 1000:.2f} ms/call, pooled: {pooled_latency * 1000:.2f} ms/call")
+    assert fresh_peers == calls
+    assert pooled_peers == 1
+    assert pooled_latency < fresh_latency
+
+
+def test_stream_completion_yields_server_sent_chunks():
+    async def scenario():
+        async with StubServer(statuses=[503]) as server:
+            service = _service(server.url)
+            chunks = [chunk async for chunk in service.stream_completion("раз два три")]
+            cached = [chunk async for chunk in service.stream_completion_cached("раз два три")]
+            again = [chunk async for chunk in service.stream_completion_cached("раз два три")]
+            await service.close()
+            return server, chunks, cached, again
+
+    server, chunks, cached, again = asyncio.run(scenario())
+
+    assert chunks == ["ответ", " на:", " раз", " два", " три"]
+    assert cached == chunks
+    assert again == ["ответ на: раз два три"]
+    assert server.calls == 3
+
+
+def test_stream_broken_midway_is_not_retried():
+    async def scenario():
+        async with StubServer(break_after=2) as server:
+            service = _service(server.url)
+            chunks = []
+            with pytest.raises(LLMServiceError):
+                async for chunk in service.stream_completion("раз два три"):
+                    chunks.append(chunk)
+            await service.close()
+            return server, chunks
+
+    server, chunks = asyncio.run(scenario())
+
+    assert chunks == ["ответ", " на:"]
+    assert server.calls == 1
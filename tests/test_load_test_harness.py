@@ -0,0 +1,24 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+import load_test
+
+
+def test_load_test_smoke_run_writes_comparable_json(tmp_path, capsys):
+    output = tmp_path / "results.json"
+    args = ["--messages", "40", "--users", "5", "--llm-latency", "0", "--reminder-sizes", "200", "--output", str(output)]
+
+    results = load_test.main(args)
+    rerun = load_test.main(args + ["--compare", str(output)])
+
+    assert json.loads(output.read_text(encoding="utf-8")) == rerun
+    handlers = results["handlers"]
+    assert handlers["messages"] == 40
+    assert handlers["messages_per_second"] > 0
+    assert set(handlers["latency"]) == {"p50_ms", "p95_ms", "p99_ms"}
+    assert 0 <= handlers["llm_calls_per_message"] < 1
+    assert results["reminders"]["200"]["messages_sent"] > 0
+    assert "handlers.messages_per_second" in capsys.readouterr().out
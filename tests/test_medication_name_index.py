@@ -0,0 +1,184 @@
+import asyncio
+import sqlite3
+import pytest
+from main import MedicineBot
+from parsers.medication_name import canonical_name, name_parts
+from parsers.medication_parser import ParsedTake, parse_take_message
+from repositories.database_repository import DatabaseRepository, Medication, dispose_engines
+from repositories.medication_name_index import MedicationNameIndex
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("Аспирин", "аспирин"),
+    (" аспирин ", "аспирин"),
+    ("Aspirin 500", "аспирин 500"),
+    ("Аспирин 500 мг", "аспирин 500 мг"),
+    ("Paracetamol 500mg", "парацетамол 500 мг"),
+    ("Називин 0,01%", "називин 0.01 %"),
+    ("Citramon", "цитрамон"),
+    ("Но-шпа форте", "ношпа форте"),
+    ("Ибупрофен 400 мг табл.", "ибупрофен 400 мг"),
+    ("Витамин Д3", "витамин д3"),
+    ("Ёж", "еж"),
+])
+def test_canonical_name(name, expected):
+    assert canonical_name(name) == expected
+
+
+def test_transliteration_is_optional():
+    assert canonical_name("Aspirin", translit=False) == "aspirin"
+
+
+def test_dosage_is_normalized_but_kept_in_key():
+    assert canonical_name("Парацетамол 500мг") == canonical_name("парацетамол 500 mg") == "парацетамол 500 мг"
+    assert canonical_name("Парацетамол 125 мг") != canonical_name("Парацетамол 500 мг")
+    assert canonical_name("Називин 0,01%") != canonical_name("Називин 0,05%")
+    assert name_parts("Парацетамол 500 мг") == ("парацетамол", "500 мг")
+
+
+def test_index_finds_misspelled_and_inflected_names():
+    cabinet = [
+        Medication(name=name, canonical_name=canonical_name(name), expiry_date="2030-01-31", quantity=1)
+        for name in ("Аспирин", "Нурофен Экспресс", "Но-шпа", "Парацетамол 500", "Смекта")
+    ]
+    index = MedicationNameIndex(cabinet)
+
+    assert index.search("aspirin 100")[0] == (cabinet[0], 1.0)
+    assert index.search("нурофен")[0][0] is cabinet[1]
+    assert index.search("но-шпу")[0][0] is cabinet[2]
+    assert index.search("парацитамол")[0][0] is cabinet[3]
+    assert index.search("валидол") == []
+
+
+def test_index_keeps_strengths_apart():
+    cabinet = [
+        Medication(name=name, canonical_name=canonical_name(name), expiry_date="2030-01-31", quantity=1)
+        for name in ("Називин 0,01%", "Називин 0,05%", "Аспирин")
+    ]
+    index = MedicationNameIndex(cabinet)
+
+    assert [med for med, _ in index.search("називин 0.05 %")] == [cabinet[1]]
+    assert [med for med, _ in index.search("назевин 0,01%")] == [cabinet[0]]
+    assert [med for med, _ in index.search("називин")] == cabinet[:2]
+    # У лекарства дозировка не указана — подходит любая
+    assert index.search("аспирин 100")[0] == (cabinet[2], 1.0)
+
+
+def test_parse_take_message():
+    assert parse_take_message("принял аспирин") == ParsedTake("аспирин", 1)
+    assert parse_take_message("Я выпила нурофен x2") == ParsedTake("нурофен", 2)
+    assert parse_take_message("Принял но-шпа форте x2!") == ParsedTake("но-шпа форте", 2)
+    assert parse_take_message("принялся за уборку") is None
+    # Длинное сообщение — жалоба, а не отметка приёма
+    assert parse_take_message("выпил парацетамол но голова болит") is None
+
+
+def test_adding_same_medication_merges_quantities():
+    async def scenario():
+        repository = DatabaseRepository(":memory:")
+        await repository.create_tables()
+        first = await repository.add_medication(1, "Аспирин", "2030-01-31", 2)
+        second = await repository.add_medication(1, "аспирин ", "2030-01-31", 1)
+        await repository.add_medications_many(1, [
+            Medication(name="Aspirin", expiry_date="2030-01-31", quantity=3),
+            Medication(name="Аспирин 500мг", expiry_date="2030-01-31", quantity=1),
+            Medication(name="аспирин 500 мг", expiry_date="2030-01-31", quantity=1),
+            Medication(name="Аспирин", expiry_date="2031-01-31", quantity=1),
+            Medication(name="Аспирин", expiry_date="2031-01-31", quantity=1),
+        ])
+        await repository.add_medication(2, "Аспирин", "2030-01-31", 1)
+        return first, second, await repository.list_medications(1)
+
+    first, second, medications = asyncio.run(scenario())
+
+    assert first == second
+    assert sorted((med.name, med.expiry_date, med.quantity) for med in medications) == [
+        ("Аспирин", "2030-01-31", 6), ("Аспирин", "2031-01-31", 2), ("Аспирин 500мг", "2030-01-31", 2)
+    ]
+
+
+class StubLLM:
+    async def get_completion_cached(self, prompt, user_id=None):
+        return "рекомендация"
+
+
+def test_take_command_decrements_earliest_expiring_batch():
+    async def scenario():
+        bot = MedicineBot()
+        bot.llm_service = StubLLM()
+        bot.db_repository = DatabaseRepository(":memory:")
+        await bot.db_repository.create_tables()
+        await bot.db_repository.add_medication(1, "Аспирин", "2031-01-31", 5)
+        await bot.db_repository.add_medication(1, "Аспирин", "2030-01-31", 2)
+        await bot.db_repository.add_medication(1, "Нурофен", "2030-01-31", 1)
+        replies = [
+            await bot._process_message(1, "принял аспирин"),
+            await bot._process_message(1, "принял aspirin x3"),
+            await bot._process_message(1, "выпил нурофена"),
+            await bot._process_message(1, "принял валидол"),
+            await bot._process_message(1, "выпил чай с лимоном"),
+            await bot._process_message(1, "выпил аспирин но голова болит"),
+        ]
+        stored = sorted((med.name, med.expiry_date, med.quantity) for med in await bot.db_repository.list_medications(1))
+        return replies, stored
+
+    replies, stored = asyncio.run(scenario())
+
+    assert replies[0] == "Приём 'Аспирин' отмечен, осталось: 1."
+    # Первая партия заканчивается; количество не уходит в минус
+    assert replies[1] == "Приём 'Аспирин' отмечен. Лекарство закончилось, пора пополнить аптечку."
+    assert replies[2].startswith("Приём 'Нурофен' отмечен")
+    # Лекарства нет в аптечке или это не приём лекарства: сообщение идёт в определение намерения
+    assert not any(reply.startswith("Приём") for reply in replies[3:])
+    assert replies[5] == "рекомендация"
+    assert stored == [("Аспирин", "2030-01-31", 0), ("Аспирин", "2031-01-31", 5), ("Нурофен", "2030-01-31", 0)]
+
+
+def test_migration_merges_existing_duplicates(tmp_path):
+    path = str(tmp_path / "old.db")
+    with sqlite3.connect(path) as conn:
+        conn.execute(
+            "CREATE TABLE medications (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, name VARCHAR NOT NULL, "
+            "expiry_date VARCHAR NOT NULL, quantity INTEGER NOT NULL, added_date VARCHAR NOT NULL)"
+        )
+        conn.executemany(
+            "INSERT INTO medications (user_id, name, expiry_date, quantity, added_date) VALUES (?, ?, ?, ?, '')",
+            [(1, "Аспирин", "2030-01-31", 1), (1, "аспирин", "2030-01-31", 2), (1, "Aspirin 500", "2030-01-31", 3),
+             (1, "Аспирин", "2031-01-31", 1), (2, "Аспирин", "2030-01-31", 4)]
+        )
+
+    async def scenario():
+        repository = DatabaseRepository(path)
+        await repository.create_tables()
+        await repository.add_medication(1, "АСПИРИН", "2030-01-31", 1)
+        rows = [(med.id, med.canonical_name, med.quantity) for user_id in (1, 2) for med in await repository.list_medications(user_id)]
+        await dispose_engines()
+        return sorted(rows)
+
+    # Другая дозировка не сливается с остальными
+    assert asyncio.run(scenario()) == [(1, "аспирин", 4), (3, "аспирин 500", 3), (4, "аспирин", 1), (5, "аспирин", 4)]
+
+
+def test_migration_adds_dosage_to_existing_keys(tmp_path):
+    path = str(tmp_path / "keys.db")
+    with sqlite3.connect(path) as conn:
+        conn.execute(
+            "CREATE TABLE medications (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, name VARCHAR NOT NULL, "
+            "canonical_name VARCHAR NOT NULL, expiry_date VARCHAR NOT NULL, quantity INTEGER NOT NULL, "
+            "added_date VARCHAR NOT NULL, next_event_date VARCHAR)"
+        )
+        conn.execute("CREATE UNIQUE INDEX ux_medications_user_name_expiry ON medications (user_id, canonical_name, expiry_date)")
+        conn.execute(
+            "INSERT INTO medications (user_id, name, canonical_name, expiry_date, quantity, added_date) "
+            "VALUES (1, 'Називин 0,05%', 'називин', '2030-01-31', 1, '')"
+        )
+
+    async def scenario():
+        repository = DatabaseRepository(path)
+        await repository.create_tables()
+        await repository.add_medication(1, "Називин 0,01%", "2030-01-31", 2)
+        rows = [(med.name, med.canonical_name, med.quantity) for med in await repository.list_medications(1)]
+        await dispose_engines()
+        return sorted(rows)
+
+    assert asyncio.run(scenario()) == [("Називин 0,01%", "називин 0.01 %", 2), ("Називин 0,05%", "називин 0.05 %", 1)]
@@ -0,0 +1,20 @@
+from parsers.medication_parser import MedicationParseError, ParsedMedication, iter_medication_entries
+
+
+def test_parses_every_entry_and_reports_errors_per_line():
+    text = (
+        "лекарство Аспирин 05.24 x3\n"
+        "Нурофен 12.25 x1; Но-шпа 01.26 x2\n"
+        "просто текст\n"
+        "Анальгин 13.25 x1\n"
+    )
+
+    entries = list(iter_medication_entries(text))
+
+    assert entries[:3] == [
+        ParsedMedication("Аспирин", "2024-05-31", 3),
+        ParsedMedication("Нурофен", "2025-12-31", 1),
+        ParsedMedication("Но-шпа", "2026-01-31", 2),
+    ]
+    assert [(e.line_number, type(e)) for e in entries[3:]] == [(4, MedicationParseError), (5, MedicationParseError)]
+    assert "месяц" in entries[4].reason
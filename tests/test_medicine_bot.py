@@ -1,8 +1,27 @@
+import asyncio
 from main import MedicineBot
+from constants import TELEGRAM_MESSAGE_LIMIT
+from repositories.database_repository import DatabaseRepository
 
 def test_parse_medication_message():
     bot = MedicineBot()
     result = bot._parse_medication_message("лекарство Аспирин 05.24 x3")
     assert result["name"] == "Аспирин"
     assert result["expiry_date"] == "2024-05-31"
-    assert result["quantity"] == 3 
\ No newline at end of file
+    assert result["quantity"] == 3
+
+
+def test_long_restock_reply_fits_telegram_limit():
+    async def scenario():
+        bot = MedicineBot()
+        bot.db_repository = DatabaseRepository(":memory:")
+        await bot.db_repository.create_tables()
+        lines = [f"лекарство Препарат-{i} 12.30 x1" for i in range(180)] + [f"Сломанная строка {i}" for i in range(60)]
+        return await bot._process_message(1, "\n".join(lines)), len(await bot.db_repository.list_medications(1))
+
+    reply, stored = asyncio.run(scenario())
+
+    assert len(reply) <= TELEGRAM_MESSAGE_LIMIT
+    assert reply.startswith("Добавлено лекарств: 180\n• Препарат-0 - срок годности: 2030-12-31")
+    assert "…и ещё" in reply and "Не удалось распознать:\nСтрока 181" in reply
+    assert stored == 180
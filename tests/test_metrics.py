@@ -0,0 +1,95 @@
+import asyncio
+import pstats
+from aiohttp import ClientSession
+from repositories.database_repository import DatabaseRepository
+from services.metrics import DB_SECONDS, MetricsRegistry, MetricsServer, UpdateProfiler, timed
+
+
+def test_histogram_and_counter_render_prometheus_text():
+    registry = MetricsRegistry()
+    latency = registry.histogram("op_seconds", "Время операции", ("op",), buckets=(0.1, 1))
+    errors = registry.counter("op_errors_total", "Ошибки", ("op",))
+
+    @timed(latency, errors, op="fail")
+    async def fail():
+        raise RuntimeError("boom")
+
+    latency.observe(0.05, op="read")
+    latency.observe(0.5, op="read")
+    latency.observe(5, op="read")
+    try:
+        asyncio.run(fail())
+    except RuntimeError:
+        pass
+
+    text = registry.render()
+    assert "# TYPE op_seconds histogram" in text
+    assert 'op_seconds_bucket{op="read",le="0.1"} 1' in text
+    assert 'op_seconds_bucket{op="read",le="1"} 2' in text
+    assert 'op_seconds_bucket{op="read",le="+Inf"} 3' in text
+    assert 'op_seconds_count{op="read"} 3' in text
+    assert 'op_seconds_count{op="fail"} 1' in text
+    assert 'op_errors_total{op="fail"} 1' in text
+
+
+def test_repository_methods_are_timed():
+    series = DB_SECONDS.labels(method="list_medications")
+    before = series.count
+
+    async def scenario():
+        repository = DatabaseRepository(":memory:")
+        await repository.create_tables()
+        await repository.list_medications(1)
+
+    asyncio.run(scenario())
+
+    assert series.count == before + 1
+
+
+def test_profiler_keeps_slowest_updates_and_dumps_pstats(tmp_path):
+    profiler = UpdateProfiler(keep=2, sample_rate=1.0)
+
+    @profiler.wrap
+    async def handler(delay):
+        await asyncio.sleep(delay)
+
+    async def scenario():
+        await handler(0.001)  # профилировщик ещё выключен
+        profiler.start()
+        for delay in (0.01, 0.03, 0.02):
+            await handler(delay)
+
+    asyncio.run(scenario())
+
+    durations = [duration for _, duration in profiler.slowest()]
+    assert len(durations) == 2
+    assert durations[0] >= 0.03 and durations[1] >= 0.02
+    paths = profiler.dump(str(tmp_path))
+    assert len(paths) == 2
+    assert pstats.Stats(paths[0]).total_calls > 0
+
+
+def test_metrics_server_serves_metrics_and_toggles_profiler(tmp_path):
+    registry = MetricsRegistry()
+    registry.counter("demo_total", "Пример").inc()
+    profiler = UpdateProfiler()
+
+    async def scenario():
+        server = MetricsServer(0, registry=registry, profiler=profiler, dump_dir=str(tmp_path))
+        await server.start()
+        base = f"http://{server.host}:{server.port}"
+        try:
+            async with ClientSession() as session:
+                async with session.get(f"{base}/metrics") as response:
+                    metrics_text = await response.text()
+                async with session.post(f"{base}/profiler/start?sample_rate=0.5") as response:
+                    status = await response.json()
+        finally:
+            await server.close()
+        return metrics_text, status
+
+    metrics_text, status = asyncio.run(scenario())
+
+    assert "demo_total 1" in metrics_text
+    assert status["enabled"] is True
+    assert profiler.sample_rate == 0.5
@@ -0,0 +1,101 @@
+import asyncio
+import time
+from datetime import date, timedelta
+from telegram.error import RetryAfter
+from constants import TELEGRAM_MESSAGE_LIMIT
+from formatters.message_formatter import MessageFormatter
+from main import MedicineBot, check_reminders
+from repositories.database_repository import DatabaseRepository, Medication
+from services.expiry_scheduler import ExpiryScheduler
+from services.notification_dispatcher import NotificationDispatcher
+
+
+class FakeBot:
+    def __init__(self, failures=()):
+        self.sent = []
+        self._failures = list(failures)
+
+    async def send_message(self, chat_id, text):
+        if self._failures:
+            raise self._failures.pop(0)
+        self.sent.append((chat_id, text, time.monotonic()))
+
+
+def test_dispatcher_paces_messages_per_chat():
+    async def scenario():
+        fake_bot = FakeBot()
+        dispatcher = NotificationDispatcher(fake_bot, per_chat_interval=0.05, workers=4)
+        results = await asyncio.gather(*(dispatcher.send(1, f"msg {i}") for i in range(3)), dispatcher.send(2, "other"))
+        await dispatcher.close()
+        return fake_bot, results
+
+    fake_bot, results = asyncio.run(scenario())
+
+    assert all(results)
+    chat_times = [sent_at for chat_id, _, sent_at in fake_bot.sent if chat_id == 1]
+    assert len(chat_times) == 3
+    assert all(later - earlier >= 0.045 for earlier, later in zip(chat_times, chat_times[1:]))
+
+
+def test_dispatcher_retries_after_flood_control():
+    async def scenario():
+        fake_bot = FakeBot(failures=[RetryAfter(0)])
+        dispatcher = NotificationDispatcher(fake_bot)
+        result = await dispatcher.send(1, "hello")
+        await dispatcher.close()
+        return fake_bot, result
+
+    fake_bot, result = asyncio.run(scenario())
+
+    assert result is True
+    assert [text for _, text, _ in fake_bot.sent] == ["hello"]
+
+
+def test_check_reminders_sends_one_digest_per_user_and_is_idempotent():
+    async def scenario():
+        bot = MedicineBot()
+        bot.db_repository = DatabaseRepository(":memory:")
+        bot.expiry_scheduler = ExpiryScheduler(bot.db_repository)
+        await bot.db_repository.create_tables()
+        fake_bot = FakeBot()
+        bot.notification_dispatcher = NotificationDispatcher(fake_bot, per_chat_interval=0)
+
+        today = date.today()
+        await bot.db_repository.add_medication(1, "Аспирин", (today + timedelta(days=60)).isoformat(), 1)
+        await bot.db_repository.add_medication(1, "Анальгин", (today - timedelta(days=1)).isoformat(), 1)
+
+        # Первый проход «падает» после отправки, не успев обновить базу
+        complete = bot.expiry_scheduler.complete
+        async def crash(reminder_pass):
+            pass
+        bot.expiry_scheduler.complete = crash
+        await check_reminders(bot)
+        bot.expiry_scheduler.complete = complete
+        await check_reminders(bot)
+        await check_reminders(bot)
+
+        remaining = await bot.db_repository.list_medications(1)
+        await bot.notification_dispatcher.close()
+        return fake_bot, remaining
+
+    fake_bot, remaining = asyncio.run(scenario())
+
+    assert len(fake_bot.sent) == 1
+    digest = fake_bot.sent[0][1]
+    assert "Аспирин" in digest and "Анальгин" in digest
+    assert [med.name for med in remaining] == ["Аспирин"]
+
+
+def test_digest_for_large_cabinet_fits_telegram_limit():
+    expired = [Medication(name=f"Препарат-{i} с длинным названием", expiry_date="2026-01-31") for i in range(300)]
+    expiring = [(Medication(name=f"Лекарство-{i}", expiry_date="2026-11-30"), 30) for i in range(300)]
+
+    digest = MessageFormatter.format_reminder_digest(expired, expiring)
+    only_expiring = MessageFormatter.format_reminder_digest([], expiring)
+
+    assert len(digest) <= TELEGRAM_MESSAGE_LIMIT and len(only_expiring) <= TELEGRAM_MESSAGE_LIMIT
+    assert "Препарат-0 с длинным" in digest and "Лекарство-0 -" in digest
+    assert "утилизируйте" in digest
+    shown = digest.count("• Лекарство-")
+    assert f"…и ещё {300 - shown}" in digest
+    assert MessageFormatter.format_reminder_digest(expired[:2], []).count("•") == 2
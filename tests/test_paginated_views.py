@@ -0,0 +1,92 @@
+import asyncio
+import time
+import tracemalloc
+from main import MedicineBot
+from repositories.database_repository import DatabaseRepository, Medication
+from constants import LIST_PAGE_SIZE
+
+
+class FakeQuery:
+    def __init__(self, user_id, data):
+        self.from_user = type("User", (), {"id": user_id})()
+        self.data = data
+        self.edits = []
+
+    async def edit_message_text(self, text, reply_markup=None):
+        self.edits.append((text, reply_markup))
+
+
+class FakeUpdate:
+    def __init__(self, query):
+        self.callback_query = query
+        self.effective_user = query.from_user
+
+
+async def _bot_with_cabinets(sizes):
+    bot = MedicineBot()
+    bot.db_repository = DatabaseRepository(":memory:")
+    await bot.db_repository.create_tables()
+    for user_id, size in sizes.items():
+        await bot.db_repository.add_medications_many(user_id, [
+            Medication(name=f"Препарат-{i}", expiry_date="2030-01-31", quantity=1) for i in range(size)
+        ])
+    return bot
+
+
+def _callbacks(markup):
+    return [button.callback_data for row in markup.inline_keyboard for button in row] if markup else []
+
+
+def test_navigation_through_button_callbacks():
+    async def scenario():
+        bot = await _bot_with_cabinets({1: LIST_PAGE_SIZE * 2 + 5})
+        query = FakeQuery(1, "list_meds")
+        await bot.button(FakeUpdate(query), None)
+        first_text, first_markup = query.edits[-1]
+
+        query.data = _callbacks(first_markup)[-1]
+        await bot.button(FakeUpdate(query), None)
+        second_text, second_markup = query.edits[-1]
+
+        query.data = [data for data in _callbacks(second_markup) if "<" in data][0]
+        await bot.button(FakeUpdate(query), None)
+        back_text, _ = query.edits[-1]
+        return first_text, first_markup, second_text, second_markup, back_text
+
+    first_text, first_markup, second_text, second_markup, back_text = asyncio.run(scenario())
+
+    assert "Препарат-0\n" not in second_text and f"Препарат-{LIST_PAGE_SIZE} " in second_text
+    assert len(_callbacks(first_markup)) == 1 and _callbacks(first_markup)[0].startswith("m>")
+    assert len(_callbacks(second_markup)) == 2
+    assert back_text == first_text
+    assert all(len(data.encode()) <= 64 for data in _callbacks(second_markup))
+
+
+def test_page_cost_does_not_depend_on_cabinet_size():
+    small, large = 10, 50_000
+
+    async def measure(bot, user_id):
+        # Страница из середины аптечки (для маленькой — первая страница после начального курсора)
+        first_page, _ = await bot.db_repository.list_medications_page(user_id, limit=1)
+        cursor = first_page[0].id + (large // 2 if user_id == 2 else 0)
+        await bot._list_page("m", user_id, cursor)
+        tracemalloc.start()
+        started = time.perf_counter()
+        for _ in range(20):
+            text, _ = await bot._list_page("m", user_id, cursor)
+        latency = (time.perf_counter() - started) / 20
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return latency, peak, text
+
+    async def scenario():
+        bot = await _bot_with_cabinets({1: small, 2: large})
+        return await measure(bot, 1), await measure(bot, 2)
+
+    (small_latency, small_peak, small_text), (large_latency, large_peak, large_text) = asyncio.run(scenario())
+
+    assert len(large_text) < 4096
+    assert large_text.count("\n") == LIST_PAGE_SIZE
+    # Большая аптечка даёт полную страницу против неполной, но не пропорционально размеру аптечки
+    assert large_peak < small_peak * 4
+    assert large_latency < small_latency * 4
@@ -0,0 +1,135 @@
+import asyncio
+import time
+from telegram.error import BadRequest, RetryAfter
+from constants import Messages
+from main import MedicineBot
+from repositories.database_repository import DatabaseRepository
+from services.progressive_reply import ProgressiveReply
+
+
+class FakeSentMessage:
+    def __init__(self, failures=()):
+        self.edits = []
+        self._failures = list(failures)
+
+    async def edit_text(self, text, **kwargs):
+        if self._failures:
+            raise self._failures.pop(0)
+        self.edits.append((time.perf_counter(), text))
+
+
+class FakeMessage:
+    def __init__(self, user_id=1, sent=None):
+        self.from_user = type("User", (), {"id": user_id})()
+        self.sent = sent or FakeSentMessage()
+        self.replies = []
+
+    async def reply_text(self, text, **kwargs):
+        self.replies.append((time.perf_counter(), text))
+        return self.sent
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_edits_are_throttled_by_time_and_characters():
+    clock = FakeClock()
+    message = FakeMessage()
+    reply = ProgressiveReply(message, min_interval=1.0, min_chars=10, clock=clock)
+
+    async def scenario():
+        await reply.start("...")
+        results = [await reply.update("начало")]  # меньше 10 символов
+        results.append(await reply.update("начало ответа"))  # первый текст — сразу
+        clock.now = 0.5
+        results.append(await reply.update("начало ответа, ещё немного"))  # интервал не прошёл
+        clock.now = 1.5
+        results.append(await reply.update("начало ответа, ещё"))  # прирост меньше 10 символов
+        results.append(await reply.update("начало ответа, ещё немного текста"))
+        await reply.finish("начало ответа, ещё немного текста. Конец.")
+        return results
+
+    results = asyncio.run(scenario())
+
+    assert results == [False, True, False, False, True]
+    assert [text for _, text in message.sent.edits] == [
+        "начало ответа", "начало ответа, ещё немного текста", "начало ответа, ещё немного текста. Конец."
+    ]
+
+
+def test_finish_waits_out_retry_after():
+    message = FakeMessage(sent=FakeSentMessage(failures=[RetryAfter(0)]))
+    reply = ProgressiveReply(message)
+
+    async def scenario():
+        await reply.start("...")
+        await reply.finish("готово")
+
+    asyncio.run(scenario())
+
+    assert [text for _, text in message.sent.edits] == ["готово"]
+
+
+class StreamingLLM:
+    """Отдаёт фрагменты с задержкой, как потоковый API"""
+
+    def __init__(self, chunks, delay):
+        self.chunks = chunks
+        self.delay = delay
+
+    async def stream_completion_cached(self, prompt, user_id=None):
+        for chunk in self.chunks:
+            await asyncio.sleep(self.delay)
+            yield chunk
+
+
+def test_recommendation_is_streamed_into_placeholder():
+    async def scenario():
+        bot = MedicineBot()
+        bot.db_repository = DatabaseRepository(":memory:")
+        await bot.db_repository.create_tables()
+        await bot.db_repository.add_medication(1, "Парацетамол", "2030-01-31", 1)
+        words = ["Примите", " парацетамол", " 500", " мг", " при", " температуре", " выше", " 38."] * 8
+        bot.llm_service = StreamingLLM(words, delay=0.01)
+        message = FakeMessage()
+        started = time.perf_counter()
+        response = await bot._process_message(1, "у меня болит голова", message)
+        return response, message, started, "".join(words)
+
+    response, message, started, full_text = asyncio.run(scenario())
+
+    assert response is None
+    assert message.replies[0][1] == Messages.RECOMMENDATION_PLACEHOLDER.value
+    first_text_at = message.sent.edits[0][0]
+    assert message.sent.edits[-1][1] == full_text
+    # Первый текст виден заметно раньше конца генерации, правок меньше, чем фрагментов
+    assert first_text_at - started < message.sent.edits[-1][0] - started
+    assert 2 <= len(message.sent.edits) < 64
+
+
+def test_failed_edit_replaces_placeholder_with_error():
+    async def scenario():
+        bot = MedicineBot()
+        bot.db_repository = DatabaseRepository(":memory:")
+        await bot.db_repository.create_tables()
+        await bot.db_repository.add_medication(1, "Парацетамол", "2030-01-31", 1)
+        bot.llm_service = StreamingLLM(["Примите парацетамол"] * 4, delay=0)
+        messages = [
+            FakeMessage(sent=FakeSentMessage([BadRequest("Message can't be edited")])),
+            # Заменить заглушку тоже не удалось: ошибка не выходит наружу
+            FakeMessage(sent=FakeSentMessage([BadRequest("Message can't be edited")] * 2)),
+        ]
+        responses = [await bot._process_message(1, "у меня болит голова", message) for message in messages]
+        return responses, messages
+
+    responses, messages = asyncio.run(scenario())
+
+    assert responses == [None, None]
+    assert [text for _, text in messages[0].sent.edits] == [Messages.ERROR_PROCESSING.value]
+    assert messages[1].sent.edits == []
+    assert all(len(message.replies) == 1 for message in messages)
@@ -0,0 +1,161 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from datetime import date, timedelta
+from main import MedicineBot, check_reminders
+from repositories.database_repository import DatabaseRepository, Medication, dispose_engines, reminder_shard
+from services.expiry_scheduler import ExpiryScheduler
+from services.notification_dispatcher import NotificationDispatcher
+from services.reminder_shards import ShardedReminderRunner
+
+USERS = 600
+SHARDS = 16
+SEND_DELAY = 0.02
+
+
+class RecordingBot:
+    """Telegram-заглушка: отправка занимает SEND_DELAY, получатели запоминаются"""
+
+    def __init__(self):
+        self.recipients = []
+
+    async def send_message(self, chat_id, text):
+        await asyncio.sleep(SEND_DELAY)
+        self.recipients.append(chat_id)
+
+
+def _bot(path: str):
+    bot = MedicineBot()
+    bot.db_repository = DatabaseRepository(path)
+    bot.expiry_scheduler = ExpiryScheduler(bot.db_repository)
+    bot.notification_dispatcher = NotificationDispatcher(RecordingBot(), global_rate=1e6, per_chat_interval=0, workers=4)
+    return bot
+
+
+async def _seed(path: str, users: int = USERS) -> None:
+    repository = DatabaseRepository(path)
+    await repository.create_tables()
+    today = date.today()
+    for user_id in range(1, users + 1):
+        await repository.add_medications_many(user_id, [
+            Medication(name="Аспирин", expiry_date=(today + timedelta(days=60)).isoformat(), quantity=1),
+            Medication(name="Анальгин", expiry_date=(today - timedelta(days=1)).isoformat(), quantity=1),
+        ])
+    await dispose_engines()
+
+
+async def _worker_pass(path: str, owner: str, barrier) -> tuple:
+    logging.getLogger().setLevel(logging.WARNING)
+    bot = _bot(path)
+    runner = ShardedReminderRunner(
+        bot.db_repository, lambda shard, shards: check_reminders(bot, shard, shards), SHARDS, owner, lease_ttl=5
+    )
+    await bot.db_repository.pending_reminder_shards(SHARDS, 1)
+    # Реплики стартуют одновременно и конкурируют за шарды
+    barrier.wait()
+    processed = await runner.run_pass(pass_number=1)
+    await bot.notification_dispatcher.close()
+    await dispose_engines()
+    return processed, bot.notification_dispatcher.bot.recipients
+
+
+def _worker(path: str, owner: str, barrier, results) -> None:
+    results.put(asyncio.run(_worker_pass(path, owner, barrier)))
+
+
+def _run_workers(path: str, workers: int) -> list:
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(workers)
+    results = context.Queue()
+    processes = [context.Process(target=_worker, args=(path, f"worker-{i}", barrier, results)) for i in range(workers)]
+    for process in processes:
+        process.start()
+    outcome = [results.get(timeout=120) for _ in processes]
+    for process in processes:
+        process.join()
+    return outcome
+
+
+def test_worker_processes_split_pass_and_deliver_exactly_once(tmp_path):
+    # Время прохода и ускорение измеряет benchmarks/reminder_shards_benchmark.py
+    for workers in (1, 4):
+        path = os.path.join(tmp_path, f"reminders_{workers}.db")
+        asyncio.run(_seed(path))
+        outcome = _run_workers(path, workers)
+
+        recipients = [user_id for item in outcome for user_id in item[1]]
+        shards = [shard for item in outcome for shard in item[0]]
+        assert sorted(recipients) == list(range(1, USERS + 1))
+        assert sorted(shards) == list(range(SHARDS))
+
+        async def remaining():
+            repository = DatabaseRepository(path)
+            meds = [med for user_id in (1, 2, USERS) for med in await repository.list_medications(user_id)]
+            pending = await repository.pending_reminder_shards(SHARDS, 1)
+            await dispose_engines()
+            return meds, pending
+
+        meds, pending = asyncio.run(remaining())
+        assert [med.name for med in meds] == ["Аспирин"] * 3
+        assert pending == set()
+
+
+def test_shard_of_crashed_worker_is_taken_over_after_lease_expiry(tmp_path):
+    path = os.path.join(tmp_path, "crash.db")
+
+    async def scenario():
+        await _seed(path, users=40)
+        bot = _bot(path)
+        # «Упавшая» реплика взяла шард и больше не продлевает аренду
+        assert await bot.db_repository.claim_reminder_shard(3, "crashed", 1, ttl=0.2)
+        runner = ShardedReminderRunner(
+            bot.db_repository, lambda shard, shards: check_reminders(bot, shard, shards), 4, "alive",
+            lease_ttl=1, heartbeat_interval=0.05
+        )
+        started = time.monotonic()
+        processed = await runner.run_pass(pass_number=1)
+        elapsed = time.monotonic() - started
+        # Повторный запуск того же прохода ничего не делает
+        again = await runner.run_pass(pass_number=1)
+        await bot.notification_dispatcher.close()
+        await dispose_engines()
+        return processed, again, elapsed, bot.notification_dispatcher.bot.recipients
+
+    processed, again, elapsed, recipients = asyncio.run(scenario())
+
+    assert sorted(processed) == [0, 1, 2, 3]
+    assert again == []
+    assert elapsed >= 0.15
+    assert sorted(recipients) == list(range(1, 41))
+    assert {reminder_shard(user_id, 4) for user_id in recipients} == {0, 1, 2, 3}
+
+
+def test_lost_lease_stops_shard_processing(tmp_path):
+    path = os.path.join(tmp_path, "lost.db")
+
+    async def scenario():
+        repository = DatabaseRepository(path)
+        await repository.create_tables()
+        cancelled = asyncio.Event()
+
+        async def slow_shard(shard, shards):
+            if shard == 0:
+                # Пока шард обрабатывается, его перехватывает другая реплика
+                await repository.release_reminder_shard(0, "first")
+                await repository.claim_reminder_shard(0, "second", 1, ttl=60)
+                try:
+                    await asyncio.sleep(10)
+                except asyncio.CancelledError:
+                    cancelled.set()
+                    raise
+
+        runner = ShardedReminderRunner(repository, slow_shard, 2, "first", lease_ttl=1, heartbeat_interval=0.05)
+        await repository.claim_reminder_shard(1, "other", 1, ttl=60)
+        await repository.release_reminder_shard(1, "other", completed_pass=1)
+        processed = await runner.run_pass(pass_number=1)
+        await dispose_engines()
+        return processed, cancelled.is_set()
+
+    assert asyncio.run(scenario()) == ([], True)
@@ -0,0 +1,54 @@
+from datetime import date, datetime
+import pytest
+from parsers.schedule_parser import CourseSchedule, ParsedCourse, parse_course_message, parse_schedule
+
+TODAY = date(2026, 10, 18)  # воскресенье
+
+
+@pytest.mark.parametrize("text, spec", [
+    ("08:00 20:00", "t=08:00,20:00"),
+    ("3 раза в день", "t=08:00,14:00,20:00"),
+    ("5 раз в день", "t=08:00,11:30,15:00,18:30,22:00"),
+    ("6 раз в день", "t=08:00,10:48,13:36,16:24,19:12,22:00"),
+    ("каждые 8 часов", "h=8;from=2026-10-18"),
+    ("утром и вечером по пн ср пт", "t=08:00,20:00;dow=135"),
+    ("по будням в 9:30", "t=09:30;dow=12345"),
+    ("с 01.11 по 10.11 2 раза в день", "t=09:00,21:00;from=2026-11-01;to=2026-11-10"),
+    ("на ночь 7 дней", "t=22:00;from=2026-10-18;to=2026-10-24"),
+    ("с 25.12 по 05.01 утром", "t=08:00;from=2026-12-25;to=2027-01-05"),
+])
+def test_parses_schedule_into_compact_spec(text, spec):
+    schedule = parse_schedule(text, TODAY)
+
+    assert schedule.dumps() == spec
+    assert CourseSchedule.loads(spec) == schedule
+
+
+def test_unrecognized_schedule_is_none():
+    assert parse_schedule("как получится", TODAY) is None
+
+
+def test_next_dose_respects_times_weekdays_interval_and_end():
+    evening = datetime(2026, 10, 18, 12, 0)
+
+    assert parse_schedule("08:00 20:00", TODAY).next_dose(evening) == datetime(2026, 10, 18, 20, 0)
+    assert parse_schedule("утром по пн ср", TODAY).next_dose(evening) == datetime(2026, 10, 19, 8, 0)
+    assert parse_schedule("каждые 5 часов", TODAY).next_dose(datetime(2026, 10, 19, 0, 0)) == datetime(2026, 10, 19, 4, 0)
+    three_days = parse_schedule("на ночь 3 дня", TODAY)
+    assert three_days.next_dose(datetime(2026, 10, 20, 21, 0)) == datetime(2026, 10, 20, 22, 0)
+    assert three_days.next_dose(datetime(2026, 10, 20, 22, 0)) is None
+
+
+def test_frequent_doses_stay_within_the_day():
+    five = parse_schedule("5 раз в день", TODAY)
+    doses, moment = [], datetime(2026, 10, 19, 0, 0)
+    while (moment := five.next_dose(moment)) and moment.day == 19:
+        doses.append(moment.strftime("%H:%M"))
+
+    assert doses == ["08:00", "11:30", "15:00", "18:30", "22:00"]
+
+
+def test_course_message_separates_multiword_name_from_dosage():
+    assert parse_course_message("курс Витамин D3 1таб 09:00 метод внутрь") == ParsedCourse("Витамин D3", "1таб", "09:00", "внутрь")
+    assert parse_course_message("курс Но-шпа таблетка утром") == ParsedCourse("Но-шпа", "таблетка", "утром", "Не указан")
+    assert parse_course_message("курс") is None
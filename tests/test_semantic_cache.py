@@ -0,0 +1,130 @@
+import asyncio
+import os
+from collections import OrderedDict
+from main import MedicineBot
+from repositories.database_repository import DatabaseRepository
+from services.semantic_cache import SemanticCache, SymptomVectorizer, complaint_context, lemmatize, shortlist_fingerprint
+
+PARAPHRASES_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "symptom_paraphrases.tsv")
+
+vectorizer = SymptomVectorizer()
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _paraphrase_groups():
+    groups = OrderedDict()
+    with open(PARAPHRASES_PATH, encoding="utf-8") as f:
+        for line in f:
+            if line.strip() and not line.startswith("#"):
+                group, phrase = line.rstrip("\n").split("\t")
+                groups.setdefault(group, []).append(phrase)
+    return groups
+
+
+def test_lemmatize_reduces_word_forms_to_common_stem():
+    assert lemmatize("болит") == lemmatize("боль") == lemmatize("болят") == "бол"
+    assert lemmatize("голова") == lemmatize("головой") == "голов"
+    assert lemmatize("порезался") == "порез"
+    assert lemmatize("нос") == "нос"
+
+
+def test_paraphrases_hit_and_other_symptoms_miss():
+    cache = SemanticCache(max_size=100, vectorizer=vectorizer)
+    groups = _paraphrase_groups()
+    for group, phrases in groups.items():
+        cache.set(phrases[0], 0, 0, group)
+
+    answers = [(group, cache.get(phrase, 0, 0)) for group, phrases in groups.items() for phrase in phrases[1:]]
+
+    hits = sum(1 for group, answer in answers if answer == group)
+    wrong = [(group, answer) for group, answer in answers if answer not in (None, group)]
+    assert wrong == []
+    assert hits / len(answers) >= 0.5
+
+
+def test_entries_are_keyed_by_cabinet_fingerprint():
+    cache = SemanticCache(max_size=10, vectorizer=vectorizer)
+    fingerprint = shortlist_fingerprint(["Парацетамол 500", "Нурофен"])
+    cache.set("болит голова", 1, fingerprint, "парацетамол")
+
+    assert shortlist_fingerprint(["нурофен", "парацетамол  500"]) == fingerprint
+    assert cache.get("голова болит с утра", 1, fingerprint) == "парацетамол"
+    assert cache.get("голова болит с утра", 1, shortlist_fingerprint(["Нурофен"])) is None
+
+
+def test_entries_are_scoped_per_user():
+    cache = SemanticCache(max_size=10, vectorizer=vectorizer)
+    cache.set("болит голова", 1, 0, "парацетамол")
+
+    assert cache.get("голова болит", 1, 0) == "парацетамол"
+    assert cache.get("голова болит", 2, 0) is None
+
+
+def test_patient_context_and_negation_are_never_matched_across():
+    cache = SemanticCache(max_size=10, vectorizer=vectorizer)
+    cache.set("температура 38", 1, 0, "взрослая доза")
+    cache.set("болит голова", 1, 0, "от головы")
+
+    assert complaint_context("у ребёнка болит голова") == ("child",)
+    assert complaint_context("не болит голова, болит живот") == ("negation",)
+    assert cache.get("у ребенка температура 38", 1, 0) is None
+    assert cache.get("у ребенка болит голова", 1, 0) is None
+    assert cache.get("дочке 5 лет, болит голова", 1, 0) is None
+    assert cache.get("я беременна, болит голова", 1, 0) is None
+    assert cache.get("кормлю грудью, болит голова", 1, 0) is None
+    assert cache.get("не болит голова, болит живот", 1, 0) is None
+    assert cache.get("голова болит", 1, 0) == "от головы"
+
+    cache.set("у ребенка болит голова", 1, 0, "детская доза")
+    assert cache.get("у ребёнка голова болит", 1, 0) == "детская доза"
+    assert cache.get("голова болит", 1, 0) == "от головы"
+
+
+def test_ttl_and_lru_eviction():
+    clock = FakeClock()
+    cache = SemanticCache(max_size=2, ttl=60, vectorizer=vectorizer, clock=clock)
+    cache.set("болит голова", 0, 0, "голова")
+    cache.set("болит горло", 0, 0, "горло")
+    # Обращение к "голове" делает её свежей, поэтому вытесняется "горло"
+    assert cache.get("голова болит", 0, 0) == "голова"
+    cache.set("изжога", 0, 0, "изжога")
+    assert cache.get("болит горло", 0, 0) is None
+    assert cache.get("болит голова", 0, 0) == "голова"
+    assert cache.stats()["evictions"] == 1
+
+    clock.now += 61
+    assert cache.get("болит голова", 0, 0) is None
+    # Устаревшая строка занимается без вытеснения живых записей
+    cache.set("сухой кашель", 0, 0, "кашель")
+    assert cache.stats() == {"hits": 2, "misses": 2, "evictions": 1, "size": 1}
+
+
+class CountingLLM:
+    def __init__(self):
+        self.calls = 0
+
+    async def get_completion_cached(self, prompt, user_id=None):
+        self.calls += 1
+        return f"рекомендация {self.calls}"
+
+
+def test_paraphrased_complaint_reuses_recommendation():
+    async def scenario():
+        bot = MedicineBot()
+        bot.db_repository = DatabaseRepository(":memory:")
+        await bot.db_repository.create_tables()
+        await bot.db_repository.add_medication(1, "Парацетамол", "2030-01-31", 1)
+        bot.llm_service = CountingLLM()
+        first = await bot._process_message(1, "у меня болит голова")
+        second = await bot._process_message(1, "голова болит с утра, что выпить")
+        other = await bot._process_message(1, "болит горло")
+        return first, second, other, bot.llm_service.calls
+
+    assert asyncio.run(scenario()) == ("рекомендация 1", "рекомендация 1", "рекомендация 2", 2)
@@ -0,0 +1,118 @@
+import asyncio
+from datetime import date, timedelta
+from main import MedicineBot
+from repositories.database_repository import DatabaseRepository, dispose_engines
+from repositories.user_list_cache import UserListCache
+from services.expiry_scheduler import ExpiryScheduler
+
+
+def test_lru_bound_by_user_count():
+    cache = UserListCache(max_users=2)
+    cache.set(1, "medications", ["a"])
+    cache.set(2, "medications", ["b"])
+    cache.get(1, "medications")
+    cache.set(3, "medications", ["c"])
+
+    assert cache.get(2, "medications") is None
+    assert cache.get(1, "medications") == ["a"]
+    assert cache.stats()["users"] == 2
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = UserListCache(ttl=30, clock=clock)
+    cache.set(1, "medications", ["a"])
+    clock.now += 29
+    assert cache.get(1, "medications") == ["a"]
+    clock.now += 2
+    assert cache.get(1, "medications") is None
+    assert cache.stats()["users"] == 0
+
+
+def test_read_overlapping_invalidation_is_not_stored():
+    cache = UserListCache(max_users=2)
+    version = cache.version()
+    # Пока список читался из базы, данные пользователя изменились
+    cache.invalidate([1])
+    cache.set(1, "medications", ["устаревший"], since=version)
+    cache.set(2, "medications", ["b"], since=version)
+    assert cache.get(1, "medications") is None
+    assert cache.get(2, "medications") == ["b"]
+
+    # Сведения о сбросах ограничены max_users, но вытесненные не теряются
+    version = cache.version()
+    cache.invalidate([3])
+    cache.invalidate([4])
+    cache.invalidate([5])
+    cache.set(3, "medications", ["устаревший"], since=version)
+    assert cache.get(3, "medications") is None
+    cache.set(3, "medications", ["свежий"], since=cache.version())
+    assert cache.get(3, "medications") == ["свежий"]
+
+
+def test_change_by_another_replica_is_visible_after_ttl(tmp_path):
+    async def scenario():
+        path = str(tmp_path / "shared.db")
+        first, second = DatabaseRepository(path), DatabaseRepository(path)
+        await first.create_tables()
+        clock = FakeClock()
+        first.cache = UserListCache(ttl=30, clock=clock)
+        await first.add_medication(1, "Аспирин", "2030-01-31", 1)
+        before = await first.list_medications(1)
+        await second.delete_medications([med.id for med in before])
+        stale = await first.list_medications(1)
+        clock.now += 31
+        fresh = await first.list_medications(1)
+        await dispose_engines()
+        return len(before), len(stale), len(fresh)
+
+    assert asyncio.run(scenario()) == (1, 1, 0)
+
+
+def test_lists_are_read_through_and_invalidated_on_writes():
+    async def scenario():
+        repository = DatabaseRepository(":memory:")
+        await repository.create_tables()
+        today = date.today()
+        await repository.add_medication(1, "Аспирин", (today + timedelta(days=300)).isoformat(), 1)
+
+        first = await repository.list_medications(1)
+        second = await repository.list_medications(1)
+        await repository.add_medication(1, "Анальгин", (today - timedelta(days=1)).isoformat(), 1)
+        after_add = await repository.list_medications(1)
+        await ExpiryScheduler(repository).run_pass(today)
+        after_expiry = await repository.list_medications(1)
+        return first, second, after_add, after_expiry, repository.cache
+
+    first, second, after_add, after_expiry, cache = asyncio.run(scenario())
+
+    assert second is first
+    assert len(after_add) == 2
+    assert [med.name for med in after_expiry] == ["Аспирин"]
+    assert cache.hits == 1 and cache.misses == 3
+
+
+def test_rendered_cabinet_text_skips_db_and_formatting():
+    async def scenario():
+        bot = MedicineBot()
+        bot.db_repository = DatabaseRepository(":memory:")
+        await bot.db_repository.create_tables()
+        await bot.db_repository.add_medication(1, "Аспирин", "2030-01-31", 2)
+
+        first = await bot._handle_command("list_meds", 1)
+        misses = bot.db_repository.cache.misses
+        second = await bot._handle_command("list_meds", 1)
+        return first, second, misses, bot.db_repository.cache.misses
+
+    first, second, misses_before, misses_after = asyncio.run(scenario())
+
+    assert "Аспирин" in first and second == first
+    assert misses_after == misses_before
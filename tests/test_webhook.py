@@ -0,0 +1,204 @@
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from types import SimpleNamespace
+from aiohttp import ClientSession, TCPConnector
+from telegram import Update, User
+from telegram.ext import Application, ExtBot, MessageHandler, filters
+from main import build_application
+from services.metrics import WEBHOOK_UPDATES
+from services.update_processor import PerUserUpdateProcessor
+from services.webhook_server import WebhookServer
+
+UPDATES = 2000
+USERS = 200
+SECRET = "secret"
+
+
+class OfflineBot(ExtBot):
+    """Бот без обращений к Telegram: get_me отвечает сразу"""
+
+    async def get_me(self, *args, **kwargs):
+        self._bot_user = User(1, "Аптечка", True, username="home_chemists_bot")
+        return self._bot_user
+
+
+def _updates(count: int = UPDATES, users: int = USERS):
+    """Сообщения от users пользователей по кругу; текст — номер сообщения пользователя"""
+    return [
+        {
+            "update_id": i + 1,
+            "message": {
+                "message_id": i + 1,
+                "date": 0,
+                "chat": {"id": i % users + 1, "type": "private"},
+                "from": {"id": i % users + 1, "is_bot": False, "first_name": "u"},
+                "text": str(i // users),
+            },
+        }
+        for i in range(count)
+    ]
+
+
+class Recorder:
+    """Обработчик-заглушка: каждый сотый апдейт «ждёт Groq» 50 мс, остальные — 1 мс"""
+
+    def __init__(self, expected: int, gate: asyncio.Event = None):
+        self.expected = expected
+        self.gate = gate
+        self.order = {}
+        self.finished = {}
+        self.active = set()
+        self.overlaps = 0
+        self.done = asyncio.Event()
+
+    async def handle(self, update, context):
+        chat_id = update.effective_chat.id
+        if chat_id in self.active:
+            self.overlaps += 1
+        self.active.add(chat_id)
+        try:
+            if self.gate is not None:
+                await self.gate.wait()
+            await asyncio.sleep(0.05 if update.update_id % 100 == 0 else 0.001)
+            self.order.setdefault(chat_id, []).append(int(update.message.text))
+        finally:
+            self.active.discard(chat_id)
+        self.finished[update.update_id] = time.perf_counter()
+        if len(self.finished) == self.expected:
+            self.done.set()
+
+    async def noop(self, update, context):
+        pass
+
+
+def _summary(sent: dict, finished: dict, started: float):
+    """Апдейтов в секунду и p99 задержки от получения до конца обработки"""
+    latencies = sorted(finished[update_id] - sent[update_id] for update_id in finished)
+    throughput = len(finished) / (max(finished.values()) - started)
+    return throughput, latencies[int(len(latencies) * 0.99) - 1]
+
+
+async def _polling(updates):
+    """Прежний режим: апдейты пачками из getUpdates, обработка строго по одному"""
+    recorder = Recorder(len(updates))
+    application = Application.builder().bot(OfflineBot("1:token")).updater(None).build()
+    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, recorder.handle))
+    await application.initialize()
+    await application.start()
+    started = time.perf_counter()
+    sent = {}
+    for offset in range(0, len(updates), 100):
+        # getUpdates отдаёт до 100 апдейтов за запрос
+        for data in updates[offset:offset + 100]:
+            sent[data["update_id"]] = time.perf_counter()
+            await application.update_queue.put(Update.de_json(data, application.bot))
+        while application.update_queue.qsize():
+            await asyncio.sleep(0.001)
+    await recorder.done.wait()
+    await application.stop()
+    await application.shutdown()
+    return _summary(sent, recorder.finished, started)
+
+
+async def _post_all(url, updates, connections: int = 40):
+    """Отправляет апдейты через connections соединений, как Telegram; возвращает время отправки и статусы"""
+    sent, statuses = {}, []
+    queue = list(reversed(updates))
+    async with ClientSession(connector=TCPConnector(limit=connections)) as session:
+        async def worker():
+            while queue:
+                data = queue.pop()
+                sent[data["update_id"]] = time.perf_counter()
+                async with session.post(url, json=data, headers={"X-Telegram-Bot-Api-Secret-Token": SECRET}) as response:
+                    statuses.append(response.status)
+        await asyncio.gather(*(worker() for _ in range(connections)))
+    return sent, statuses
+
+
+async def _webhook(updates, processor, max_pending, gate=None, expected=None):
+    recorder = Recorder(len(updates) if expected is None else expected, gate)
+    fake_bot = SimpleNamespace(start=recorder.noop, handle_message=recorder.handle, button=recorder.noop,
+                               handle_document=recorder.noop, export=recorder.noop)
+    application = build_application(fake_bot, processor, Application.builder().bot(OfflineBot("1:token")), webhook=True)
+    server = WebhookServer(application, processor, "127.0.0.1", 0, secret_token=SECRET, max_pending=max_pending)
+    await application.initialize()
+    await application.start()
+    await server.start()
+    started = time.perf_counter()
+    sent, statuses = await _post_all(f"http://127.0.0.1:{server.port}{server.path}", updates)
+    if gate is not None:
+        gate.set()
+    await asyncio.wait_for(recorder.done.wait(), 30)
+    await server.close()
+    await application.stop()
+    await application.shutdown()
+    return sent, statuses, started, recorder
+
+
+def test_webhook_processes_users_in_parallel_and_keeps_per_user_order():
+    updates = _updates()
+    polling_throughput, polling_p99 = asyncio.run(_polling(updates))
+    sent, statuses, started, recorder = asyncio.run(_webhook(updates, PerUserUpdateProcessor(concurrency=32), UPDATES))
+    throughput, p99 = _summary(sent, recorder.finished, started)
+
+    print(
+        f"polling: {polling_throughput:.0f} updates/s, p99 {polling_p99 * 1000:.0f} ms; "
+        f"webhook: {throughput:.0f} updates/s, p99 {p99 * 1000:.0f} ms"
+    )
+    assert statuses == [200] * UPDATES
+    assert recorder.overlaps == 0
+    assert all(order == sorted(order) for order in recorder.order.values())
+    assert sum(len(order) for order in recorder.order.values()) == UPDATES
+    assert throughput > polling_throughput * 2
+    assert p99 < polling_p99
+
+
+def test_webhook_rejects_updates_when_backlog_is_full():
+    rejected = WEBHOOK_UPDATES.labels(result="rejected")
+    before = rejected.value
+    updates = _updates(50, users=50)
+
+    async def scenario():
+        # Обработчики стоят на gate, пока все апдейты не будут отправлены
+        gate = asyncio.Event()
+        sent, statuses, _, recorder = await _webhook(updates, PerUserUpdateProcessor(concurrency=2), 10, gate, expected=10)
+        return statuses, recorder
+
+    statuses, recorder = asyncio.run(scenario())
+
+    assert statuses.count(200) == 10
+    assert statuses.count(503) == 40
+    assert rejected.value == before + 40
+    assert len(recorder.finished) == 10
+
+
+def test_webhook_checks_secret_token():
+    async def scenario():
+        processor = PerUserUpdateProcessor()
+        application = build_application(SimpleNamespace(start=None, handle_message=None, button=None,
+                                                        handle_document=None, export=None), processor,
+                                        Application.builder().bot(OfflineBot("1:token")), webhook=True)
+        server = WebhookServer(application, processor, "127.0.0.1", 0, secret_token=SECRET)
+        await server.start()
+        async with ClientSession() as session:
+            async with session.post(f"http://127.0.0.1:{server.port}{server.path}", json=_updates(1)[0]) as response:
+                status = response.status
+        await server.close()
+        return status, application.update_queue.qsize()
+
+    assert asyncio.run(scenario()) == (403, 0)
+
+
+def test_webhook_mode_requires_secret():
+    def import_config(**env):
+        return subprocess.run(
+            [sys.executable, "-c", "import config"], env={**os.environ, "WEBHOOK_URL": "https://bot.example.com/telegram", **env},
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))), capture_output=True, text=True
+        )
+
+    assert "WEBHOOK_SECRET" in import_config(WEBHOOK_SECRET="").stderr
+    assert "WEBHOOK_SECRET" in import_config(WEBHOOK_SECRET="bad secret!").stderr
+    assert import_config(WEBHOOK_SECRET="s3cret_token-1").returncode == 0